@@ -1,29 +1,83 @@
+import os
+
 from flask import Flask
 from config import config
 from flask_sqlalchemy import SQLAlchemy
 from flask_mail import Mail
 from flask_login import LoginManager
+from jinja2 import FileSystemBytecodeCache
+from app.assets import Assets
+from app.asyncdb import AsyncDatabase
+from app.compression import Compression
+from app.fragments import FragmentCache
+from app.hashing import PasswordHasher
+from app.identity import IdentityCache
+from app.instrumentation import Instrumentation
+from app.last_seen import LastSeenTracker
+from app.outbox import Outbox
+from app.previews import LinkPreviews
+from app.refdata import ReferenceCache
+from app.sqlite import SQLiteTuning
 
 mail = Mail()
 db = SQLAlchemy()
+sqlite = SQLiteTuning()
+instrumentation = Instrumentation()
 login_manager = LoginManager()
+last_seen = LastSeenTracker()
+refdata = ReferenceCache()
+identity_cache = IdentityCache()
+fragments = FragmentCache()
+outbox = Outbox()
+link_previews = LinkPreviews()
+passwords = PasswordHasher()
+async_db = AsyncDatabase()
+assets = Assets()
+compression = Compression()
 login_manager.session_protection = "strong"
 login_manager.login_view = "auth.login"
 
 
-def create_app(config_name) -> Flask:
+def create_app(config_name, **overrides) -> Flask:
+    """
+    The app for one of the configs in config.py. ``overrides`` are set on
+    top of it before any extension reads it, e.g. by tests that need their
+    own database.
+    """
     app = Flask(__name__)
     app.config.from_object(config[config_name])
+    app.config.update(overrides)
     config[config_name].init_app(app)
+    # compiled templates are kept on disk, so that new workers skip compiling
+    cache_dir = app.config["DIBS_TEMPLATE_CACHE_DIR"]
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        app.jinja_options = dict(
+            app.jinja_options, bytecode_cache=FileSystemBytecodeCache(cache_dir)
+        )
 
     from app.main import main as main_blueprint
     from app.auth import auth as auth_blueprint
+    from app.api import api as api_blueprint
 
     app.register_blueprint(main_blueprint)
     app.register_blueprint(auth_blueprint, url_prefix="/auth")
+    app.register_blueprint(api_blueprint, url_prefix="/api/v1")
 
     mail.init_app(app)
     db.init_app(app)
+    sqlite.init_app(app)
+    instrumentation.init_app(app)
     login_manager.init_app(app)
+    last_seen.init_app(app)
+    refdata.init_app(app)
+    identity_cache.init_app(app)
+    fragments.init_app(app)
+    outbox.init_app(app)
+    link_previews.init_app(app)
+    passwords.init_app(app)
+    async_db.init_app(app)
+    assets.init_app(app)
+    compression.init_app(app)
 
     return app
@@ -0,0 +1,200 @@
+import json
+
+from flask import (
+    Response,
+    abort,
+    current_app,
+    jsonify,
+    make_response,
+    request,
+    stream_with_context,
+)
+from flask.typing import ResponseReturnValue
+from flask_login import current_user
+from sqlalchemy import null
+
+from app import db, refdata
+from app.feed import encode_cursor, feed_query, newest_first
+from app.models import Comment, Item, List, User
+
+from . import api
+
+LIST_FIELDS = ("id", "title", "timestamp", "author")
+ITEM_FIELDS = ("id", "name", "link", "description", "category", "timestamp")
+COMMENT_FIELDS = ("id", "author", "body", "timestamp")
+# only ever shown to people other than the list's author
+GUEST_ITEM_FIELDS = ("comments", "comment_count", "claimed")
+
+
+def error(status, message):
+    abort(make_response(jsonify(error=message), status))
+
+
+@api.before_request
+def require_login():
+    if not current_user.is_authenticated:
+        error(401, "login required")
+
+
+def requested_fields(allowed, extra=()):
+    """The ``fields`` query argument, checked against what may be selected."""
+    fields = request.args.get("fields")
+    if not fields:
+        return allowed
+    fields = tuple(f.strip() for f in fields.split(",") if f.strip())
+    unknown = set(fields) - set(allowed) - set(extra)
+    if unknown:
+        error(400, f"unknown fields: {', '.join(sorted(unknown))}")
+    return fields
+
+
+def page_size():
+    config = current_app.config
+    try:
+        limit = int(request.args.get("limit", config["DIBS_API_PAGE_SIZE"]))
+    except ValueError:
+        error(400, "limit must be a number")
+    return max(1, min(limit, config["DIBS_API_MAX_PAGE_SIZE"]))
+
+
+def jsonable(value):
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+
+def stream_page(records, limit):
+    """
+    Stream ``{"data": [...], "next": cursor}`` from an iterator of
+    (cursor, record) pairs, without holding the page in memory. One record
+    past ``limit`` only serves to tell whether there is a next page.
+    """
+
+    def generate():
+        yield '{"data":['
+        next_cursor = None
+        previous = None
+        for n, (cursor, record) in enumerate(records):
+            if n == limit:
+                next_cursor = previous
+                break
+            yield ("," if n else "") + json.dumps(record, default=jsonable)
+            previous = cursor
+        yield '],"next":' + json.dumps(next_cursor) + "}"
+
+    return Response(stream_with_context(generate()), mimetype="application/json")
+
+
+def list_records(query, fields, batch_size):
+    for wishlist in query.yield_per(batch_size):
+        record = {}
+        for field in fields:
+            if field == "author":
+                record["author"] = wishlist.author.username
+            else:
+                record[field] = getattr(wishlist, field)
+        yield encode_cursor(wishlist), record
+
+
+@api.route("/feed")
+def feed() -> ResponseReturnValue:
+    """Lists by other people, newest first."""
+    limit = page_size()
+    query = feed_query(current_user.id, request.args.get("cursor"))
+    return stream_page(
+        list_records(
+            query.limit(limit + 1),
+            requested_fields(LIST_FIELDS),
+            current_app.config["DIBS_API_BATCH_SIZE"],
+        ),
+        limit,
+    )
+
+
+@api.route("/users/<username>/lists")
+def user_lists(username) -> ResponseReturnValue:
+    """A user's lists, newest first."""
+    user = User.query.filter_by(username=username).first()
+    if user is None:
+        error(404, "no such user")
+    limit = page_size()
+    query = newest_first(
+        List.query.filter_by(author_id=user.id), request.args.get("cursor")
+    )
+    return stream_page(
+        list_records(
+            query.limit(limit + 1),
+            requested_fields(LIST_FIELDS),
+            current_app.config["DIBS_API_BATCH_SIZE"],
+        ),
+        limit,
+    )
+
+
+@api.route("/lists/<int:list_id>/items")
+def list_items(list_id) -> ResponseReturnValue:
+    """
+    The items of a list in id order. Other people may ask for the comments
+    on each item and whether it has been claimed with ``fields=...``; the
+    list's author never gets them, just like on the list page.
+    """
+    wishlist = db.session.get(List, list_id)
+    if wishlist is None:
+        error(404, "no such list")
+    limit = page_size()
+    fields = requested_fields(ITEM_FIELDS, extra=GUEST_ITEM_FIELDS)
+    if current_user.id == wishlist.author_id:
+        fields = tuple(f for f in fields if f not in GUEST_ITEM_FIELDS)
+    with_comments = "comments" in fields
+    fields = tuple(f for f in fields if f != "comments")
+    if with_comments:
+        fields += ("comments",)
+
+    try:
+        after = int(request.args.get("cursor", 0))
+    except ValueError:
+        error(400, "invalid cursor")
+    # a range on the primary key rather than "id IN (...)", so that SQLite
+    # can still index its way into the comments join
+    query = db.session.query(Item).filter(Item.list_id == wishlist.id, Item.id > after)
+    bound = (
+        db.session.query(Item.id)
+        .filter(Item.list_id == wishlist.id, Item.id > after)
+        .order_by(Item.id)
+        .offset(limit)
+        .limit(1)
+        .scalar()
+    )
+    if bound is not None:
+        query = query.filter(Item.id <= bound)
+    if with_comments:
+        query = query.add_entity(Comment).outerjoin(Comment, Comment.item_id == Item.id)
+        query = query.order_by(Item.id, Comment.id)
+    else:
+        query = query.add_columns(null()).order_by(Item.id)
+    categories = {c.id: c.name for c in refdata.categories()}
+
+    def records():
+        record = None
+        current = None
+        for item, comment in query.yield_per(current_app.config["DIBS_API_BATCH_SIZE"]):
+            if item.id != current:
+                if record is not None:
+                    yield str(current), record
+                current = item.id
+                record = {}
+                for field in fields:
+                    if field == "category":
+                        record[field] = categories.get(item.category_id)
+                    elif field == "comments":
+                        record[field] = []
+                    else:
+                        record[field] = getattr(item, field)
+            if comment is not None:
+                record["comments"].append(
+                    {field: getattr(comment, field) for field in COMMENT_FIELDS}
+                )
+        if record is not None:
+            yield str(current), record
+
+    return stream_page(records(), limit)
@@ -0,0 +1,204 @@
+import asyncio
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import request_started
+from werkzeug.exceptions import HTTPException
+from werkzeug.routing import RequestRedirect
+
+
+def wsgi_environ(scope, body) -> dict:
+    """The WSGI environ for an ASGI HTTP request ``scope`` and its ``body``."""
+    server = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode().decode("latin1"),
+        "PATH_INFO": scope["path"].encode().decode("latin1"),
+        "QUERY_STRING": scope["query_string"].decode("latin1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1] or 80),
+        "SERVER_PROTOCOL": f"HTTP/{scope['http_version']}",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    if scope.get("client"):
+        environ["REMOTE_ADDR"], environ["REMOTE_PORT"] = map(str, scope["client"])
+    for name, value in scope["headers"]:
+        name = name.decode("latin1").upper().replace("-", "_")
+        if name not in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            name = f"HTTP_{name}"
+        value = value.decode("latin1")
+        if name in environ:
+            value = f"{environ[name]},{value}"
+        environ[name] = value
+    # the body has been read in full, so its length is known even if it was
+    # sent in chunks
+    environ["CONTENT_LENGTH"] = str(len(body))
+    return environ
+
+
+def response_messages(app, environ):
+    """
+    Run a WSGI app, yielding the ASGI messages of its response: the start,
+    then each chunk of the body as soon as the app produces it. The closing
+    empty body message is left to the caller.
+    """
+    started = []
+
+    def start_response(status, headers, exc_info=None):
+        started[:] = [
+            {
+                "type": "http.response.start",
+                "status": int(status.split(" ", 1)[0]),
+                "headers": [
+                    (name.lower().encode("latin1"), value.encode("latin1"))
+                    for name, value in headers
+                ],
+            }
+        ]
+        return chunks.append
+
+    chunks = []
+    iterable = app(environ, start_response)
+    try:
+        for chunk in iterable:
+            chunks.append(chunk)
+            if started:
+                yield started.pop()
+            body = b"".join(chunks)
+            chunks.clear()
+            if body:
+                yield {"type": "http.response.body", "body": body, "more_body": True}
+        if started:
+            yield started.pop()
+    finally:
+        if hasattr(iterable, "close"):
+            iterable.close()
+
+
+class ASGIApp:
+    """
+    Serves a dibs app over ASGI (see asgi.py next to dibs.py).
+
+    GET and HEAD requests for the endpoints in ``views`` (by default
+    ASYNC_VIEWS from app/main/async_views.py) are dispatched on the event
+    loop: the coroutine goes through the same request context, hooks, error
+    handlers and instrumentation as in Flask's own dispatch, and waits for
+    its queries without holding a thread. Every other request is handed to
+    the WSGI app on a pool of DIBS_ASGI_THREADS threads. Streamed bodies are
+    sent chunk by chunk either way. Lifespan shutdown disposes of the async
+    engine.
+    """
+
+    def __init__(self, app, views=None):
+        if views is None:
+            from app.main.async_views import ASYNC_VIEWS as views
+        self.app = app
+        self.views = views
+        self.executor = ThreadPoolExecutor(
+            app.config["DIBS_ASGI_THREADS"], thread_name_prefix="dibs-wsgi"
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self.http(scope, receive, send)
+        else:
+            raise ValueError(f"unsupported ASGI scope {scope['type']!r}")
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.close()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def close(self):
+        await self.app.extensions["async_db"].dispose()
+        self.executor.shutdown(wait=False)
+
+    async def http(self, scope, receive, send):
+        body = []
+        while True:
+            message = await receive()
+            body.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        environ = wsgi_environ(scope, b"".join(body))
+        view = self.async_view(environ)
+        if view is None:
+            await self.call_in_thread(environ, send)
+        else:
+            await self.dispatch(view, environ, send)
+        await send({"type": "http.response.body", "body": b""})
+
+    async def call_in_thread(self, environ, send):
+        """
+        Run the WSGI app on the thread pool, sending each part of the response
+        as the thread produces it. The whole response is produced in one
+        thread, as streamed bodies need their request context.
+        """
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+
+        def produce():
+            for message in response_messages(self.app, environ):
+                loop.call_soon_threadsafe(queue.put_nowait, message)
+
+        future = loop.run_in_executor(self.executor, produce)
+        future.add_done_callback(lambda _: queue.put_nowait(None))
+        while (message := await queue.get()) is not None:
+            await send(message)
+        await future
+
+    def async_view(self, environ):
+        """The coroutine that serves this request, if it has one."""
+        if environ["REQUEST_METHOD"] not in ("GET", "HEAD"):
+            return None
+        adapter = self.app.url_map.bind_to_environ(
+            environ, server_name=self.app.config["SERVER_NAME"]
+        )
+        try:
+            endpoint, _ = adapter.match()
+        except (HTTPException, RequestRedirect):
+            return None
+        return self.views.get(endpoint)
+
+    async def dispatch(self, view, environ, send):
+        """Flask's ``wsgi_app`` and ``full_dispatch_request``, awaiting ``view``."""
+        app = self.app
+        ctx = app.request_context(environ)
+        error = None
+        try:
+            try:
+                ctx.push()
+                try:
+                    request_started.send(app)
+                    rv = app.preprocess_request()
+                    if rv is None:
+                        rv = await view(**ctx.request.view_args)
+                except Exception as e:
+                    rv = app.handle_user_exception(e)
+                response = app.finalize_request(rv)
+            except Exception as e:
+                error = e
+                response = app.handle_exception(e)
+            # the body is produced while the request context is still there,
+            # letting other requests run between the chunks of a streamed one
+            for message in response_messages(response, environ):
+                await send(message)
+                await asyncio.sleep(0)
+        finally:
+            if error is not None and app.should_ignore_error(error):
+                error = None
+            ctx.pop(error)
@@ -0,0 +1,222 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+import threading
+from collections import namedtuple
+
+from flask import current_app, request, send_from_directory
+
+try:
+    import brotli
+except ImportError:  # brotli variants are only built when it is installed
+    brotli = None
+
+BUILD_DIR = "build"
+MANIFEST = "manifest.json"
+# content codings in order of preference, with the suffix of their files
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+BuiltAsset = namedtuple("BuiltAsset", "name path size minified gzip brotli")
+
+CSS_TOKENS = re.compile(
+    r"""
+    (?P<string>"(?:[^"\\\n]|\\.)*"|'(?:[^'\\\n]|\\.)*')
+    |(?P<license>/\*!.*?\*/)
+    |(?P<comment>/\*.*?\*/)
+    |(?P<space>\s+)
+    |(?P<punctuation>[{};,>])
+    |(?P<other>[^"'/\s{};,>]+|/)
+    """,
+    re.S | re.X,
+)
+
+
+# whitespace after these never matters outside strings; before "(" it does,
+# as in "@media screen and (...)"
+NO_SPACE_AFTER = "{};,>:(\n"
+
+
+def minify_css(css) -> str:
+    """
+    Drop comments (but not /*! licence */ ones), whitespace where it has no
+    meaning and the last semicolon of each block. Strings are left alone,
+    and so is whitespace between words, which matters in selectors and in
+    calc().
+    """
+    out = []
+    space = False
+    for match in CSS_TOKENS.finditer(css):
+        kind, text = match.lastgroup, match.group()
+        if kind in ("space", "comment"):
+            space = True
+            continue
+        if kind == "punctuation":
+            if text == "}" and out and out[-1] == ";":
+                out.pop()
+        elif space and out and out[-1][-1] not in NO_SPACE_AFTER and text[0] != ")":
+            out.append(" ")
+        out.append(text + "\n" if kind == "license" else text)
+        space = False
+    return "".join(out) + "\n"
+
+
+MINIFIERS = {".css": minify_css}
+
+
+def fingerprint(name, data) -> str:
+    """``name`` with a hash of ``data`` before its extension: a.css -> a.<hash>.css"""
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}"
+
+
+def compress(path, data):
+    """Write gzip and, if available, brotli variants of ``data`` next to ``path``."""
+    sizes = {"gzip": None, "brotli": None}
+    compressed = gzip.compress(data, compresslevel=9, mtime=0)
+    with open(path + ".gz", "wb") as f:
+        f.write(compressed)
+    sizes["gzip"] = len(compressed)
+    if brotli is not None:
+        compressed = brotli.compress(data, quality=11)
+        with open(path + ".br", "wb") as f:
+            f.write(compressed)
+        sizes["brotli"] = len(compressed)
+    return sizes
+
+
+def build(static_folder) -> list:
+    """
+    Minify, fingerprint and precompress every file of ``static_folder``
+    into its build/ directory and write build/manifest.json, which maps the
+    original names to the built ones. The previous build is replaced.
+    """
+    output = os.path.join(static_folder, BUILD_DIR)
+    shutil.rmtree(output, ignore_errors=True)
+    built = []
+    for root, dirs, files in os.walk(static_folder):
+        if os.path.abspath(root) == os.path.abspath(static_folder):
+            dirs[:] = [d for d in dirs if d != BUILD_DIR]
+        for filename in sorted(files):
+            source = os.path.join(root, filename)
+            name = os.path.relpath(source, static_folder).replace(os.sep, "/")
+            with open(source, "rb") as f:
+                data = f.read()
+            size = len(data)
+            minifier = MINIFIERS.get(os.path.splitext(name)[1])
+            if minifier is not None:
+                data = minifier(data.decode("utf-8")).encode("utf-8")
+            path = fingerprint(name, data)
+            target = os.path.join(output, path)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, "wb") as f:
+                f.write(data)
+            sizes = compress(target, data)
+            built.append(
+                BuiltAsset(name, path, size, len(data), sizes["gzip"], sizes["brotli"])
+            )
+    with open(os.path.join(output, MANIFEST), "w") as f:
+        json.dump({asset.name: f"{BUILD_DIR}/{asset.path}" for asset in built}, f)
+    return built
+
+
+class AssetState:
+    def __init__(self, app):
+        self.app = app
+        self.max_age = app.config["DIBS_ASSET_MAX_AGE"]
+        self.manifest = None
+        self.built = None
+        self.lock = threading.Lock()
+
+    def load(self):
+        """Read the manifest, leaving out entries whose source is newer."""
+        static_folder = self.app.static_folder
+        path = os.path.join(static_folder, BUILD_DIR, MANIFEST)
+        manifest = {}
+        try:
+            with open(path) as f:
+                entries = json.load(f)
+            built_at = os.path.getmtime(path)
+        except FileNotFoundError:
+            entries = {}
+        for name, built in entries.items():
+            source = os.path.join(static_folder, name)
+            if os.path.exists(source) and os.path.getmtime(source) > built_at:
+                self.app.logger.warning(
+                    "%s changed after `flask build-assets`; serving it unbuilt", name
+                )
+            else:
+                manifest[name] = built
+        self.manifest = manifest
+        self.built = set(manifest.values())
+
+    def resolve(self):
+        with self.lock:
+            if self.manifest is None:
+                self.load()
+            return self.manifest, self.built
+
+
+class Assets:
+    """
+    Serves the output of ``flask build-assets``.
+
+    ``url_for("static", filename=...)`` resolves a file to its minified,
+    fingerprinted copy under static/build/ when the manifest lists one, and
+    those copies are sent as their brotli or gzip variant when the client
+    accepts it, cacheable for DIBS_ASSET_MAX_AGE seconds and marked
+    immutable: a changed file gets a new name. Files without a build, and
+    everything when there is no build at all, are served by Flask as usual.
+    The manifest is read on first use, so rebuilding needs a restart.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions["assets"] = AssetState(app)
+        app.url_defaults(self.url_defaults)
+        if "static" in app.view_functions:
+            app.view_functions["static"] = self.send_static_file
+
+    @property
+    def state(self) -> AssetState:
+        return current_app.extensions["assets"]
+
+    def url_defaults(self, endpoint, values):
+        if endpoint == "static" and "filename" in values:
+            manifest, _ = self.state.resolve()
+            values["filename"] = manifest.get(values["filename"], values["filename"])
+
+    def send_static_file(self, filename):
+        state = self.state
+        _, built = state.resolve()
+        if filename not in built:
+            return current_app.send_static_file(filename)
+        directory = os.path.join(current_app.static_folder, BUILD_DIR)
+        name = filename[len(BUILD_DIR) + 1 :]
+        accepted = request.accept_encodings
+        encoding = None
+        for coding, suffix in ENCODINGS:
+            if accepted[coding] and os.path.exists(
+                os.path.join(directory, name + suffix)
+            ):
+                encoding = coding
+                name += suffix
+                break
+        response = send_from_directory(
+            directory,
+            name,
+            mimetype=mimetypes.guess_type(filename)[0],
+            max_age=state.max_age,
+        )
+        if encoding is not None:
+            response.content_encoding = encoding
+        response.vary.add("Accept-Encoding")
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
@@ -0,0 +1,87 @@
+import threading
+
+from flask import current_app
+
+# the asyncio driver to use for each synchronous database backend
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite"}
+
+
+class AsyncDatabaseState:
+    def __init__(self, app):
+        self.app = app
+        self.pool_size = app.config["DIBS_ASYNC_POOL_SIZE"]
+        self.engine = None
+        self.lock = threading.Lock()
+
+    def get_engine(self):
+        with self.lock:
+            if self.engine is None:
+                self.engine = self.create_engine()
+            return self.engine
+
+    def create_engine(self):
+        from sqlalchemy.ext.asyncio import create_async_engine
+        from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+        from app import db, instrumentation, sqlite
+
+        with self.app.app_context():
+            url = db.engine.url
+        driver = ASYNC_DRIVERS.get(url.get_backend_name())
+        if driver is None or not url.database:
+            raise RuntimeError(f"No asyncio driver for {url.drivername} databases.")
+        engine = create_async_engine(
+            url.set(drivername=driver),
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=self.pool_size,
+            max_overflow=0,
+        )
+        sqlite.tune(engine.sync_engine, self.app.extensions["sqlite"])
+        instrumentation.watch(engine.sync_engine)
+        return engine
+
+    async def dispose(self):
+        with self.lock:
+            engine, self.engine = self.engine, None
+        if engine is not None:
+            await engine.dispose()
+
+
+class AsyncDatabase:
+    """
+    Database access from coroutines, for the pages the ASGI entry point
+    (app/asgi.py) serves on its event loop.
+
+    ``run()`` calls an ordinary function taking a SQLAlchemy session, such as
+    the views' ``show_*`` page functions, with a session whose statements
+    wait for aiosqlite without blocking the loop. The engine is created on
+    first use with a pool of DIBS_ASYNC_POOL_SIZE connections, the same
+    pragmas and the same instrumentation as ``db.engine``, and belongs to the
+    event loop that first used it; ``dispose()`` it when that loop ends.
+    Only sqlite files are supported.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions["async_db"] = AsyncDatabaseState(app)
+
+    @property
+    def state(self) -> AsyncDatabaseState:
+        return current_app.extensions["async_db"]
+
+    @property
+    def engine(self):
+        return self.state.get_engine()
+
+    async def run(self, function, *args):
+        """``function(session, *args)``, with its queries run asynchronously."""
+        from sqlalchemy.ext.asyncio import AsyncSession
+
+        async with AsyncSession(self.engine, expire_on_commit=False) as session:
+            return await session.run_sync(function, *args)
+
+    async def dispose(self):
+        await self.state.dispose()
@@ -12,7 +12,8 @@ from app.auth.forms import (
 )
 
 from . import auth
-from .. import db
+from .. import db, identity_cache, passwords
+from ..decorators import query_budget
 from ..email import send_email
 from ..models import User
 
@@ -26,6 +27,7 @@ def before_request():
 
 
 @auth.route("/unconfirmed")
+@query_budget(0)
 def unconfirmed() -> ResponseReturnValue:
     if current_user.is_anonymous or current_user.confirmed:
         return redirect("main.index")
@@ -33,18 +35,28 @@ def unconfirmed() -> ResponseReturnValue:
 
 
 @auth.route("/login", methods=["GET", "POST"])
+@query_budget(2)
 def login() -> ResponseReturnValue:
     form = LoginForm()
     if form.validate_on_submit():
+        throttle = passwords.throttle
+        if throttle.blocked(request.remote_addr, form.email.data):
+            flash("Too many failed attempts. Please try again in a few minutes.")
+            return render_template("auth/login.html", form=form), 429
         user = User.query.filter_by(email=form.email.data).first()
         if user is not None and user.verify_password(form.password.data):
+            throttle.succeeded(form.email.data)
             login_user(user, form.remember_me.data)
+            # keep a hash verify_password has just upgraded
+            db.session.commit()
             return redirect(request.args.get("next") or url_for("main.index"))
+        throttle.failed(request.remote_addr, form.email.data)
         flash("Invalid username or password.")
     return render_template("auth/login.html", form=form)
 
 
 @auth.route("/logout")
+@query_budget(0)
 @login_required
 def logout() -> ResponseReturnValue:
     logout_user()
@@ -53,6 +65,7 @@ def logout() -> ResponseReturnValue:
 
 
 @auth.route("/register", methods=["GET", "POST"])
+@query_budget(6)
 def register() -> ResponseReturnValue:
     form = RegistrationForm()
     if form.validate_on_submit():
@@ -77,11 +90,14 @@ def register() -> ResponseReturnValue:
 
 
 @auth.route("/confirm/<token>")
+@query_budget(2)
 @login_required
 def confirm(token) -> ResponseReturnValue:
     if current_user.confirmed:
         return redirect(url_for("main.index"))
     if current_user.confirm(token):
+        db.session.commit()
+        identity_cache.invalidate(current_user.id)
         flash("you have confirmed your account. Thanks!")
     else:
         flash("The confirmation link is invalid or has expired")
@@ -89,6 +105,7 @@ def confirm(token) -> ResponseReturnValue:
 
 
 @auth.route("/confirm")
+@query_budget(4)
 @login_required
 def resend_confirmation() -> ResponseReturnValue:
     token = current_user.generate_confirmation_token()
@@ -104,13 +121,15 @@ def resend_confirmation() -> ResponseReturnValue:
 
 
 @auth.route("/change-password", methods=["GET", "POST"])
+@query_budget(2)
 @login_required
 def change_password() -> ResponseReturnValue:
     form = ChangePasswordForm()
     if form.validate_on_submit():
         if current_user.verify_password(form.old_password.data):
-            current_user.password = form.password.data
-            db.session.add(current_user)
+            user = current_user.model
+            user.password = form.password.data
+            db.session.add(user)
             db.session.commit()
             flash("Your password has been updated")
             return redirect(url_for("main.index"))
@@ -120,6 +139,7 @@ def change_password() -> ResponseReturnValue:
 
 
 @auth.route("/reset", methods=["GET", "POST"])
+@query_budget(2)
 def password_reset_request() -> ResponseReturnValue:
     if not current_user.is_anonymous:
         return redirect(url_for("main.index"))
@@ -141,13 +161,16 @@ def password_reset_request() -> ResponseReturnValue:
 
 
 @auth.route("/reset/<token>", methods=["GET", "POST"])
+@query_budget(2)
 def password_reset(token) -> ResponseReturnValue:
     if not current_user.is_anonymous:
         return redirect(url_for("main.index"))
     form = PasswordResetForm()
     if form.validate_on_submit():
-        if User.reset_password(token, form.password.data):
+        user_id = User.reset_password(token, form.password.data)
+        if user_id:
             db.session.commit()
+            identity_cache.invalidate(user_id)
             flash("Your password has been updated.")
             return redirect(url_for("auth.login"))
         else:
@@ -156,6 +179,7 @@ def password_reset(token) -> ResponseReturnValue:
 
 
 @auth.route("/change_email", methods=["GET", "POST"])
+@query_budget(3)
 @login_required
 def change_email_request() -> ResponseReturnValue:
     form = ChangeEmailForm()
@@ -181,6 +205,7 @@ def change_email_request() -> ResponseReturnValue:
 
 
 @auth.route("/change_email/<token>")
+@query_budget(3)
 @login_required
 def change_email(token) -> ResponseReturnValue:
     if current_user.change_email(token):
@@ -0,0 +1,205 @@
+import itertools
+import platform
+import subprocess
+import time
+from datetime import datetime
+
+from sqlalchemy import event
+
+from app import db
+from app.models import Comment, Item, List, User
+
+SCENARIOS = ("index", "view_list", "profile", "login", "comment")
+MARKER = "dibs bench comment"
+
+
+def percentile(ordered, p):
+    """Nearest-rank percentile ``p`` (0-100) of an already sorted list."""
+    return ordered[min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))]
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Targets:
+    """
+    The rows a bench run drives: the busiest author, their biggest list and
+    another user to look at them.
+    """
+
+    def __init__(self, password):
+        author_id = (
+            db.session.query(List.author_id)
+            .group_by(List.author_id)
+            .order_by(db.func.count(List.id).desc(), List.author_id)
+            .limit(1)
+            .scalar()
+        )
+        if author_id is None:
+            raise LookupError("There are no lists to benchmark; run `flask seed`.")
+        self.author = db.session.get(User, author_id).username
+        self.list_id = (
+            db.session.query(Item.list_id)
+            .join(List)
+            .filter(List.author_id == author_id)
+            .group_by(Item.list_id)
+            .order_by(db.func.count(Item.id).desc(), Item.list_id)
+            .limit(1)
+            .scalar()
+        )
+        self.item_ids = [
+            row.id for row in db.session.query(Item.id).filter_by(list_id=self.list_id)
+        ]
+        viewer = (
+            User.query.filter(User.id != author_id, User.confirmed.is_(True))
+            .order_by(User.id)
+            .first()
+        )
+        if viewer is None or not viewer.verify_password(password):
+            raise LookupError(
+                "No other user with the bench password; run `flask seed`."
+            )
+        self.viewer = viewer.email
+        self.password = password
+
+
+class QueryCounter:
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def record(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self.record)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self.record)
+
+
+def requests(client, targets, scenario):
+    """An endless supply of zero-argument callables issuing one request each."""
+    if scenario == "index":
+        return itertools.repeat(lambda: client.get("/"))
+    if scenario == "view_list":
+        return itertools.repeat(lambda: client.get(f"/lists/{targets.list_id}"))
+    if scenario == "profile":
+        return itertools.repeat(lambda: client.get(f"/user/{targets.author}"))
+    if scenario == "login":
+        login_client = client.application.test_client()
+        data = {"email": targets.viewer, "password": targets.password}
+        return itertools.repeat(lambda: login_client.post("/auth/login", data=data))
+    if scenario == "comment":
+        return (
+            lambda item_id=item_id: client.post(
+                f"/lists/{targets.list_id}/create_comment/{item_id}",
+                data={"body": MARKER},
+            )
+            for item_id in itertools.cycle(targets.item_ids)
+        )
+    raise ValueError(f"unknown scenario {scenario!r}")
+
+
+def measure(send, engine, n):
+    latencies = []
+    queries = []
+    statuses = {}
+    for _ in range(n):
+        with QueryCounter(engine) as counter:
+            start = time.perf_counter()
+            response = send()
+            response.get_data()
+            latencies.append(time.perf_counter() - start)
+        queries.append(counter.count)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+    total = sum(latencies)
+    latencies.sort()
+    return {
+        "requests": n,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "mean_ms": round(total / n * 1000, 3),
+        "queries_per_request": round(sum(queries) / n, 2),
+        "throughput_rps": round(n / total, 1) if total else None,
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+    }
+
+
+def remove_bench_comments(list_id):
+    Comment.query.filter_by(body=MARKER).delete(synchronize_session=False)
+    db.session.commit()
+    Item.rebuild_counts()
+    List.bump_version(list_id)
+    db.session.commit()
+
+
+def run(app, scenarios=SCENARIOS, n=200, warmup=10, password="dibs"):
+    """
+    Drive each scenario ``n`` times through the test client (after ``warmup``
+    unmeasured requests) and return the results as a JSON-serialisable dict.
+
+    The comments posted by the ``comment`` scenario are deleted again
+    afterwards, so repeated runs see the same data.
+    """
+    csrf = app.config.get("WTF_CSRF_ENABLED", True)
+    app.config["WTF_CSRF_ENABLED"] = False
+    try:
+        with app.app_context():
+            targets = Targets(password)
+            engine = db.engine
+            dataset = {
+                "users": User.query.count(),
+                "lists": List.query.count(),
+                "items": Item.query.count(),
+                "comments": Comment.query.count(),
+                "list_items": len(targets.item_ids),
+            }
+        client = app.test_client()
+        client.post("/auth/login", data={"email": targets.viewer, "password": password})
+        results = {}
+        for scenario in scenarios:
+            send = requests(client, targets, scenario)
+            for request in itertools.islice(send, warmup):
+                request()
+            results[scenario] = measure(lambda: next(send)(), engine, n)
+        if "comment" in scenarios:
+            with app.app_context():
+                remove_bench_comments(targets.list_id)
+    finally:
+        app.config["WTF_CSRF_ENABLED"] = csrf
+    return {
+        "revision": git_revision(),
+        "timestamp": datetime.utcnow().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "database": engine.url.render_as_string(hide_password=True),
+        "dataset": dataset,
+        "scenarios": results,
+    }
+
+
+def compare(baseline, current):
+    """Rows of (scenario, metric, baseline, current, change %) for two runs."""
+    rows = []
+    for scenario, metrics in current["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(scenario)
+        if before is None:
+            continue
+        for metric in ("p50_ms", "p95_ms", "p99_ms", "queries_per_request"):
+            old, new = before.get(metric), metrics.get(metric)
+            if old is None or new is None:
+                continue
+            change = (new - old) / old * 100 if old else 0.0
+            rows.append((scenario, metric, old, new, f"{change:+.1f}%"))
+    return rows
@@ -0,0 +1,123 @@
+import zlib
+
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:  # then only gzip is offered
+    brotli = None
+
+
+class GzipStream:
+    def __init__(self, level):
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self.compressor.compress(data) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self.compressor.flush()
+
+    def compress_all(self, data):
+        return self.compressor.compress(data) + self.compressor.flush()
+
+
+class BrotliStream:
+    def __init__(self, quality):
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self.compressor.process(data) + self.compressor.flush()
+
+    def finish(self):
+        return self.compressor.finish()
+
+    def compress_all(self, data):
+        return self.compressor.process(data) + self.compressor.finish()
+
+
+class CompressionState:
+    def __init__(self, app):
+        config = app.config
+        self.min_size = config["DIBS_COMPRESS_MIN_SIZE"]
+        self.mimetypes = frozenset(config["DIBS_COMPRESS_MIMETYPES"])
+        self.levels = {
+            "gzip": config["DIBS_GZIP_LEVEL"],
+            "br": config["DIBS_BROTLI_QUALITY"],
+        }
+        self.encodings = ["br", "gzip"] if brotli is not None else ["gzip"]
+
+    def compressor(self, encoding):
+        if encoding == "br":
+            return BrotliStream(self.levels["br"])
+        return GzipStream(self.levels["gzip"])
+
+
+def compressed(chunks, compressor, charset):
+    """Compress a response body chunk by chunk, flushing after each one."""
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode(charset)
+            if chunk:
+                yield compressor.compress(chunk)
+        yield compressor.finish()
+    finally:
+        if hasattr(chunks, "close"):
+            chunks.close()
+
+
+class Compression:
+    """
+    Compresses responses on the fly with brotli (when installed) or gzip,
+    whichever the client's Accept-Encoding prefers.
+
+    Only bodies of the DIBS_COMPRESS_MIMETYPES are compressed. Ordinary
+    responses are compressed whole when at least DIBS_COMPRESS_MIN_SIZE
+    bytes long. Streamed ones are compressed as they go, flushing after
+    every chunk so that what has been rendered reaches the client right
+    away. Files (Flask's direct passthrough responses) are left to the
+    static asset build, and responses that already have a Content-Encoding
+    are left alone.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions["compression"] = CompressionState(app)
+        app.after_request(self.after_request)
+
+    @property
+    def state(self) -> CompressionState:
+        return current_app.extensions["compression"]
+
+    def after_request(self, response):
+        state = self.state
+        if (
+            response.mimetype not in state.mimetypes
+            or response.status_code in (204, 304)
+            or response.status_code < 200
+            or response.direct_passthrough
+            or "Content-Encoding" in response.headers
+            or "Content-Range" in response.headers
+        ):
+            return response
+        streamed = response.is_streamed
+        if not streamed and response.calculate_content_length() < state.min_size:
+            return response
+        response.vary.add("Accept-Encoding")
+        encoding = request.accept_encodings.best_match(state.encodings)
+        if encoding is None:
+            return response
+        compressor = state.compressor(encoding)
+        if streamed:
+            response.response = compressed(
+                response.response, compressor, response.charset
+            )
+            response.headers.pop("Content-Length", None)
+        else:
+            response.set_data(compressor.compress_all(response.get_data()))
+        response.content_encoding = encoding
+        return response
@@ -0,0 +1,43 @@
+import hashlib
+
+from flask import current_app, make_response, request, session
+
+
+class Validator:
+    """
+    ETag for a page, built from whatever identifies the version of its
+    content. Everything the page varies on, including who is looking at it,
+    has to be part of ``parts``.
+
+    There is no Last-Modified: claims and deletions change a page without
+    leaving a newer timestamp behind, so If-Modified-Since is never trusted.
+    """
+
+    def __init__(self, *parts):
+        digest = hashlib.blake2b(digest_size=12)
+        for part in (current_app.config["DIBS_ETAG_SALT"], request.path) + parts:
+            digest.update(repr(part).encode())
+            digest.update(b"\0")
+        self.etag = digest.hexdigest()
+
+    def matches(self) -> bool:
+        if request.method not in ("GET", "HEAD") or session.get("_flashes"):
+            # pending flash messages have to be rendered into a fresh page
+            return False
+        return request.if_none_match.contains_weak(self.etag)
+
+    def apply(self, response):
+        response.set_etag(self.etag, weak=True)
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        response.vary.add("Cookie")
+        return response
+
+    def not_modified(self):
+        """A 304 response if the client's copy is current, else None."""
+        if not self.matches():
+            return None
+        return self.apply(make_response("", 304))
+
+    def respond(self, body):
+        return self.apply(make_response(body))
@@ -15,3 +15,14 @@ def permission_required(permission):
 
 def admin_required(f):
     return permission_required(Permission.ADMIN)(f)
+
+def query_budget(queries):
+    """
+    Declare how many SQL statements one request to a view may take. The
+    budget is only read by the instrumentation and tests/test_query_budgets.py;
+    it does not wrap the view.
+    """
+    def decorator(f):
+        f.query_budget = queries
+        return f
+    return decorator
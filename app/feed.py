@@ -0,0 +1,59 @@
+from datetime import datetime
+
+from sqlalchemy import tuple_
+from sqlalchemy.orm import joinedload
+
+from app import db
+from app.models import List
+
+
+def encode_cursor(wishlist) -> str:
+    return f"{wishlist.timestamp.isoformat()}_{wishlist.id}"
+
+
+def decode_cursor(cursor):
+    """
+    Turn a "<timestamp>_<id>" feed cursor back into its parts, or None if it
+    is missing or malformed.
+    """
+    try:
+        timestamp, list_id = cursor.rsplit("_", 1)
+        return datetime.fromisoformat(timestamp), int(list_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def newest_first(query, cursor=None):
+    """
+    Order a query over lists newest first and skip to ``cursor``.
+
+    Pages are keyed on (timestamp, id) rather than an offset, so every page is
+    a range scan over the lists.timestamp index no matter how deep it is.
+    """
+    query = query.order_by(List.timestamp.desc(), List.id.desc())
+    position = decode_cursor(cursor)
+    if position is not None:
+        query = query.filter(tuple_(List.timestamp, List.id) < position)
+    return query
+
+
+def feed_query(viewer_id, cursor=None, session=None):
+    """Lists by people other than the viewer, with their authors."""
+    query = (
+        (session or db.session)
+        .query(List)
+        .options(joinedload(List.author))
+        .filter(List.author_id != viewer_id)
+    )
+    return newest_first(query, cursor)
+
+
+def feed_page(viewer_id, cursor=None, per_page=20, session=None):
+    """
+    One page of the feed. Returns the lists and the cursor of the next page
+    (None on the last one).
+    """
+    lists = feed_query(viewer_id, cursor, session).limit(per_page + 1).all()
+    if len(lists) > per_page:
+        return lists[:per_page], encode_cursor(lists[per_page - 1])
+    return lists, None
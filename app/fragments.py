@@ -0,0 +1,176 @@
+import re
+import threading
+from collections import OrderedDict
+
+from flask import current_app, render_template, stream_template
+from flask_wtf.csrf import generate_csrf
+from markupsafe import Markup
+
+from app.streaming import buffered, streaming
+
+CSRF_PLACEHOLDER = "__dibs_csrf_token__"
+OWN_MARKER = re.compile(r"<!--own:(\d+)-->(.*?)<!--/own-->", re.DOTALL)
+
+
+class FragmentState:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.versions = {}
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+
+class FragmentCache:
+    """
+    LRU cache of rendered template fragments, capped at
+    DIBS_FRAGMENT_CACHE_BYTES of markup.
+
+    Keys are ``(namespace, ident, version, variant)`` tuples. The version has
+    to change whenever the underlying rows do, so stale entries are never
+    served; storing a newer version drops the older ones right away.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions["fragments"] = FragmentState(
+            app.config["DIBS_FRAGMENT_CACHE_BYTES"]
+        )
+
+    @property
+    def state(self) -> FragmentState:
+        return current_app.extensions["fragments"]
+
+    def get(self, key):
+        state = self.state
+        with state.lock:
+            fragment = state.entries.get(key)
+            if fragment is None:
+                state.misses += 1
+                return None
+            state.hits += 1
+            state.entries.move_to_end(key)
+            return fragment
+
+    def put(self, key, fragment):
+        state = self.state
+        if len(fragment) > state.max_bytes:
+            return fragment
+        namespace, ident, version, _ = key
+        with state.lock:
+            known = state.versions.get((namespace, ident))
+            if known is not None and known > version:
+                return fragment
+            if known is not None and known < version:
+                for stale in [k for k in state.entries if k[:2] == key[:2]]:
+                    self._discard(state, stale)
+            state.versions[(namespace, ident)] = version
+            if key in state.entries:
+                self._discard(state, key)
+            state.entries[key] = fragment
+            state.size += len(fragment)
+            while state.size > state.max_bytes:
+                self._discard(state, next(iter(state.entries)))
+                state.evictions += 1
+        return fragment
+
+    def render(self, key, template_name, context, viewer_id):
+        """
+        A fragment for one viewer, as a list or stream of markup chunks.
+
+        A cached fragment is personalized in one piece. A missing one is
+        rendered from ``template_name`` with the variables ``context()``
+        returns, and stored; when the page is streamed (see app/streaming.py),
+        it is streamed as it renders and stored once complete.
+        """
+        fragment = self.get(key)
+        if fragment is not None:
+            return [personalize(fragment, viewer_id)]
+        if not streaming():
+            html = render_template(template_name, **context())
+            return [personalize(self.put(key, depersonalize(html)), viewer_id)]
+        chunks = buffered(
+            self.stream(key, template_name, context()),
+            current_app.config["DIBS_STREAM_CHUNK_SIZE"],
+        )
+        return personalize_stream(chunks, viewer_id)
+
+    def stream(self, key, template_name, context):
+        parts = []
+        chunks = stream_template(template_name, **context)
+        try:
+            for chunk in chunks:
+                parts.append(chunk)
+                yield chunk
+        finally:
+            chunks.close()
+        self.put(key, depersonalize("".join(parts)))
+
+    @staticmethod
+    def _discard(state, key):
+        state.size -= len(state.entries.pop(key))
+
+    def clear(self):
+        state = self.state
+        with state.lock:
+            state.entries.clear()
+            state.versions.clear()
+            state.size = 0
+
+    def stats(self) -> dict:
+        state = self.state
+        with state.lock:
+            return {
+                "entries": len(state.entries),
+                "bytes": state.size,
+                "max_bytes": state.max_bytes,
+                "hits": state.hits,
+                "misses": state.misses,
+                "evictions": state.evictions,
+            }
+
+
+def depersonalize(html):
+    """Swap the current CSRF token for a placeholder before caching ``html``."""
+    return html.replace(generate_csrf(), CSRF_PLACEHOLDER)
+
+
+def personalize(fragment, viewer_id):
+    """
+    Fill a cached fragment in for one viewer: put their CSRF token back and
+    keep only the "own" sections that belong to them.
+    """
+    html = fragment.replace(CSRF_PLACEHOLDER, generate_csrf())
+    owner = str(viewer_id)
+    html = OWN_MARKER.sub(lambda m: m.group(2) if m.group(1) == owner else "", html)
+    return Markup(html)
+
+
+def personalize_stream(chunks, viewer_id):
+    """
+    ``personalize`` for a fragment that arrives in chunks. The markup of an
+    "own" section is held back until its end marker has arrived, and so is
+    a tag that has not been closed yet, which may be the start of a marker.
+    """
+    pending = ""
+    try:
+        for chunk in chunks:
+            pending += chunk
+            start = pending.rfind("<!--own:")
+            if start == -1 or "<!--/own-->" in pending[start:]:
+                start = pending.rfind("<")
+                if start == -1 or ">" in pending[start:]:
+                    start = len(pending)
+            if start:
+                yield personalize(pending[:start], viewer_id)
+                pending = pending[start:]
+        if pending:
+            yield personalize(pending, viewer_id)
+    finally:
+        chunks.close()
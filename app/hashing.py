@@ -0,0 +1,167 @@
+import atexit
+import multiprocessing
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class HashingBusy(RuntimeError):
+    """Every hashing slot stayed taken for DIBS_HASH_TIMEOUT seconds."""
+
+
+def normalize_method(method):
+    """
+    The method as werkzeug spells it at the front of the hashes it makes,
+    defaults filled in, e.g. "pbkdf2" -> "pbkdf2:sha256:260000". Werkzeug
+    is asked directly, by hashing an empty password once, so that every
+    method it supports is spelled the way it will be stored.
+    """
+    return generate_password_hash("", method, salt_length=1).split("$", 1)[0]
+
+
+class LoginThrottle:
+    """
+    Counts failed logins per client address and per email address in a
+    sliding window, so that a flood of bad passwords is turned away before
+    it reaches the hashing pool. At most ``capacity`` keys are tracked; the
+    least recently failed ones are forgotten first.
+    """
+
+    def __init__(self, per_ip, per_email, window, capacity=100000):
+        self.limits = {"ip": per_ip, "email": per_email}
+        self.window = window
+        self.capacity = capacity
+        self.failures = OrderedDict()
+        self.lock = threading.Lock()
+
+    def recent(self, key, now):
+        attempts = self.failures.get(key)
+        if attempts is None:
+            return 0
+        while attempts and attempts[0] <= now - self.window:
+            attempts.popleft()
+        if not attempts:
+            del self.failures[key]
+            return 0
+        return len(attempts)
+
+    def keys(self, ip, email):
+        return [("ip", ip), ("email", (email or "").strip().lower())]
+
+    def blocked(self, ip, email):
+        now = time.monotonic()
+        with self.lock:
+            return any(
+                self.recent(key, now) >= self.limits[key[0]]
+                for key in self.keys(ip, email)
+            )
+
+    def failed(self, ip, email):
+        now = time.monotonic()
+        with self.lock:
+            for key in self.keys(ip, email):
+                self.failures.setdefault(key, deque()).append(now)
+                self.failures.move_to_end(key)
+            while len(self.failures) > self.capacity:
+                self.failures.popitem(last=False)
+
+    def succeeded(self, email):
+        with self.lock:
+            self.failures.pop(("email", (email or "").strip().lower()), None)
+
+
+class HashingState:
+    def __init__(self, app):
+        config = app.config
+        self.method = normalize_method(config["DIBS_PASSWORD_METHOD"])
+        self.workers = config["DIBS_HASH_WORKERS"]
+        self.timeout = config["DIBS_HASH_TIMEOUT"]
+        self.slots = threading.BoundedSemaphore(config["DIBS_HASH_MAX_PENDING"])
+        self.throttle = LoginThrottle(
+            config["DIBS_LOGIN_FAILURES_PER_IP"],
+            config["DIBS_LOGIN_FAILURES_PER_EMAIL"],
+            config["DIBS_LOGIN_THROTTLE_WINDOW"],
+        )
+        self.pool = None
+        self.lock = threading.Lock()
+
+    def executor(self):
+        with self.lock:
+            if self.pool is None:
+                # spawned, not forked: the app process runs threads of its own
+                self.pool = ProcessPoolExecutor(
+                    self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self.pool
+
+    def run(self, function, *args):
+        if not self.workers:
+            return function(*args)
+        if not self.slots.acquire(timeout=self.timeout):
+            raise HashingBusy("no free password hashing slot")
+        try:
+            future = self.executor().submit(function, *args)
+            try:
+                return future.result(self.timeout)
+            except FutureTimeout:
+                future.cancel()
+                raise HashingBusy("password hashing took too long") from None
+        finally:
+            self.slots.release()
+
+    def close(self):
+        with self.lock:
+            if self.pool is not None:
+                self.pool.shutdown(cancel_futures=True)
+                self.pool = None
+
+
+class PasswordHasher:
+    """
+    Password hashing off the request threads.
+
+    Hashes are computed with werkzeug in a pool of DIBS_HASH_WORKERS
+    processes, started on first use, so a burst of logins occupies at most
+    that many cores however many requests are waiting. At most
+    DIBS_HASH_MAX_PENDING hashes may be queued or running; beyond that
+    callers wait up to DIBS_HASH_TIMEOUT seconds and then get HashingBusy.
+    With no workers configured, hashing happens inline.
+
+    New hashes use DIBS_PASSWORD_METHOD (werkzeug's "method:params" format,
+    e.g. "pbkdf2:sha256:600000"); ``needs_rehash()`` tells which stored
+    hashes predate it.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        state = HashingState(app)
+        app.extensions["hashing"] = state
+        atexit.register(state.close)
+
+    @property
+    def state(self) -> HashingState:
+        return current_app.extensions["hashing"]
+
+    @property
+    def throttle(self) -> LoginThrottle:
+        return self.state.throttle
+
+    def hash(self, password) -> str:
+        state = self.state
+        return state.run(generate_password_hash, password, state.method)
+
+    def verify(self, pwhash, password) -> bool:
+        if not pwhash:
+            return False
+        return self.state.run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash) -> bool:
+        return not pwhash or pwhash.split("$", 1)[0] != self.state.method
@@ -0,0 +1,146 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from flask import current_app
+from flask_login import UserMixin
+
+IdentitySnapshot = namedtuple("IdentitySnapshot", "id username confirmed permissions")
+
+
+class CachedUser(UserMixin):
+    """
+    What ``current_user`` is for a logged-in user: a per-request wrapper
+    around a cached identity snapshot.
+
+    Identity and permission checks are answered from the snapshot. Anything
+    else is looked up on the ``User`` row, which is loaded on first use, and
+    code that changes the user has to do so through ``model``.
+    """
+
+    def __init__(self, snapshot, model=None):
+        self.snapshot = snapshot
+        self._model = model
+
+    @property
+    def id(self):
+        return self.snapshot.id
+
+    @property
+    def username(self):
+        return self.snapshot.username
+
+    @property
+    def confirmed(self):
+        return self.snapshot.confirmed
+
+    @property
+    def model(self):
+        if self._model is None:
+            from app.models import User
+
+            self._model = User.query.get(self.snapshot.id)
+        return self._model
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.model, name)
+
+    def __repr__(self) -> str:
+        return "<CachedUser %r>" % self.snapshot.username
+
+    def can(self, permissions):
+        return (self.snapshot.permissions & permissions) == permissions
+
+    def is_administrator(self):
+        from app.models import Permission
+
+        return self.can(Permission.ADMIN)
+
+    def ping(self):
+        from app import last_seen
+
+        last_seen.record(self.snapshot.id)
+
+
+class IdentityState:
+    def __init__(self, size, ttl):
+        self.size = size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+
+class IdentityCache:
+    """
+    Bounded LRU cache of identity snapshots with a time to live, used by the
+    login manager's user loader. Configured by DIBS_IDENTITY_CACHE_SIZE and
+    DIBS_IDENTITY_CACHE_TTL; anything that changes a user's name, confirmed
+    flag or role has to ``invalidate()`` them.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions["identity"] = IdentityState(
+            size=app.config["DIBS_IDENTITY_CACHE_SIZE"],
+            ttl=app.config["DIBS_IDENTITY_CACHE_TTL"],
+        )
+
+    @property
+    def state(self) -> IdentityState:
+        return current_app.extensions["identity"]
+
+    def get(self, user_id):
+        state = self.state
+        with state.lock:
+            entry = state.entries.get(user_id)
+            if entry is None:
+                return None
+            snapshot, expires = entry
+            if expires < time.monotonic():
+                del state.entries[user_id]
+                return None
+            state.entries.move_to_end(user_id)
+            return snapshot
+
+    def put(self, snapshot):
+        state = self.state
+        with state.lock:
+            state.entries[snapshot.id] = (snapshot, time.monotonic() + state.ttl)
+            state.entries.move_to_end(snapshot.id)
+            while len(state.entries) > state.size:
+                state.entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        state = self.state
+        with state.lock:
+            state.entries.pop(user_id, None)
+
+    def clear(self):
+        state = self.state
+        with state.lock:
+            state.entries.clear()
+
+    def load(self, user_id):
+        """The user with this id as a ``CachedUser``, or None."""
+        snapshot = self.get(user_id)
+        if snapshot is not None:
+            return CachedUser(snapshot)
+        from app import refdata
+        from app.models import User
+
+        user = User.query.get(user_id)
+        if user is None:
+            return None
+        snapshot = IdentitySnapshot(
+            id=user.id,
+            username=user.username,
+            confirmed=bool(user.confirmed),
+            permissions=refdata.role_permissions(user.role_id) or 0,
+        )
+        self.put(snapshot)
+        return CachedUser(snapshot, model=user)
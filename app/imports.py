@@ -0,0 +1,172 @@
+import csv
+import io
+import itertools
+import json
+import re
+import time
+from collections import namedtuple
+
+from app import db, link_previews, refdata
+from app.models import Item, List
+from app.previews import normalize_url
+
+ImportResult = namedtuple("ImportResult", "rows seconds")
+
+FORMATS = ("csv", "json")
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+class ImportFailed(ValueError):
+    """A file could not be imported; nothing from it has been stored."""
+
+    def __init__(self, message, row=None):
+        if row is not None:
+            message = f"row {row}: {message}"
+        super().__init__(message)
+        self.row = row
+
+
+def guess_format(filename):
+    extension = filename.rsplit(".", 1)[-1].lower()
+    if extension in ("json", "jsonl", "ndjson"):
+        return "json"
+    return "csv"
+
+
+def iter_csv(stream):
+    """Rows of a CSV file with a header line (name, link, description, category)."""
+    reader = csv.DictReader(stream)
+    if reader.fieldnames is None:
+        return
+    reader.fieldnames = [field.strip().lower() for field in reader.fieldnames]
+    yield from reader
+
+
+def iter_json(stream, chunk_size=64 * 1024):
+    """
+    Objects from either a JSON array or JSON Lines, decoded one at a time so
+    that a large upload is never held in memory as a whole.
+    """
+    first = stream.read(1)
+    while first.isspace():
+        first = stream.read(1)
+    if not first:
+        return
+    if first != "[":
+        for n, line in enumerate(itertools.chain([first + stream.readline()], stream)):
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError as e:
+                    raise ImportFailed(f"invalid JSON ({e})", row=n + 1)
+        return
+    decoder = json.JSONDecoder()
+    buffer, pos, n = "", 0, 0
+    size, eof = chunk_size, False
+    # whether a record may come next: right after "[" or a ","
+    separated = True
+    while True:
+        pos = WHITESPACE.match(buffer, pos).end()
+        if pos < len(buffer):
+            char = buffer[pos]
+            if char == "]" and (n == 0 or not separated):
+                return
+            if not separated:
+                if char != ",":
+                    raise ImportFailed("expected , or ] after a record", row=n)
+                pos += 1
+                separated = True
+                continue
+            if char in ",]":
+                raise ImportFailed("expected a record", row=n + 1)
+            try:
+                record, end = decoder.raw_decode(buffer, pos)
+            except ValueError:
+                end = None
+            # a record ending with the buffer may be a number cut short
+            if end is not None and (end < len(buffer) or eof):
+                n += 1
+                pos, separated, size = end, False, chunk_size
+                yield record
+                continue
+            # the record spans chunks: read twice as much each time, so that
+            # a large one is decoded from its start only a few times
+            size *= 2
+        if eof:
+            raise ImportFailed("invalid or truncated JSON array", row=n + 1)
+        chunk = stream.read(size)
+        eof = not chunk
+        buffer, pos = buffer[pos:] + chunk, 0
+
+
+def text_field(record, name, row):
+    """A field of a record as stripped text; missing and null are empty."""
+    value = record.get(name)
+    if value is None:
+        return ""
+    if not isinstance(value, str):
+        raise ImportFailed(f"{name} must be text", row=row)
+    return value.strip()
+
+
+def item_rows(records, list_id):
+    """Validate parsed records and turn them into rows of the items table."""
+    categories = {c.name.lower(): c.id for c in refdata.categories()}
+    default = next((c.id for c in refdata.categories() if c.default), None)
+    for n, record in enumerate(records, start=1):
+        if not isinstance(record, dict):
+            raise ImportFailed("expected an object", row=n)
+        name = text_field(record, "name", n)
+        if not name:
+            raise ImportFailed("name is required", row=n)
+        category = text_field(record, "category", n)
+        category_id = categories.get(category.lower()) if category else default
+        if category_id is None:
+            raise ImportFailed(f"unknown category {category!r}", row=n)
+        link = text_field(record, "link", n)
+        yield {
+            "name": name,
+            "link": link,
+            "link_url": normalize_url(link),
+            "description": text_field(record, "description", n),
+            "category_id": category_id,
+            "list_id": list_id,
+        }
+
+
+def import_items(list_id, stream, format="csv", chunk_size=500) -> ImportResult:
+    """
+    Add every item in ``stream`` (a binary file) to a list, in chunked bulk
+    INSERTs inside one transaction: either the whole file is imported or,
+    if any row is invalid, none of it.
+    """
+    if format not in FORMATS:
+        raise ImportFailed(f"unsupported format {format!r}")
+    started = time.perf_counter()
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    records = iter_json(text) if format == "json" else iter_csv(text)
+    rows = item_rows(records, list_id)
+    total = 0
+    try:
+        while True:
+            chunk = list(itertools.islice(rows, chunk_size))
+            if not chunk:
+                break
+            db.session.execute(Item.__table__.insert(), chunk)
+            link_previews.request(row["link_url"] for row in chunk)
+            total += len(chunk)
+        if total:
+            List.bump_version(list_id)
+        db.session.commit()
+        link_previews.wake()
+    except (ImportFailed, UnicodeDecodeError, csv.Error) as e:
+        db.session.rollback()
+        if isinstance(e, ImportFailed):
+            raise
+        raise ImportFailed(str(e)) from e
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        text.detach()
+    return ImportResult(total, time.perf_counter() - started)
@@ -0,0 +1,272 @@
+import atexit
+import threading
+import time
+
+from flask import (
+    before_render_template,
+    current_app,
+    g,
+    has_app_context,
+    request,
+    request_started,
+    template_rendered,
+)
+from sqlalchemy import event
+from sqlalchemy.exc import SQLAlchemyError
+
+COUNTERS = (
+    "requests",
+    "errors",
+    "slow",
+    "total_ms",
+    "sql_queries",
+    "sql_ms",
+    "render_ms",
+)
+
+
+class RequestTiming:
+    """What one request has spent so far, kept in ``g.timing``."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_queries = 0
+        self.sql_time = 0.0
+        self.render_time = 0.0
+        self.rendering = []
+        self.status = None
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self):
+        return (
+            f'db;dur={self.sql_time * 1000:.1f};desc="{self.sql_queries} queries", '
+            f"render;dur={self.render_time * 1000:.1f}, "
+            f"total;dur={self.elapsed * 1000:.1f}"
+        )
+
+
+class EndpointCounters:
+    def __init__(self):
+        for name in COUNTERS:
+            setattr(self, name, 0)
+        self.max_ms = 0.0
+
+    def add(self, timing, total_ms, slow):
+        self.requests += 1
+        self.errors += timing.status is None or timing.status >= 500
+        self.slow += slow
+        self.total_ms += total_ms
+        self.max_ms = max(self.max_ms, total_ms)
+        self.sql_queries += timing.sql_queries
+        self.sql_ms += timing.sql_time * 1000
+        self.render_ms += timing.render_time * 1000
+
+    def merge(self, other):
+        for name in COUNTERS:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        self.max_ms = max(self.max_ms, other.max_ms)
+
+    def as_dict(self):
+        return dict(
+            {name: getattr(self, name) for name in COUNTERS}, max_ms=self.max_ms
+        )
+
+
+class InstrumentationState:
+    """
+    Per-endpoint counters of one app: ``totals`` since the process started
+    and ``pending``, the part not yet added to the endpoint_stats table.
+    """
+
+    def __init__(self, app):
+        config = app.config
+        self.app = app
+        self.server_timing = config["DIBS_SERVER_TIMING"]
+        self.slow_ms = config["DIBS_SLOW_REQUEST_MS"]
+        self.persist = config["DIBS_STATS_PERSIST"]
+        self.interval = config["DIBS_STATS_FLUSH_INTERVAL"]
+        self.totals = {}
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.flushed_at = time.monotonic()
+
+    def record(self, endpoint, timing):
+        total_ms = timing.elapsed * 1000
+        slow = total_ms >= self.slow_ms
+        if slow:
+            self.app.logger.warning(
+                "slow request: %s %s (%s) took %.0f ms, %d queries in %.0f ms, "
+                "%.0f ms rendering",
+                request.method,
+                request.full_path.rstrip("?"),
+                endpoint,
+                total_ms,
+                timing.sql_queries,
+                timing.sql_time * 1000,
+                timing.render_time * 1000,
+            )
+        budget = getattr(self.app.view_functions.get(endpoint), "query_budget", None)
+        if budget is not None and timing.sql_queries > budget:
+            self.app.logger.warning(
+                "query budget exceeded: %s %s (%s) ran %d queries, budget %d",
+                request.method,
+                request.full_path.rstrip("?"),
+                endpoint,
+                timing.sql_queries,
+                budget,
+            )
+        with self.lock:
+            for counters in (self.totals, self.pending):
+                counters.setdefault(endpoint, EndpointCounters()).add(
+                    timing, total_ms, slow
+                )
+            due = self.persist and time.monotonic() - self.flushed_at >= self.interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Add the pending counters to the endpoint_stats table."""
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            self.flushed_at = time.monotonic()
+        if not pending or not self.persist:
+            return 0
+        from sqlalchemy.dialects.sqlite import insert
+
+        from app import db
+        from app.models import EndpointStat
+
+        stats = EndpointStat.__table__
+        statement = insert(stats)
+        statement = statement.on_conflict_do_update(
+            index_elements=[stats.c.endpoint],
+            set_=dict(
+                {name: stats.c[name] + statement.excluded[name] for name in COUNTERS},
+                max_ms=db.func.max(stats.c.max_ms, statement.excluded.max_ms),
+            ),
+        )
+        try:
+            with self.app.app_context(), db.engine.begin() as connection:
+                connection.execute(
+                    statement,
+                    [
+                        dict(counters.as_dict(), endpoint=endpoint)
+                        for endpoint, counters in pending.items()
+                    ],
+                )
+        except SQLAlchemyError:
+            # flushes run in request teardown; keep the counters for the next
+            self.app.logger.exception("could not flush endpoint stats")
+            self.restore(pending)
+            return 0
+        return len(pending)
+
+    def restore(self, pending):
+        """Add counters that failed to flush back to the pending ones."""
+        with self.lock:
+            for endpoint, counters in pending.items():
+                self.pending.setdefault(endpoint, EndpointCounters()).merge(counters)
+
+    def close(self):
+        self.flush()
+
+
+class Instrumentation:
+    """
+    Times every request: SQL statements and their duration (from engine
+    events), template rendering (from Flask's template signals) and the whole
+    request. The figures go out as a ``Server-Timing`` header, requests over
+    DIBS_SLOW_REQUEST_MS or over their view's @query_budget are logged, and
+    per-endpoint counters are kept in memory and, with DIBS_STATS_PERSIST,
+    added to the endpoint_stats table every DIBS_STATS_FLUSH_INTERVAL seconds
+    for ``flask stats``.
+
+    The header is written before a streamed body is sent, so for streamed
+    responses it only covers the view; the counters and the slow log cover
+    the whole response.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        from app import db
+
+        state = InstrumentationState(app)
+        app.extensions["instrumentation"] = state
+        with app.app_context():
+            self.watch(db.engine)
+        request_started.connect(self.request_started, app)
+        before_render_template.connect(self.before_render_template, app)
+        template_rendered.connect(self.template_rendered, app)
+        app.after_request(self.after_request)
+        app.teardown_request(self.teardown_request)
+        if state.persist:
+            atexit.register(state.close)
+
+    @property
+    def state(self) -> InstrumentationState:
+        return current_app.extensions["instrumentation"]
+
+    def watch(self, engine):
+        """Count the statements run on ``engine`` as well."""
+        event.listen(engine, "before_cursor_execute", self.before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self.after_cursor_execute)
+
+    @staticmethod
+    def before_cursor_execute(conn, cursor, statement, parameters, context, many):
+        conn.info["query_started"] = time.perf_counter()
+
+    @staticmethod
+    def after_cursor_execute(conn, cursor, statement, parameters, context, many):
+        timing = g.get("timing") if has_app_context() else None
+        if timing is not None:
+            timing.sql_queries += 1
+            timing.sql_time += time.perf_counter() - conn.info["query_started"]
+
+    @staticmethod
+    def request_started(sender, **extra):
+        g.timing = RequestTiming()
+
+    @staticmethod
+    def before_render_template(sender, template, context, **extra):
+        timing = g.get("timing")
+        if timing is not None:
+            timing.rendering.append(time.perf_counter())
+
+    @staticmethod
+    def template_rendered(sender, template, context, **extra):
+        timing = g.get("timing")
+        if timing is not None and timing.rendering:
+            started = timing.rendering.pop()
+            # templates rendered from within templates are already included
+            if not timing.rendering:
+                timing.render_time += time.perf_counter() - started
+
+    def after_request(self, response):
+        timing = g.get("timing")
+        if timing is not None:
+            timing.status = response.status_code
+            if self.state.server_timing:
+                response.headers["Server-Timing"] = timing.server_timing()
+        return response
+
+    def teardown_request(self, exc):
+        timing = g.pop("timing", None)
+        if timing is not None:
+            self.state.record(request.endpoint or "<unmatched>", timing)
+
+    def stats(self):
+        """This process's counters per endpoint, as plain dicts."""
+        with self.state.lock:
+            return {
+                endpoint: counters.as_dict()
+                for endpoint, counters in self.state.totals.items()
+            }
+
+    def flush(self):
+        return self.state.flush()
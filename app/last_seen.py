@@ -0,0 +1,117 @@
+import atexit
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import bindparam
+from sqlalchemy.exc import SQLAlchemyError
+
+
+class LastSeenBuffer:
+    """
+    Pending last_seen timestamps of one app, keyed by user id.
+
+    Pings only touch this dict; the timestamps reach the users table in one
+    batched UPDATE once the buffer is older than ``interval`` seconds or holds
+    ``size`` users, and once more when the process exits.
+    """
+
+    def __init__(self, app, interval, size):
+        self.app = app
+        self.interval = interval
+        self.size = size
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.flushed_at = time.monotonic()
+
+    def record(self, user_id, seen=None):
+        seen = seen or datetime.utcnow()
+        with self.lock:
+            self.pending[user_id] = seen
+            due = (
+                len(self.pending) >= self.size
+                or time.monotonic() - self.flushed_at >= self.interval
+            )
+        if due:
+            self.flush()
+
+    def get(self, user_id):
+        with self.lock:
+            return self.pending.get(user_id)
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            self.flushed_at = time.monotonic()
+        if not pending:
+            return 0
+        from app import db
+        from app.models import User
+
+        users = User.__table__
+        statement = (
+            users.update()
+            .where(users.c.id == bindparam("user_id"))
+            .values(last_seen=bindparam("seen"))
+        )
+        try:
+            with self.app.app_context(), db.engine.begin() as connection:
+                connection.execute(
+                    statement,
+                    [{"user_id": uid, "seen": seen} for uid, seen in pending.items()],
+                )
+        except SQLAlchemyError:
+            # flushes run inside requests, which must not fail over a
+            # timestamp; keep the batch for the next flush instead
+            self.app.logger.exception("could not flush last_seen timestamps")
+            self.restore(pending)
+            return 0
+        return len(pending)
+
+    def restore(self, pending):
+        """Put back a batch that failed to flush, keeping the newest of each."""
+        with self.lock:
+            for user_id, seen in pending.items():
+                newer = self.pending.get(user_id)
+                if newer is None or newer < seen:
+                    self.pending[user_id] = seen
+
+    def close(self):
+        """Flush at interpreter exit."""
+        self.flush()
+
+
+class LastSeenTracker:
+    """
+    Write-coalescing replacement for updating ``User.last_seen`` on every
+    request. Configured by DIBS_LAST_SEEN_FLUSH_INTERVAL and
+    DIBS_LAST_SEEN_FLUSH_SIZE.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        buffer = LastSeenBuffer(
+            app,
+            interval=app.config["DIBS_LAST_SEEN_FLUSH_INTERVAL"],
+            size=app.config["DIBS_LAST_SEEN_FLUSH_SIZE"],
+        )
+        app.extensions["last_seen"] = buffer
+        atexit.register(buffer.close)
+
+    @property
+    def buffer(self) -> LastSeenBuffer:
+        return current_app.extensions["last_seen"]
+
+    def record(self, user_id, seen=None):
+        self.buffer.record(user_id, seen)
+
+    def get(self, user_id, default=None):
+        """The freshest known last_seen of a user, flushed or not."""
+        return self.buffer.get(user_id) or default
+
+    def flush(self):
+        return self.buffer.flush()
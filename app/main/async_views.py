@@ -0,0 +1,61 @@
+"""
+Coroutine versions of the read-heavy pages, which the ASGI entry point
+(app/asgi.py) runs on its event loop instead of a worker thread. They render
+the same ``show_*`` page functions as the views in views.py, with their
+queries awaited through ``async_db``, so both serving modes give the same
+responses. Only GET and HEAD requests come here; posting to these URLs goes
+to the ordinary views.
+"""
+
+from flask import current_app, render_template, request
+from flask.typing import ResponseReturnValue
+from flask_login import current_user
+from flask_login.config import EXEMPT_METHODS
+
+from app import async_db
+from app.main.forms import ItemForm
+from app.main.views import show_feed, show_list, show_profile
+
+ASYNC_VIEWS = {}
+
+
+def async_view(endpoint):
+    """Serve GET and HEAD requests for ``endpoint`` with the decorated coroutine."""
+
+    def decorator(f):
+        ASYNC_VIEWS[endpoint] = f
+        return f
+
+    return decorator
+
+
+def login_required(f):
+    """flask_login's ``login_required`` for coroutines."""
+
+    async def decorated_view(*args, **kwargs):
+        if request.method in EXEMPT_METHODS or current_app.config.get("LOGIN_DISABLED"):
+            pass
+        elif not current_user.is_authenticated:
+            return current_app.login_manager.unauthorized()
+        return await f(*args, **kwargs)
+
+    return decorated_view
+
+
+@async_view("main.index")
+async def index() -> ResponseReturnValue:
+    if current_user.is_authenticated:
+        return await async_db.run(show_feed)
+    else:
+        return render_template("index.html")
+
+
+@async_view("main.view_list")
+@login_required
+async def view_list(list_id) -> ResponseReturnValue:
+    return await async_db.run(show_list, list_id, ItemForm(list_id=list_id))
+
+
+@async_view("main.profile")
+async def profile(username) -> ResponseReturnValue:
+    return await async_db.run(show_profile, username)
@@ -1,7 +1,13 @@
 from flask import render_template
+from app.hashing import HashingBusy
 from . import main
 
 
 @main.app_errorhandler(404)
 def page_not_found(e):
     return render_template("404.html"), 404
+
+
+@main.app_errorhandler(HashingBusy)
+def hashing_busy(e):
+    return render_template("503.html"), 503, {"Retry-After": "5"}
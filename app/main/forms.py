@@ -1,4 +1,5 @@
 from flask_wtf import FlaskForm
+from flask_wtf.file import FileAllowed, FileField, FileRequired
 from wtforms import (
     BooleanField,
     SelectField,
@@ -9,7 +10,8 @@ from wtforms import (
 )
 from wtforms.validators import DataRequired, Length, Email, Regexp
 
-from app.models import Category, Role, User
+from app import refdata
+from app.models import User
 
 
 class NameForm(FlaskForm):
@@ -31,11 +33,21 @@ class ItemForm(FlaskForm):
     def __init__(self, *args, **kwargs):
         super(ItemForm, self).__init__(*args, **kwargs)
         self.category_id.choices = [
-            (category.id, category.name)
-            for category in Category.query.order_by(Category.id).all()
+            (category.id, category.name) for category in refdata.categories()
         ]
 
 
+class ImportForm(FlaskForm):
+    file = FileField(
+        "CSV or JSON file: ",
+        validators=[
+            FileRequired(),
+            FileAllowed(["csv", "json", "jsonl", "ndjson"], "CSV or JSON files only"),
+        ],
+    )
+    submit = SubmitField("Import Items")
+
+
 class UserEditForm(FlaskForm):
     email = StringField(
         "Email: ",
@@ -63,9 +75,7 @@ class UserEditForm(FlaskForm):
 
     def __init__(self, user, *args, **kwargs):
         super(UserEditForm, self).__init__(*args, **kwargs)
-        self.role.choices = [
-            (role.id, role.name) for role in Role.query.order_by(Role.name).all()
-        ]
+        self.role.choices = [(role.id, role.name) for role in refdata.roles()]
         self.user = user
 
     def validate_email(self, field):
@@ -86,3 +96,11 @@ class UserEditForm(FlaskForm):
 class CommentForm(FlaskForm):
     body = TextAreaField("Comment: ", validators=[DataRequired()])
     submit = SubmitField("Add Comment")
+
+
+class ClaimForm(FlaskForm):
+    submit = SubmitField("Dibs!")
+
+
+class UnclaimForm(FlaskForm):
+    submit = SubmitField("Take back dibs")
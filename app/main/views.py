@@ -1,43 +1,218 @@
-from flask import abort, current_app, flash, redirect, render_template, session, url_for
+from flask import (
+    abort,
+    current_app,
+    flash,
+    redirect,
+    render_template,
+    request,
+    session,
+    url_for,
+)
 from flask.typing import ResponseReturnValue
 from flask_login import current_user, login_required
+from sqlalchemy import func, null, select
+from sqlalchemy.orm import joinedload
 
-from app import db
-from app.decorators import admin_required
+from app import db, fragments, identity_cache, last_seen, link_previews, refdata
+from app.decorators import admin_required, permission_required, query_budget
+from app.conditional import Validator
 from app.email import send_email
-from app.main.forms import CommentForm, ItemForm, ListForm, NameForm, UserEditForm
-from app.models import Category, Comment, Item, List, Permission, Role, User
+from app.feed import feed_page
+from app.imports import ImportFailed, guess_format, import_items
+from app.main.forms import (
+    ClaimForm,
+    CommentForm,
+    ImportForm,
+    ItemForm,
+    ListForm,
+    NameForm,
+    UnclaimForm,
+    UserEditForm,
+)
+from app.models import Claim, Comment, Item, LinkPreview, List, Permission, User
+from app.previews import normalize_url
+from app.search import search as search_index
+from app.streaming import stream_page
 
 from . import main
 
 
+def group_list_items(currentlist, categories, with_comments=True, session=None) -> dict:
+    """
+    Load the items of a list (and, unless the viewer owns it, their comments)
+    in a single query and group them by category name in one pass. Link
+    previews are whatever has been fetched so far.
+    """
+    columns = (
+        Item.id,
+        Item.name,
+        Item.description,
+        Item.category_id,
+        Item.comment_count,
+        Item.claimer_id,
+        Item.link_url,
+        LinkPreview.title,
+        LinkPreview.image,
+        LinkPreview.price,
+    )
+    query = (session or db.session).query(*columns)
+    query = query.filter(Item.list_id == currentlist.id)
+    query = query.outerjoin(
+        LinkPreview,
+        db.and_(LinkPreview.url == Item.link_url, LinkPreview.status == "fetched"),
+    )
+    if with_comments:
+        query = query.add_entity(Comment).outerjoin(Comment, Comment.item_id == Item.id)
+        query = query.order_by(Item.id, Comment.id)
+    else:
+        query = query.add_columns(null()).order_by(Item.id)
+
+    by_category = {category.id: [] for category in categories}
+    entries = {}
+    for (
+        item_id,
+        name,
+        description,
+        category_id,
+        comment_count,
+        claimer_id,
+        link_url,
+        link_title,
+        link_image,
+        link_price,
+        comment,
+    ) in query:
+        entry = entries.get(item_id)
+        if entry is None:
+            entry = entries[item_id] = {
+                "id": item_id,
+                "name": name,
+                "description": description,
+                "comment_count": comment_count,
+                "claimer_id": claimer_id,
+                "link": (
+                    {
+                        "url": link_url,
+                        "title": link_title,
+                        "image": link_image,
+                        "price": link_price,
+                    }
+                    if link_url
+                    else None
+                ),
+                "comments": [],
+            }
+            if category_id in by_category:
+                by_category[category_id].append(entry)
+        if comment is not None:
+            entry["comments"].append(comment)
+    return {category.name: by_category[category.id] for category in categories}
+
+
+def viewer_class(currentlist) -> str:
+    """
+    Which rendering of a list the current user gets: owners never see
+    comments, admins get delete links for everything.
+    """
+    viewer = "owner" if current_user.id == currentlist.author_id else "guest"
+    if current_user.is_administrator():
+        viewer = "owner-admin" if viewer == "owner" else "admin"
+    return viewer
+
+
+def url_prefix(endpoint, last, **values) -> str:
+    """
+    The URL of ``endpoint`` for ``values``, up to its last variable ``last``,
+    for templates to append each row's value to instead of calling
+    ``url_for`` once per row.
+    """
+    placeholder = "__dibs_url_prefix__"
+    url = url_for(endpoint, **values, **{last: placeholder})
+    if not url.endswith(placeholder):
+        raise ValueError(f"{last} is not at the end of the URL of {endpoint}")
+    return url[: -len(placeholder)]
+
+
+def list_validator(currentlist, viewer, session=None) -> Validator:
+    """
+    Validator for a list page, from the newest item and, for viewers that see
+    them, the newest comment on the list.
+    """
+    columns = [func.count(Item.id), func.max(Item.timestamp)]
+    if not viewer.startswith("owner"):
+        on_list = Comment.list_id == currentlist.id
+        columns += [
+            select(func.count(Comment.id)).where(on_list).scalar_subquery(),
+            select(func.max(Comment.timestamp)).where(on_list).scalar_subquery(),
+        ]
+    stamp = (
+        (session or db.session)
+        .query(*columns)
+        .filter(Item.list_id == currentlist.id)
+        .one()
+    )
+    return Validator(
+        currentlist.id,
+        currentlist.title,
+        currentlist.version,
+        viewer,
+        current_user.id,
+        current_user.username,
+        tuple(stamp),
+    )
+
+
 @main.route("/", methods=["GET", "POST"])
+@query_budget(2)
 def index() -> ResponseReturnValue:
     if current_user.is_authenticated:
-        user = User.query.filter_by(username=current_user.username).first()
-        lists = List.query.filter(List.author_id != user.id).all()
+        return show_feed(db.session)
+    else:
+        return render_template("index.html")
 
-        # TODO Is this best practice? It works but it feels wrong
-        for l in lists:
-            author = User.query.filter_by(id=l.author_id).first()
-            l.author = author
 
-        return render_template(
+def show_feed(session) -> ResponseReturnValue:
+    """
+    The index page of a logged-in user: a page of other people's lists.
+    ``session`` runs the queries (see app/main/async_views.py).
+    """
+    cursor = request.args.get("before")
+    lists, next_cursor = feed_page(
+        current_user.id,
+        cursor=cursor,
+        per_page=current_app.config["DIBS_LISTS_PER_PAGE"],
+        session=session,
+    )
+    claims = Item.claim_summary([l.id for l in lists], session)
+    validator = Validator(
+        current_user.id,
+        current_user.username,
+        cursor,
+        [(l.id, l.title, l.timestamp, l.author.username) for l in lists],
+        sorted(claims.items()),
+    )
+    not_modified = validator.not_modified()
+    if not_modified is not None:
+        return not_modified
+    return validator.respond(
+        stream_page(
             "index.html",
             lists=lists,
+            claims=claims,
+            next_cursor=next_cursor,
         )
-    else:
-        return render_template("index.html")
+    )
 
 
 @main.route("/lists/create", methods=["GET", "POST"])
+@query_budget(2)
 @login_required
 def create_list() -> ResponseReturnValue:
     form = ListForm()
     if current_user.can(Permission.CREATE) and form.validate_on_submit():
         newlist = List(
             title=form.title.data,
-            author=current_user._get_current_object(),
+            author_id=current_user.id,
         )
         db.session.add(newlist)
         db.session.commit()
@@ -49,6 +224,7 @@ def create_list() -> ResponseReturnValue:
 
 
 @main.route("/lists/<list_id>", methods=["GET", "POST"])
+@query_budget(3)
 @login_required
 def view_list(list_id) -> ResponseReturnValue:
     """
@@ -56,115 +232,310 @@ def view_list(list_id) -> ResponseReturnValue:
     """
     itemform = ItemForm(list_id=list_id)
     if current_user.can(Permission.READ) and itemform.validate_on_submit():
+        link_url = normalize_url(itemform.link.data)
         newitem = Item(
             name=itemform.name.data,
             link=itemform.link.data,
+            link_url=link_url,
             description=itemform.description.data,
             category_id=itemform.category_id.data,
             list_id=list_id,
         )
         db.session.add(newitem)
+        link_previews.request([link_url])
+        List.bump_version(list_id)
+        db.session.commit()
+        link_previews.wake()
         return redirect(url_for("main.view_list", list_id=list_id))
-    currentlist = List.query.filter_by(id=list_id).first()
-    author = User.query.filter_by(id=currentlist.author_id).first()
-    categories = Category.query.all()
-    comments = Comment.query.filter_by(list_id=list_id).all()
-    items_query = Item.query.filter_by(list_id=currentlist.id).all()
-    items = {
-        category.name: [
-            {
-                "id": item.id,
-                "name": item.name,
-                "description": item.description,
-                "comments": [
-                    comment for comment in comments if comment.item_id == item.id
-                ],
-            }
-            for item in items_query
-            if item.category_id == category.id
-        ]
-        for category in categories
-    }
+    return show_list(db.session, list_id, itemform)
 
-    commentform = CommentForm(list_id=list_id)
 
-    return render_template(
-        "list.html",
-        currentlist=currentlist,
-        author=author,
-        items=items,
-        categories=categories,
-        itemform=itemform,
-        commentform=commentform,
+def show_list(session, list_id, itemform) -> ResponseReturnValue:
+    """
+    A list page, with ``itemform`` for its owner to add items. ``session``
+    runs the queries (see app/main/async_views.py).
+    """
+    currentlist = (
+        session.query(List)
+        .options(joinedload(List.author))
+        .filter_by(id=list_id)
+        .first()
     )
+    if currentlist is None:
+        abort(404)
+    author = currentlist.author
+    viewer = viewer_class(currentlist)
+    validator = list_validator(currentlist, viewer, session)
+    not_modified = validator.not_modified()
+    if not_modified is not None:
+        return not_modified
+    key = ("list", currentlist.id, currentlist.version, viewer)
+    is_owner = viewer.startswith("owner")
+
+    def context():
+        items = group_list_items(
+            currentlist, refdata.categories(), not is_owner, session
+        )
+        urls = dict(
+            delete_item=url_prefix("main.delete_item", "item_id", list_id=list_id),
+            delete_comment=url_prefix(
+                "main.delete_comment", "comment_id", list_id=list_id
+            ),
+            create_comment=url_prefix(
+                "main.create_comment", "item_id", list_id=list_id
+            ),
+            claim=url_prefix("main.claim_item", "item_id", list_id=list_id),
+            unclaim=url_prefix("main.unclaim_item", "item_id", list_id=list_id),
+        )
+        return dict(
+            currentlist=currentlist,
+            items=items,
+            urls=urls,
+            commentform=CommentForm(list_id=list_id),
+            claimform=ClaimForm(),
+            unclaimform=UnclaimForm(),
+            is_owner=is_owner,
+            is_admin=viewer.endswith("admin"),
+        )
+
+    items_html = fragments.render(key, "list_items.html", context, current_user.id)
+
+    return validator.respond(
+        stream_page(
+            "list.html",
+            currentlist=currentlist,
+            author=author,
+            items_html=items_html,
+            itemform=itemform,
+            importform=ImportForm(),
+        )
+    )
+
+
+@main.route("/lists/<list_id>/import", methods=["POST"])
+@query_budget(4)
+@login_required
+def import_list_items(list_id) -> ResponseReturnValue:
+    """
+    Add all items from an uploaded CSV or JSON file to a list
+    """
+    currentlist = List.query.get_or_404(list_id)
+    if current_user.id != currentlist.author_id:
+        abort(403)
+    form = ImportForm()
+    if form.validate_on_submit():
+        upload = form.file.data
+        try:
+            result = import_items(
+                currentlist.id, upload.stream, guess_format(upload.filename)
+            )
+        except ImportFailed as e:
+            flash(f"Nothing was imported: {e}")
+        else:
+            rate = result.rows / result.seconds if result.seconds else result.rows
+            flash(f"Imported {result.rows} items ({rate:.0f} rows per second)")
+    else:
+        for error in form.file.errors:
+            flash(error)
+    return redirect(url_for("main.view_list", list_id=currentlist.id))
 
 
 @main.route("/lists/<list_id>/delete", methods=["GET", "POST"])
+@query_budget(5)
 @login_required
 def delete_list(list_id) -> ResponseReturnValue:
     currentlist = List.query.filter_by(id=list_id).first()
+    if currentlist is None:
+        abort(404)
     if current_user.can(Permission.DELETE):
-        db.session.delete(currentlist)
-        flash(f'Your list "{currentlist.title}" has been deleted')
+        title = currentlist.title
+        List.delete_cascade(currentlist.id)
+        db.session.commit()
+        flash(f'Your list "{title}" has been deleted')
     else:
         flash(f"Sorry, you can't delete anything. People might have called dibs on it")
     return redirect(url_for("main.profile", username=current_user.username))
 
 
 @main.route("/lists/<list_id>/delete/<item_id>", methods=["GET", "POST"])
+@query_budget(5)
 @login_required
 def delete_item(list_id, item_id) -> ResponseReturnValue:
     item = Item.query.filter_by(id=item_id).first()
+    if item is None:
+        abort(404)
     if current_user.can(Permission.DELETE):
-        db.session.delete(item)
-        flash(f'The item "{item.name}" has been deleted')
+        name = item.name
+        Item.delete_cascade(item.id)
+        List.bump_version(item.list_id)
+        db.session.commit()
+        flash(f'The item "{name}" has been deleted')
     else:
         flash(f"Sorry, you can't delete anything. People might have called dibs on it")
     return redirect(url_for("main.view_list", list_id=list_id))
 
 
 @main.route("/lists/<list_id>/create_comment/<item_id>", methods=["POST"])
+@query_budget(4)
 @login_required
 def create_comment(list_id, item_id) -> ResponseReturnValue:
     item = Item.query.filter_by(id=item_id).first()
+    if item is None or str(item.list_id) != list_id:
+        abort(404)
     form = CommentForm()
     if current_user.can(Permission.COMMENT) and form.validate_on_submit():
         comment = Comment(
             body=form.body.data,
-            list_id=list_id,
-            item_id=item_id,
+            list_id=item.list_id,
+            item_id=item.id,
             author_id=current_user.id,
             author=current_user.username,
         )
         db.session.add(comment)
+        Item.comment_added(item.id)
+        List.bump_version(item.list_id)
         db.session.commit()
         flash("Your comment has been added")
     return redirect(url_for("main.view_list", list_id=list_id))
 
 
 @main.route("/lists/<list_id>/delete_comment/<comment_id>", methods=["GET", "POST"])
+@query_budget(4)
 @login_required
 def delete_comment(list_id, comment_id) -> ResponseReturnValue:
     comment = Comment.query.filter_by(id=comment_id).first()
-    if current_user.id == comment.author_id or current_user.is_administrator:
+    if comment is None or str(comment.list_id) != list_id:
+        abort(404)
+    if current_user.id == comment.author_id or current_user.is_administrator():
         db.session.delete(comment)
+        Item.comment_removed(comment.item_id)
+        List.bump_version(comment.list_id)
+        db.session.commit()
         flash(f"Your comment has been deleted")
     return redirect(url_for("main.view_list", list_id=list_id))
 
 
+@main.route("/lists/<list_id>/claim/<item_id>", methods=["POST"])
+@query_budget(3)
+@login_required
+def claim_item(list_id, item_id) -> ResponseReturnValue:
+    """
+    Call dibs on an item. Of any number of people doing so at once, exactly
+    one gets it (see Claim).
+    """
+    form = ClaimForm()
+    if current_user.can(Permission.COMMENT) and form.validate_on_submit():
+        if Claim.claim(list_id, item_id, current_user.id):
+            db.session.commit()
+            flash("You called dibs! Nobody else can claim it now")
+            return redirect(url_for("main.view_list", list_id=list_id))
+        db.session.rollback()
+        # why not, in an order that tells the author nothing about claims
+        found = (
+            db.session.query(List.author_id, Claim.user_id)
+            .select_from(Item)
+            .join(List, List.id == Item.list_id)
+            .outerjoin(Claim, Claim.item_id == Item.id)
+            .filter(Item.id == item_id, Item.list_id == list_id)
+            .first()
+        )
+        if found is None:
+            abort(404)
+        author_id, claimer_id = found
+        if author_id == current_user.id:
+            flash("You can't call dibs on your own list")
+        elif claimer_id == current_user.id:
+            flash("You have already called dibs on that")
+        else:
+            flash("Sorry, somebody else called dibs on that first")
+    return redirect(url_for("main.view_list", list_id=list_id))
+
+
+@main.route("/lists/<list_id>/unclaim/<item_id>", methods=["POST"])
+@query_budget(3)
+@login_required
+def unclaim_item(list_id, item_id) -> ResponseReturnValue:
+    """Take back one's dibs on an item."""
+    form = UnclaimForm()
+    if form.validate_on_submit():
+        if Claim.unclaim(list_id, item_id, current_user.id):
+            db.session.commit()
+            flash("You took back your dibs")
+        else:
+            db.session.rollback()
+            flash("You hadn't called dibs on that")
+    return redirect(url_for("main.view_list", list_id=list_id))
+
+
+@main.route("/search")
+@query_budget(3)
+@login_required
+@permission_required(Permission.READ)
+def search() -> ResponseReturnValue:
+    """
+    Lists and items matching ``q``, best match first
+    """
+    config = current_app.config
+    query = request.args.get("q", "").strip()
+    page = max(request.args.get("page", 1, type=int), 1)
+    if page > config["DIBS_SEARCH_MAX_PAGES"]:
+        abort(404)
+    results, has_next = search_index(
+        query,
+        page,
+        config["DIBS_SEARCH_PER_PAGE"],
+        config["DIBS_SEARCH_CANDIDATES"],
+    )
+    has_next = has_next and page < config["DIBS_SEARCH_MAX_PAGES"]
+    return render_template(
+        "search.html", query=query, results=results, page=page, has_next=has_next
+    )
+
+
 @main.route("/user/<username>")
+@query_budget(3)
 def profile(username) -> ResponseReturnValue:
     """
     User profile, shows their lists
     """
-    user = User.query.filter_by(username=username).first()
+    return show_profile(db.session, username)
+
+
+def show_profile(session, username) -> ResponseReturnValue:
+    """
+    The profile page of ``username``. ``session`` runs the queries (see
+    app/main/async_views.py).
+    """
+    user = session.query(User).filter_by(username=username).first()
     if user is None:
         abort(404)
-    lists = List.query.filter_by(author_id=user.id).all()
-    return render_template("profile.html", user=user, lists=lists)
+    seen = last_seen.get(user.id, user.last_seen)
+    lists = session.query(List).filter_by(author_id=user.id).all()
+    claims = {}
+    if current_user.is_authenticated and current_user.id != user.id:
+        # the author of a list must not find out what has been claimed
+        claims = Item.claim_summary([l.id for l in lists], session)
+    validator = Validator(
+        user.id,
+        user.username,
+        seen,
+        [(l.id, l.title, l.timestamp) for l in lists],
+        sorted(claims.items()),
+        current_user.get_id(),
+        current_user.is_administrator(),
+    )
+    not_modified = validator.not_modified()
+    if not_modified is not None:
+        return not_modified
+    return validator.respond(
+        stream_page(
+            "profile.html", user=user, lists=lists, claims=claims, last_seen=seen
+        )
+    )
 
 
 @main.route("/user/<username>/settings")
+@query_budget(1)
 @login_required
 def settings(username) -> ResponseReturnValue:
     """
@@ -177,6 +548,7 @@ def settings(username) -> ResponseReturnValue:
 
 
 @main.route("/user/<username>/edit", methods=["GET", "POST"])
+@query_budget(3)
 @login_required
 @admin_required
 def edit_user(username) -> ResponseReturnValue:
@@ -191,9 +563,11 @@ def edit_user(username) -> ResponseReturnValue:
         user.email = form.email.data
         user.username = form.username.data
         user.confirmed = form.confirmed.data
-        user.role = Role.query.get(form.role.data)
+        user.role_id = form.role.data
         db.session.add(user)
         db.session.commit()
+        refdata.invalidate()
+        identity_cache.invalidate(user.id)
         flash("The profile has been updated.")
         return redirect(url_for("main.edit_user", username=user.username))
     form.email.data = user.email
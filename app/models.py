@@ -2,16 +2,16 @@ from flask import current_app
 from flask_login import AnonymousUserMixin, UserMixin
 from flask_login.login_manager import datetime
 from itsdangerous import Serializer
-from werkzeug.security import check_password_hash, generate_password_hash
+from sqlalchemy.dialects.sqlite import insert
 
-from app import db
+from app import db, identity_cache, last_seen, passwords, refdata
 
 from . import login_manager
 
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    return identity_cache.load(int(user_id))
 
 
 class Permission:
@@ -44,6 +44,8 @@ class Role(db.Model):
             role.default = roles[r][1]
             db.session.add(role)
         db.session.commit()
+        refdata.invalidate()
+        identity_cache.clear()
 
     def __repr__(self) -> str:
         return "<Role %r>" % self.name
@@ -72,8 +74,7 @@ class User(UserMixin, db.Model):
         return "<User %r>" % self.username
 
     def ping(self):
-        self.last_seen = datetime.utcnow()
-        db.session.add(self)
+        last_seen.record(self.id)
 
     @property
     def password(self) -> None:
@@ -81,10 +82,19 @@ class User(UserMixin, db.Model):
 
     @password.setter
     def password(self, password) -> None:
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = passwords.hash(password)
 
     def verify_password(self, password) -> bool:
-        return check_password_hash(self.password_hash, password)
+        """
+        Check a password, upgrading the stored hash to the configured method
+        if it matches and was made with an older one.
+        """
+        if not passwords.verify(self.password_hash, password):
+            return False
+        if passwords.needs_rehash(self.password_hash):
+            self.password = password
+            db.session.add(self)
+        return True
 
     # TODO: if the serializer is passed expiration as an int, it will complain.
     # if it is passed expiration as a string, it will create a token that can't be
@@ -111,6 +121,7 @@ class User(UserMixin, db.Model):
 
     @staticmethod
     def reset_password(token, new_password):
+        """The id of the user whose password the token reset, or False."""
         s = Serializer(current_app.config["SECRET_KEY"])
         try:
             data = s.loads(token)
@@ -122,7 +133,7 @@ class User(UserMixin, db.Model):
             return False
         user.password = new_password
         db.session.add(user)
-        return True
+        return user.id
 
     def generate_email_change_token(self, new_email):
         s = Serializer(current_app.config["SECRET_KEY"])
@@ -146,9 +157,14 @@ class User(UserMixin, db.Model):
         return True
 
     def can(self, permissions):
+        role_id = self.role_id
+        if role_id is None and self.role is not None:
+            # not flushed yet, so only the relationship knows the role
+            role_id = self.role.id
+        role_permissions = refdata.role_permissions(role_id)
         return (
-            self.role is not None
-            and (self.role.permissions & permissions) == permissions
+            role_permissions is not None
+            and (role_permissions & permissions) == permissions
         )
 
     def is_administrator(self):
@@ -171,12 +187,48 @@ login_manager.anonymous_user = AnonymousUser
 
 class List(db.Model):
     __tablename__ = "lists"
+    __table_args__ = (
+        # a user's lists, newest first (profile, /api/v1/users/<name>/lists)
+        db.Index("ix_lists_author_id_timestamp", "author_id", "timestamp"),
+    )
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.Text)
     timestamp = db.Column(db.DateTime, index=True, default=datetime.utcnow)
     author_id = db.Column(db.Integer, db.ForeignKey("users.id"))
+    version = db.Column(db.Integer, nullable=False, default=0, server_default="0")
     items = db.relationship("Item", backref="list", lazy="dynamic")
 
+    @staticmethod
+    def bump_version(list_id):
+        """
+        Mark a list as changed, e.g. for cached renderings of it. Call this in
+        the same transaction as the change.
+        """
+        db.session.execute(
+            db.update(List).where(List.id == list_id).values(version=List.version + 1)
+        )
+
+    @staticmethod
+    def delete_cascade(list_id) -> bool:
+        """
+        Delete a list with its items, their comments and claims, in one
+        statement per table rather than one per row. Returns whether the list
+        existed; commit afterwards.
+        """
+        items = db.select(Item.id).where(Item.list_id == list_id)
+        for statement in (
+            db.delete(Claim).where(Claim.item_id.in_(items)),
+            db.delete(Comment).where(Comment.list_id == list_id),
+            db.delete(Item).where(Item.list_id == list_id),
+        ):
+            db.session.execute(statement.execution_options(synchronize_session=False))
+        result = db.session.execute(
+            db.delete(List)
+            .where(List.id == list_id)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
+
 
 class Category(db.Model):
     __tablename__ = "categories"
@@ -200,6 +252,7 @@ class Category(db.Model):
             category.default = default
             db.session.add(category)
         db.session.commit()
+        refdata.invalidate()
 
     def __repr__(self) -> str:
         return "<Category %r>" % self.name
@@ -207,18 +260,122 @@ class Category(db.Model):
 
 class Item(db.Model):
     __tablename__ = "items"
+    __table_args__ = (
+        # the items of a list in id order (list page, API) and per-list
+        # counts of claimed items (index, profile)
+        db.Index("ix_items_list_id_claimed", "list_id", "claimed"),
+    )
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.Text)
     link = db.Column(db.Text)
     description = db.Column(db.Text)
     timestamp = db.Column(db.DateTime, index=True, default=datetime.utcnow)
     list_id = db.Column(db.Integer, db.ForeignKey("lists.id"))
-    category_id = db.Column(db.Integer, db.ForeignKey("categories.id"))
+    category_id = db.Column(db.Integer, db.ForeignKey("categories.id"), index=True)
+    comment_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    claimed = db.Column(db.Boolean, nullable=False, default=False, server_default="0")
+    claimer_id = db.Column(db.Integer, db.ForeignKey("users.id"))
+    # link, normalized (see app/previews.py); None unless it is a web page
+    link_url = db.Column(db.Text, index=True)
     comments = db.relationship("Comment", backref="item", lazy="dynamic")
 
+    # comment_count is denormalized from comments, and claimed and
+    # claimer_id from claims. They are kept up to date by comment_added(),
+    # comment_removed(), Claim.claim() and Claim.unclaim(), which have to run
+    # in the same transaction as the change they record.
+
+    @staticmethod
+    def delete_cascade(item_id) -> bool:
+        """
+        Delete an item with its comments and claim. Returns whether the item
+        existed; bump its list's version and commit afterwards.
+        """
+        for statement in (
+            db.delete(Claim).where(Claim.item_id == item_id),
+            db.delete(Comment).where(Comment.item_id == item_id),
+        ):
+            db.session.execute(statement.execution_options(synchronize_session=False))
+        result = db.session.execute(
+            db.delete(Item)
+            .where(Item.id == item_id)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
+
+    @staticmethod
+    def comment_added(item_id):
+        db.session.execute(
+            db.update(Item)
+            .where(Item.id == item_id)
+            .values(comment_count=Item.comment_count + 1)
+        )
+
+    @staticmethod
+    def comment_removed(item_id):
+        db.session.execute(
+            db.update(Item)
+            .where(Item.id == item_id)
+            .values(comment_count=Item.comment_count - 1)
+        )
+
+    @staticmethod
+    def rebuild_counts():
+        """
+        Recompute the denormalized comment and claim columns of every item
+        from the comments and claims tables, returning how many items had
+        drifted.
+        """
+        count = (
+            db.select(db.func.count(Comment.id))
+            .where(Comment.item_id == Item.id)
+            .scalar_subquery()
+        )
+        claimer = (
+            db.select(Claim.user_id).where(Claim.item_id == Item.id).scalar_subquery()
+        )
+        result = db.session.execute(
+            db.update(Item)
+            .where(
+                db.or_(
+                    Item.comment_count != count,
+                    Item.claimed != claimer.is_not(None),
+                    Item.claimer_id.is_distinct_from(claimer),
+                )
+            )
+            .values(
+                comment_count=count, claimed=claimer.is_not(None), claimer_id=claimer
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return result.rowcount
+
+    @staticmethod
+    def claim_summary(list_ids, session=None) -> dict:
+        """How many items of each list are claimed, as {list_id: (claimed, total)}."""
+        if not list_ids:
+            return {}
+        rows = (
+            (session or db.session)
+            .query(
+                Item.list_id,
+                db.func.sum(db.cast(Item.claimed, db.Integer)),
+                db.func.count(Item.id),
+            )
+            .filter(Item.list_id.in_(list_ids))
+            .group_by(Item.list_id)
+        )
+        return {list_id: (claimed or 0, total) for list_id, claimed, total in rows}
+
 
 class Comment(db.Model):
     __tablename__ = "comments"
+    __table_args__ = (
+        # the comments of an item in order (list page, claimer lookups)
+        db.Index("ix_comments_item_id_id", "item_id", "id"),
+        # count and newest comment of a list (list page validator)
+        db.Index("ix_comments_list_id_timestamp", "list_id", "timestamp"),
+    )
     id = db.Column(db.Integer, primary_key=True)
     body = db.Column(db.Text)
     timestamp = db.Column(db.DateTime, index=True, default=datetime.utcnow)
@@ -226,3 +383,150 @@ class Comment(db.Model):
     item_id = db.Column(db.Integer, db.ForeignKey("items.id"))
     author_id = db.Column(db.Integer, db.ForeignKey("users.id"))
     author = db.Column(db.String, db.ForeignKey("users.username"))
+
+
+class Claim(db.Model):
+    """
+    Somebody's dibs on an item. The item is the primary key, so there is at
+    most one claim per item, and claims are only made by claim(): a single
+    INSERT that does nothing if the item has been claimed already. However
+    many people call dibs at once, exactly one of them gets it, without
+    reading first or locking anything. The author of a list is never shown
+    its claims.
+    """
+
+    __tablename__ = "claims"
+    item_id = db.Column(db.Integer, db.ForeignKey("items.id"), primary_key=True)
+    list_id = db.Column(db.Integer, db.ForeignKey("lists.id"), nullable=False)
+    user_id = db.Column(
+        db.Integer, db.ForeignKey("users.id"), nullable=False, index=True
+    )
+    timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    @staticmethod
+    def claim(list_id, item_id, user_id) -> bool:
+        """
+        Call dibs on an item of a list for ``user_id``, unless it has been
+        claimed already or the list is their own. Returns whether they got
+        it; commit afterwards.
+        """
+        candidate = (
+            db.select(
+                Item.id,
+                Item.list_id,
+                db.literal(user_id, db.Integer),
+                db.literal(datetime.utcnow(), db.DateTime),
+            ).join(List, List.id == Item.list_id)
+            # the WHERE clause also keeps SQLite from reading ON CONFLICT as
+            # part of the join
+            .where(
+                Item.id == item_id, Item.list_id == list_id, List.author_id != user_id
+            )
+        )
+        result = db.session.execute(
+            insert(Claim)
+            .from_select(["item_id", "list_id", "user_id", "timestamp"], candidate)
+            .on_conflict_do_nothing(index_elements=["item_id"])
+        )
+        if result.rowcount != 1:
+            return False
+        db.session.execute(
+            db.update(Item)
+            .where(Item.id == item_id)
+            .values(claimed=True, claimer_id=user_id)
+        )
+        List.bump_version(list_id)
+        return True
+
+    @staticmethod
+    def unclaim(list_id, item_id, user_id) -> bool:
+        """
+        Take back ``user_id``'s dibs on an item. Returns whether they had
+        it; commit afterwards.
+        """
+        result = db.session.execute(
+            db.delete(Claim).where(
+                Claim.item_id == item_id,
+                Claim.list_id == list_id,
+                Claim.user_id == user_id,
+            )
+        )
+        if result.rowcount != 1:
+            return False
+        db.session.execute(
+            db.update(Item)
+            .where(Item.id == item_id)
+            .values(claimed=False, claimer_id=None)
+        )
+        List.bump_version(list_id)
+        return True
+
+
+class OutboxMessage(db.Model):
+    """
+    An email waiting to be, or already, delivered by the outbox workers.
+    """
+
+    __tablename__ = "outbox"
+    __table_args__ = (
+        db.Index("ix_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    sender = db.Column(db.String(128))
+    recipients = db.Column(db.Text)
+    subject = db.Column(db.Text)
+    body = db.Column(db.Text)
+    html = db.Column(db.Text)
+    status = db.Column(db.String(16), default="pending")
+    attempts = db.Column(db.Integer, default=0)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow)
+    claim = db.Column(db.String(32), index=True)
+    claimed_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+
+class LinkPreview(db.Model):
+    """
+    What a linked page says about itself, fetched in the background by the
+    link preview workers. Keyed by normalized URL, so a page linked from
+    many lists is fetched once and shared by all of their items.
+    """
+
+    __tablename__ = "link_previews"
+    __table_args__ = (
+        db.Index(
+            "ix_link_previews_status_next_attempt_at", "status", "next_attempt_at"
+        ),
+    )
+    url = db.Column(db.Text, primary_key=True)
+    status = db.Column(db.String(16), default="pending")
+    title = db.Column(db.Text)
+    description = db.Column(db.Text)
+    image = db.Column(db.Text)
+    price = db.Column(db.String(64))
+    attempts = db.Column(db.Integer, default=0)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow)
+    claim = db.Column(db.String(32), index=True)
+    claimed_at = db.Column(db.DateTime)
+    fetched_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+
+
+class EndpointStat(db.Model):
+    """
+    Request counters of one endpoint, summed over all processes by the
+    instrumentation layer and shown by ``flask stats``.
+    """
+
+    __tablename__ = "endpoint_stats"
+    endpoint = db.Column(db.String(128), primary_key=True)
+    requests = db.Column(db.Integer, nullable=False, default=0)
+    errors = db.Column(db.Integer, nullable=False, default=0)
+    slow = db.Column(db.Integer, nullable=False, default=0)
+    total_ms = db.Column(db.Float, nullable=False, default=0)
+    max_ms = db.Column(db.Float, nullable=False, default=0)
+    sql_queries = db.Column(db.Integer, nullable=False, default=0)
+    sql_ms = db.Column(db.Float, nullable=False, default=0)
+    render_ms = db.Column(db.Float, nullable=False, default=0)
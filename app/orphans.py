@@ -0,0 +1,54 @@
+from collections import namedtuple
+
+from . import db
+from .models import Claim, Comment, Item, List
+
+Orphans = namedtuple("Orphans", "items comments claims")
+
+
+def orphaned(model):
+    """
+    The rows of ``model`` whose parent is gone: items without a list,
+    comments without an item or a list, claims without an item.
+    """
+    if model is Item:
+        return ~db.exists().where(List.id == Item.list_id)
+    if model is Comment:
+        return db.or_(
+            ~db.exists().where(Item.id == Comment.item_id),
+            ~db.exists().where(List.id == Comment.list_id),
+        )
+    return ~db.exists().where(Item.id == Claim.item_id)
+
+
+def delete_orphans(model, key, chunk_size) -> int:
+    """
+    Delete the orphaned rows of ``model`` window by window of ``chunk_size``
+    consecutive keys, one short transaction each, so that writers are never
+    held up for long and no window is scanned twice. Returns how many rows
+    were deleted.
+    """
+    highest = db.session.query(db.func.max(key)).scalar() or 0
+    deleted = 0
+    for start in range(0, highest, chunk_size):
+        result = db.session.execute(
+            db.delete(model)
+            .where(key > start, key <= start + chunk_size, orphaned(model))
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        deleted += result.rowcount
+    return deleted
+
+
+def collect(chunk_size=1000) -> Orphans:
+    """
+    Delete the items, comments and claims left behind by lists and items
+    that were deleted row by row. Items go first, so that the comments and
+    claims of orphaned items are collected in the same run.
+    """
+    return Orphans(
+        items=delete_orphans(Item, Item.id, chunk_size),
+        comments=delete_orphans(Comment, Comment.id, chunk_size),
+        claims=delete_orphans(Claim, Claim.item_id, chunk_size),
+    )
@@ -0,0 +1,217 @@
+import atexit
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+from flask import current_app
+from flask_mail import Message
+
+
+class OutboxState:
+    def __init__(self, app):
+        config = app.config
+        self.app = app
+        self.workers = config["DIBS_OUTBOX_WORKERS"]
+        self.batch_size = config["DIBS_OUTBOX_BATCH_SIZE"]
+        self.max_attempts = config["DIBS_OUTBOX_MAX_ATTEMPTS"]
+        self.backoff = config["DIBS_OUTBOX_BACKOFF"]
+        self.poll_interval = config["DIBS_OUTBOX_POLL_INTERVAL"]
+        self.lease = timedelta(seconds=config["DIBS_OUTBOX_LEASE"])
+        self.threads = []
+        self.wakeup = threading.Event()
+        self.stopping = False
+        self.lock = threading.Lock()
+
+
+class Outbox:
+    """
+    Persistent mail queue.
+
+    ``enqueue()`` only writes the message to the outbox table. A bounded pool
+    of DIBS_OUTBOX_WORKERS threads claims pending messages in batches and
+    sends each batch over a single SMTP connection, retrying failures with
+    exponential backoff. Messages a process did not get to are picked up by
+    the next one that runs, so a restart resumes delivery. With no workers
+    configured, ``deliver()`` has to be called explicitly (e.g. in tests).
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        state = OutboxState(app)
+        app.extensions["outbox"] = state
+        if state.workers:
+            app.before_request(lambda: self.start(state))
+            atexit.register(self.stop, state)
+
+    @property
+    def state(self) -> OutboxState:
+        return current_app.extensions["outbox"]
+
+    def start(self, state=None):
+        state = state or self.state
+        if state.threads or not state.workers:
+            return
+        with state.lock:
+            if state.threads:
+                return
+            for n in range(state.workers):
+                thread = threading.Thread(
+                    target=self.run, args=(state,), name=f"outbox-{n}", daemon=True
+                )
+                thread.start()
+                state.threads.append(thread)
+
+    def stop(self, state=None):
+        state = state or self.state
+        state.stopping = True
+        state.wakeup.set()
+        for thread in state.threads:
+            thread.join(timeout=5)
+
+    def run(self, state):
+        while not state.stopping:
+            with state.app.app_context():
+                try:
+                    delivered = self.deliver_batch()
+                except Exception:
+                    state.app.logger.exception("outbox worker failed")
+                    delivered = 0
+            if not delivered:
+                state.wakeup.wait(state.poll_interval)
+                state.wakeup.clear()
+
+    def enqueue(self, message: Message, commit=True):
+        from app import db
+        from app.models import OutboxMessage
+
+        row = OutboxMessage(
+            sender=(
+                message.sender
+                if isinstance(message.sender, str)
+                else ", ".join(message.sender)
+            ),
+            recipients="\n".join(message.recipients),
+            subject=message.subject,
+            body=message.body,
+            html=message.html,
+        )
+        db.session.add(row)
+        if commit:
+            db.session.commit()
+            self.state.wakeup.set()
+        return row
+
+    def wake(self):
+        self.state.wakeup.set()
+
+    def claim(self):
+        """
+        Atomically take up to one batch of due messages, including ones whose
+        previous claim has outlived its lease.
+        """
+        from app import db
+        from app.models import OutboxMessage
+
+        state = self.state
+        now = datetime.utcnow()
+        token = uuid.uuid4().hex
+        due = (
+            db.select(OutboxMessage.id)
+            .where(
+                db.or_(
+                    db.and_(
+                        OutboxMessage.status == "pending",
+                        OutboxMessage.next_attempt_at <= now,
+                    ),
+                    db.and_(
+                        OutboxMessage.status == "sending",
+                        OutboxMessage.claimed_at < now - state.lease,
+                    ),
+                )
+            )
+            .order_by(OutboxMessage.id)
+            .limit(state.batch_size)
+        )
+        db.session.execute(
+            db.update(OutboxMessage)
+            .where(OutboxMessage.id.in_(due.scalar_subquery()))
+            .values(
+                status="sending",
+                claim=token,
+                claimed_at=now,
+                attempts=OutboxMessage.attempts + 1,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return (
+            OutboxMessage.query.filter_by(claim=token).order_by(OutboxMessage.id).all()
+        )
+
+    def deliver_batch(self):
+        """Send one claimed batch over one connection, returning its size."""
+        from app import db, mail
+
+        batch = self.claim()
+        if not batch:
+            return 0
+        state = self.state
+        now = datetime.utcnow()
+        try:
+            with mail.connect() as connection:
+                for row in batch:
+                    try:
+                        connection.send(self.to_message(row))
+                    except Exception as e:
+                        self.failed(row, e, now)
+                        if connection.host is not None and not self.alive(connection):
+                            raise
+                    else:
+                        row.status = "sent"
+                        row.sent_at = now
+        except Exception as e:
+            state.app.logger.warning("outbox: SMTP connection failed: %s", e)
+            for row in batch:
+                if row.status == "sending":
+                    self.failed(row, e, now)
+        db.session.commit()
+        return len(batch)
+
+    @staticmethod
+    def alive(connection):
+        try:
+            return connection.host.noop()[0] == 250
+        except Exception:
+            return False
+
+    def failed(self, row, error, now):
+        state = self.state
+        row.last_error = str(error)
+        if row.attempts >= state.max_attempts:
+            row.status = "failed"
+        else:
+            row.status = "pending"
+            delay = state.backoff * 2 ** (row.attempts - 1)
+            row.next_attempt_at = now + timedelta(seconds=delay)
+
+    @staticmethod
+    def to_message(row) -> Message:
+        return Message(
+            row.subject,
+            sender=row.sender,
+            recipients=row.recipients.split("\n"),
+            body=row.body,
+            html=row.html,
+        )
+
+    def deliver(self):
+        """Deliver everything that is due now; returns the number of messages."""
+        total = 0
+        while True:
+            delivered = self.deliver_batch()
+            if not delivered:
+                return total
+            total += delivered
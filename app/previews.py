@@ -0,0 +1,434 @@
+import atexit
+import ipaddress
+import socket
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from datetime import datetime, timedelta
+from html.parser import HTMLParser
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+from flask import current_app
+from sqlalchemy.dialects.sqlite import insert
+
+# query parameters that only say where a link was found, not what it is
+TRACKING_PARAMETERS = {"fbclid", "gclid", "mc_cid", "mc_eid"}
+USER_AGENT = "dibs-link-preview/1.0"
+# longest title, description, image URL and price kept
+LIMITS = {"title": 300, "description": 1000, "image": 2000, "price": 64}
+
+
+def normalize_url(link):
+    """
+    The canonical form of a link, under which its preview is stored: lower
+    case scheme and host, no default port, fragment or tracking parameters.
+    None for anything that is not an http(s) URL.
+    """
+    try:
+        parts = urlsplit((link or "").strip())
+        port = parts.port
+    except ValueError:
+        return None
+    if parts.scheme.lower() not in ("http", "https") or not parts.hostname:
+        return None
+    scheme = parts.scheme.lower()
+    host = parts.hostname
+    if ":" in host:
+        host = f"[{host}]"
+    if port is not None and port != {"http": 80, "https": 443}[scheme]:
+        host = f"{host}:{port}"
+    query = urlencode(
+        [
+            (name, value)
+            for name, value in parse_qsl(parts.query, keep_blank_values=True)
+            if not name.lower().startswith("utm_")
+            and name.lower() not in TRACKING_PARAMETERS
+        ]
+    )
+    return urlunsplit((scheme, host, parts.path or "/", query, ""))
+
+
+class PageMetadata(HTMLParser):
+    """
+    Collects the title, description, image and price a page declares in its
+    head: Open Graph and Twitter card tags, product price tags and <title>.
+    """
+
+    NAMES = {
+        "og:title": "title",
+        "twitter:title": "title",
+        "og:description": "description",
+        "twitter:description": "description",
+        "description": "description",
+        "og:image": "image",
+        "og:image:url": "image",
+        "og:image:secure_url": "image",
+        "twitter:image": "image",
+        "product:price:amount": "price",
+        "og:price:amount": "price",
+        "price": "price",
+    }
+    CURRENCIES = ("product:price:currency", "og:price:currency", "pricecurrency")
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.found = {}
+        self.currency = None
+        self.in_title = False
+        self.title = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "title":
+            self.in_title = True
+        elif tag == "meta" and attrs.get("content"):
+            name = (
+                attrs.get("property")
+                or attrs.get("name")
+                or attrs.get("itemprop")
+                or ""
+            ).lower()
+            if name in self.CURRENCIES:
+                self.currency = self.currency or attrs["content"].strip()
+            elif name in self.NAMES:
+                self.found.setdefault(self.NAMES[name], attrs["content"].strip())
+
+    def handle_endtag(self, tag):
+        if tag == "title":
+            self.in_title = False
+
+    def handle_data(self, data):
+        if self.in_title:
+            self.title.append(data)
+
+    def metadata(self, base_url) -> dict:
+        found = dict(self.found)
+        if "title" not in found and self.title:
+            found["title"] = " ".join("".join(self.title).split())
+        if "price" in found and self.currency:
+            found["price"] = f"{found['price']} {self.currency}"
+        if "image" in found:
+            image = urljoin(base_url, found["image"])
+            found["image"] = image if normalize_url(image) else None
+        return {
+            key: found[key][:limit] if found.get(key) else None
+            for key, limit in LIMITS.items()
+        }
+
+
+class PrivateAddress(ValueError):
+    pass
+
+
+def check_host(url, allow_private):
+    """
+    Refuse URLs whose host resolves to a loopback, private or otherwise
+    non-public address, so that links cannot be used to probe the network
+    the app runs in.
+    """
+    if allow_private:
+        return
+    host = urlsplit(url).hostname
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, None)}
+    except (socket.gaierror, UnicodeError) as e:
+        raise urllib.error.URLError(e)
+    for address in addresses:
+        if not ipaddress.ip_address(address.split("%")[0]).is_global:
+            raise PrivateAddress(f"{host} is not a public address")
+
+
+class CheckedRedirects(urllib.request.HTTPRedirectHandler):
+    def __init__(self, allow_private):
+        self.allow_private = allow_private
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        check_host(newurl, self.allow_private)
+        return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+
+def fetch_metadata(url, timeout, max_bytes, allow_private=False) -> dict:
+    """
+    Fetch a page and parse its metadata, giving up after ``timeout`` seconds
+    in all and reading at most ``max_bytes`` of it.
+    """
+    check_host(url, allow_private)
+    opener = urllib.request.build_opener(CheckedRedirects(allow_private))
+    request = urllib.request.Request(
+        url, headers={"User-Agent": USER_AGENT, "Accept": "text/html"}
+    )
+    deadline = time.monotonic() + timeout
+    with opener.open(request, timeout=timeout) as response:
+        if "html" not in response.headers.get_content_type():
+            raise ValueError(f"not a web page: {response.headers.get_content_type()}")
+        charset = response.headers.get_content_charset() or "utf-8"
+        parser = PageMetadata()
+        received = 0
+        while received < max_bytes:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"no complete page within {timeout}s")
+            data = response.read1(min(65536, max_bytes - received))
+            if not data:
+                break
+            received += len(data)
+            parser.feed(data.decode(charset, errors="replace"))
+        final_url = response.geturl()
+    return parser.metadata(final_url)
+
+
+class LinkPreviewState:
+    def __init__(self, app):
+        config = app.config
+        self.app = app
+        self.workers = config["DIBS_PREVIEW_WORKERS"]
+        self.batch_size = config["DIBS_PREVIEW_BATCH_SIZE"]
+        self.timeout = config["DIBS_PREVIEW_TIMEOUT"]
+        self.max_bytes = config["DIBS_PREVIEW_MAX_BYTES"]
+        self.max_attempts = config["DIBS_PREVIEW_MAX_ATTEMPTS"]
+        self.backoff = config["DIBS_PREVIEW_BACKOFF"]
+        self.poll_interval = config["DIBS_PREVIEW_POLL_INTERVAL"]
+        self.lease = timedelta(seconds=config["DIBS_PREVIEW_LEASE"])
+        self.allow_private = config["DIBS_PREVIEW_ALLOW_PRIVATE"]
+        self.threads = []
+        self.wakeup = threading.Event()
+        self.stopping = False
+        self.lock = threading.Lock()
+
+
+class LinkPreviews:
+    """
+    Background fetcher of link metadata.
+
+    ``request()`` only records that a normalized URL needs a preview; a page
+    linked before is never fetched again. A bounded pool of
+    DIBS_PREVIEW_WORKERS threads, which is also the most fetches in flight
+    at once, claims pending URLs in batches, fetches them with a timeout and
+    a size limit, and retries failures with exponential backoff. Pages only
+    read what has been fetched already, so they never wait on a fetch; a
+    fetched preview bumps the version of every list linking to it. With no
+    workers configured, ``fetch_pending()`` has to be called explicitly
+    (e.g. in tests).
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        state = LinkPreviewState(app)
+        app.extensions["link_previews"] = state
+        if state.workers:
+            app.before_request(lambda: self.start(state))
+            atexit.register(self.stop, state)
+
+    @property
+    def state(self) -> LinkPreviewState:
+        return current_app.extensions["link_previews"]
+
+    def start(self, state=None):
+        state = state or self.state
+        if state.threads or not state.workers:
+            return
+        with state.lock:
+            if state.threads:
+                return
+            for n in range(state.workers):
+                thread = threading.Thread(
+                    target=self.run, args=(state,), name=f"previews-{n}", daemon=True
+                )
+                thread.start()
+                state.threads.append(thread)
+
+    def stop(self, state=None):
+        state = state or self.state
+        state.stopping = True
+        state.wakeup.set()
+        for thread in state.threads:
+            thread.join(timeout=5)
+
+    def run(self, state):
+        while not state.stopping:
+            with state.app.app_context():
+                try:
+                    fetched = self.fetch_batch()
+                except Exception:
+                    state.app.logger.exception("link preview worker failed")
+                    fetched = 0
+            if not fetched:
+                state.wakeup.wait(state.poll_interval)
+                state.wakeup.clear()
+
+    def request(self, urls):
+        """
+        Queue a preview of every URL in ``urls`` that has none yet; commit,
+        then ``wake()`` the workers afterwards.
+        """
+        from app import db
+        from app.models import LinkPreview
+
+        urls = sorted({url for url in urls if url})
+        for start in range(0, len(urls), 500):
+            db.session.execute(
+                insert(LinkPreview)
+                .values([{"url": url} for url in urls[start : start + 500]])
+                .on_conflict_do_nothing(index_elements=["url"])
+            )
+
+    def wake(self):
+        self.state.wakeup.set()
+
+    def backfill(self, chunk_size=1000) -> int:
+        """
+        Normalize the links of items added before there were link previews,
+        and queue their previews, one chunk of items per transaction.
+        Returns how many items have a web page link now.
+        """
+        from app import db
+        from app.models import Item
+
+        items = Item.__table__
+        set_url = (
+            items.update()
+            .where(items.c.id == db.bindparam("item_id"))
+            .values(link_url=db.bindparam("url"))
+        )
+        updated = 0
+        after = 0
+        while True:
+            rows = db.session.execute(
+                db.select(Item.id, Item.link)
+                .where(Item.id > after, Item.link_url.is_(None), Item.link != "")
+                .order_by(Item.id)
+                .limit(chunk_size)
+            ).all()
+            if not rows:
+                return updated
+            after = rows[-1].id
+            urls = [
+                {"item_id": item_id, "url": normalize_url(link)}
+                for item_id, link in rows
+            ]
+            urls = [row for row in urls if row["url"]]
+            if urls:
+                db.session.execute(set_url, urls)
+                self.request(row["url"] for row in urls)
+            db.session.commit()
+            updated += len(urls)
+
+    def claim(self):
+        """
+        Atomically take up to one batch of due URLs, including ones whose
+        previous claim has outlived its lease, and end the transaction so
+        that nothing is held while they are fetched.
+        """
+        from app import db
+        from app.models import LinkPreview
+
+        state = self.state
+        now = datetime.utcnow()
+        token = uuid.uuid4().hex
+        due = (
+            db.select(LinkPreview.url)
+            .where(
+                db.or_(
+                    db.and_(
+                        LinkPreview.status == "pending",
+                        LinkPreview.next_attempt_at <= now,
+                    ),
+                    db.and_(
+                        LinkPreview.status == "fetching",
+                        LinkPreview.claimed_at < now - state.lease,
+                    ),
+                )
+            )
+            .order_by(LinkPreview.next_attempt_at)
+            .limit(state.batch_size)
+        )
+        db.session.execute(
+            db.update(LinkPreview)
+            .where(LinkPreview.url.in_(due.scalar_subquery()))
+            .values(
+                status="fetching",
+                claim=token,
+                claimed_at=now,
+                attempts=LinkPreview.attempts + 1,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        urls = db.session.scalars(
+            db.select(LinkPreview.url).where(LinkPreview.claim == token)
+        ).all()
+        db.session.commit()
+        return token, urls
+
+    def fetch_batch(self):
+        """
+        Fetch one claimed batch, outside of any transaction, and store the
+        results. Returns the size of the batch.
+        """
+        from app import db
+        from app.models import Item, LinkPreview, List
+
+        token, urls = self.claim()
+        if not urls:
+            return 0
+        state = self.state
+        results = {}
+        for url in urls:
+            try:
+                results[url] = fetch_metadata(
+                    url, state.timeout, state.max_bytes, state.allow_private
+                )
+            except Exception as e:
+                results[url] = e
+        now = datetime.utcnow()
+        fetched = []
+        # rows claimed again by another worker meanwhile are theirs now
+        for row in LinkPreview.query.filter_by(claim=token):
+            result = results[row.url]
+            if isinstance(result, Exception):
+                self.failed(row, result, now)
+                continue
+            for key, value in result.items():
+                setattr(row, key, value)
+            row.status = "fetched"
+            row.fetched_at = now
+            row.last_error = None
+            fetched.append(row.url)
+        if fetched:
+            linking = db.select(Item.list_id).where(Item.link_url.in_(fetched))
+            db.session.execute(
+                db.update(List)
+                .where(List.id.in_(linking))
+                .values(version=List.version + 1)
+                .execution_options(synchronize_session=False)
+            )
+        db.session.commit()
+        return len(urls)
+
+    def failed(self, row, error, now):
+        state = self.state
+        row.last_error = str(error) or type(error).__name__
+        gone = isinstance(error, urllib.error.HTTPError) and error.code in (404, 410)
+        if (
+            gone
+            or isinstance(error, PrivateAddress)
+            or row.attempts >= state.max_attempts
+        ):
+            row.status = "failed"
+        else:
+            row.status = "pending"
+            delay = state.backoff * 2 ** (row.attempts - 1)
+            row.next_attempt_at = now + timedelta(seconds=delay)
+
+    def fetch_pending(self):
+        """Fetch everything that is due now; returns the number of URLs."""
+        total = 0
+        while True:
+            fetched = self.fetch_batch()
+            if not fetched:
+                return total
+            total += fetched
@@ -0,0 +1,85 @@
+import threading
+from collections import namedtuple
+
+from flask import current_app
+
+CategoryRecord = namedtuple("CategoryRecord", "id name default")
+RoleRecord = namedtuple("RoleRecord", "id name permissions default")
+
+
+class ReferenceSnapshot:
+    """An immutable copy of the categories and roles tables."""
+
+    def __init__(self, version, categories, roles):
+        self.version = version
+        self.categories = categories
+        self.roles = roles
+        self.permissions = {role.id: role.permissions for role in roles}
+
+
+class ReferenceState:
+    def __init__(self):
+        self.version = 0
+        self.snapshot = None
+        self.lock = threading.Lock()
+
+
+class ReferenceCache:
+    """
+    Process-local cache of the nearly static Category and Role tables.
+
+    The tables are read once per version; ``invalidate()`` bumps the version
+    so the next reader reloads them. Anything that writes to either table has
+    to call it.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions["refdata"] = ReferenceState()
+
+    @property
+    def state(self) -> ReferenceState:
+        return current_app.extensions["refdata"]
+
+    def snapshot(self) -> ReferenceSnapshot:
+        state = self.state
+        snapshot = state.snapshot
+        if snapshot is not None and snapshot.version == state.version:
+            return snapshot
+        with state.lock:
+            if state.snapshot is None or state.snapshot.version != state.version:
+                state.snapshot = self.load(state.version)
+            return state.snapshot
+
+    @staticmethod
+    def load(version) -> ReferenceSnapshot:
+        from app.models import Category, Role
+
+        categories = [
+            CategoryRecord(c.id, c.name, c.default)
+            for c in Category.query.order_by(Category.id)
+        ]
+        roles = [
+            RoleRecord(r.id, r.name, r.permissions, r.default)
+            for r in Role.query.order_by(Role.name)
+        ]
+        return ReferenceSnapshot(version, categories, roles)
+
+    def invalidate(self):
+        state = self.state
+        with state.lock:
+            state.version += 1
+
+    def categories(self):
+        """All categories, ordered by id."""
+        return self.snapshot().categories
+
+    def roles(self):
+        """All roles, ordered by name."""
+        return self.snapshot().roles
+
+    def role_permissions(self, role_id):
+        return self.snapshot().permissions.get(role_id)
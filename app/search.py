@@ -0,0 +1,187 @@
+import re
+from collections import namedtuple
+
+from sqlalchemy import event, text
+
+from app import db
+
+SearchResult = namedtuple("SearchResult", "kind id title list_id list_title author")
+
+# FTS5 indexes over the searchable columns of items and lists. They are
+# "external content" tables: they hold only the index and read the text
+# back from items/lists, and the triggers keep them in step with every
+# insert, update and delete, including bulk ones.
+SEARCH_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(
+        name, description, link,
+        content='items', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS items_fts_insert AFTER INSERT ON items BEGIN
+        INSERT INTO items_fts(rowid, name, description, link)
+        VALUES (new.id, new.name, new.description, new.link);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS items_fts_delete AFTER DELETE ON items BEGIN
+        INSERT INTO items_fts(items_fts, rowid, name, description, link)
+        VALUES ('delete', old.id, old.name, old.description, old.link);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS items_fts_update
+    AFTER UPDATE OF name, description, link ON items BEGIN
+        INSERT INTO items_fts(items_fts, rowid, name, description, link)
+        VALUES ('delete', old.id, old.name, old.description, old.link);
+        INSERT INTO items_fts(rowid, name, description, link)
+        VALUES (new.id, new.name, new.description, new.link);
+    END
+    """,
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS lists_fts USING fts5(
+        title,
+        content='lists', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS lists_fts_insert AFTER INSERT ON lists BEGIN
+        INSERT INTO lists_fts(rowid, title) VALUES (new.id, new.title);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS lists_fts_delete AFTER DELETE ON lists BEGIN
+        INSERT INTO lists_fts(lists_fts, rowid, title)
+        VALUES ('delete', old.id, old.title);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS lists_fts_update AFTER UPDATE OF title ON lists BEGIN
+        INSERT INTO lists_fts(lists_fts, rowid, title)
+        VALUES ('delete', old.id, old.title);
+        INSERT INTO lists_fts(rowid, title) VALUES (new.id, new.title);
+    END
+    """,
+]
+SEARCH_TABLES = ("items_fts", "lists_fts")
+
+# bm25 column weights: a hit in a name or title counts most, one in a link
+# least. Only the newest :candidates matches of each table are scored, read
+# in rowid order straight off the index, so a word found in most items costs
+# no more than one found in :candidates of them.
+SEARCH_SQL = text("""
+    SELECT kind, id FROM (
+        SELECT * FROM (
+            SELECT 'item' AS kind, rowid AS id,
+                bm25(items_fts, 10.0, 2.0, 1.0) AS score
+            FROM items_fts WHERE items_fts MATCH :query
+            ORDER BY rowid DESC LIMIT :candidates
+        )
+        UNION ALL
+        SELECT * FROM (
+            SELECT 'list', rowid, bm25(lists_fts, 10.0)
+            FROM lists_fts WHERE lists_fts MATCH :query
+            ORDER BY rowid DESC LIMIT :candidates
+        )
+    )
+    ORDER BY score, kind, id
+    LIMIT :limit OFFSET :offset
+    """)
+
+
+def is_search_table(name) -> bool:
+    """Whether ``name`` is one of the FTS5 tables or their shadow tables."""
+    return name.startswith(SEARCH_TABLES)
+
+
+def include_object(object, name, type_, reflected, compare_to) -> bool:
+    """Keep alembic's autogenerate from dropping the FTS5 tables."""
+    return not (type_ == "table" and is_search_table(name))
+
+
+@event.listens_for(db.metadata, "after_create")
+def create_search_index(target, connection, **kw):
+    if connection.dialect.name == "sqlite":
+        for statement in SEARCH_DDL:
+            connection.exec_driver_sql(statement)
+
+
+@event.listens_for(db.metadata, "before_drop")
+def drop_search_index(target, connection, **kw):
+    if connection.dialect.name == "sqlite":
+        for table in SEARCH_TABLES:
+            connection.exec_driver_sql(f"DROP TABLE IF EXISTS {table}")
+
+
+def rebuild():
+    """Rebuild both indexes from the items and lists tables."""
+    for table in SEARCH_TABLES:
+        db.session.execute(text(f"INSERT INTO {table}({table}) VALUES ('rebuild')"))
+    db.session.commit()
+
+
+def match_expression(query):
+    """
+    Turn free text into an FTS5 query: every word must match, the last one
+    also as a prefix so that results show up while a word is being typed
+    (whole-word hits match both ways and so rank higher). Quoting each word
+    keeps FTS5 operators and syntax in the input from doing anything.
+    """
+    words = [f'"{word}"' for word in re.findall(r"\w+", query.lower())[:8]]
+    if not words:
+        return None
+    last = words.pop()
+    return " AND ".join(words + [f"({last} OR {last}*)"])
+
+
+def search(query, page=1, per_page=20, candidates=10000):
+    """
+    One page of lists and items matching ``query``, best match first, and
+    whether there is a next page. Items whose list is gone are left out.
+    For words with more than ``candidates`` matches of a kind, the best of
+    the newest ``candidates`` are returned.
+    """
+    from app.models import Item, List, User
+
+    expression = match_expression(query)
+    if expression is None:
+        return [], False
+    hits = db.session.execute(
+        SEARCH_SQL,
+        {
+            "query": expression,
+            "candidates": candidates,
+            "limit": per_page + 1,
+            "offset": (page - 1) * per_page,
+        },
+    ).all()
+    has_next = len(hits) > per_page
+    hits = hits[:per_page]
+    item_ids = [id for kind, id in hits if kind == "item"]
+    list_ids = [id for kind, id in hits if kind == "list"]
+    found = {}
+    if item_ids:
+        rows = (
+            db.session.query(Item.id, Item.name, List.id, List.title, User.username)
+            .join(List, Item.list_id == List.id)
+            .join(User, List.author_id == User.id)
+            .filter(Item.id.in_(item_ids))
+        )
+        for item_id, name, list_id, title, author in rows:
+            found["item", item_id] = SearchResult(
+                "item", item_id, name, list_id, title, author
+            )
+    if list_ids:
+        rows = (
+            db.session.query(List.id, List.title, User.username)
+            .join(User, List.author_id == User.id)
+            .filter(List.id.in_(list_ids))
+        )
+        for list_id, title, author in rows:
+            found["list", list_id] = SearchResult(
+                "list", list_id, title, list_id, title, author
+            )
+    return [found[hit] for hit in map(tuple, hits) if hit in found], has_next
@@ -0,0 +1,160 @@
+import itertools
+import math
+import random
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from app import db, passwords, refdata
+from app.models import Claim, Comment, Item, List, User
+
+SeedResult = namedtuple("SeedResult", "users lists items comments")
+
+EPOCH = datetime(2024, 1, 1)
+ADJECTIVES = ("red", "small", "vintage", "wooden", "signed", "spare", "cosy", "odd")
+THINGS = ("bike", "lamp", "teapot", "record", "jumper", "board game", "atlas", "kite")
+REMARKS = ("dibs!", "I'd love this", "mine please", "can I have it?", "yes!")
+
+
+def zipf_weights(n, exponent=1.1):
+    """Cumulative weights for picking rank k out of n with P(k) ~ 1/k^exponent."""
+    return list(itertools.accumulate(1 / (k + 1) ** exponent for k in range(n)))
+
+
+def chunked(rows, size):
+    iterator = iter(rows)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+def populate(
+    users=100,
+    lists=500,
+    items_per_list=20,
+    comments=5000,
+    seed=0,
+    password="dibs",
+    chunk_size=5000,
+):
+    """
+    Fill the database with a deterministic synthetic data set.
+
+    Users are ``seed<n>`` / ``seed<n>@example.com``, all with ``password``.
+    The data is skewed the way real lists are: a few users write most of the
+    lists, list sizes are log-normal around ``items_per_list`` and comments
+    pile up on the lists of popular authors. Whoever comments on an item
+    first has also called dibs on it. The same arguments always give the
+    same rows.
+    """
+    rng = random.Random(seed)
+    role_id = next(role.id for role in refdata.roles() if role.default)
+    category_ids = [category.id for category in refdata.categories()]
+    password_hash = passwords.hash(password)
+
+    first_user = (db.session.query(db.func.max(User.id)).scalar() or 0) + 1
+    db.session.execute(
+        User.__table__.insert(),
+        [
+            {
+                "id": first_user + n,
+                "email": f"seed{n}@example.com",
+                "username": f"seed{n}",
+                "role_id": role_id,
+                "password_hash": password_hash,
+                "confirmed": True,
+                "last_seen": EPOCH,
+            }
+            for n in range(users)
+        ],
+    )
+    user_ids = list(range(first_user, first_user + users))
+    popularity = zipf_weights(users)
+
+    first_list = (db.session.query(db.func.max(List.id)).scalar() or 0) + 1
+    authors = rng.choices(user_ids, cum_weights=popularity, k=lists)
+    for chunk in chunked(range(lists), chunk_size):
+        db.session.execute(
+            List.__table__.insert(),
+            [
+                {
+                    "id": first_list + n,
+                    "title": f"{THINGS[n % len(THINGS)]}s and more, part {n}",
+                    "author_id": authors[n],
+                    "timestamp": EPOCH + timedelta(minutes=rng.randrange(525600)),
+                }
+                for n in chunk
+            ],
+        )
+    list_ids = range(first_list, first_list + lists)
+
+    # log-normal sizes with the requested mean
+    mu = math.log(max(items_per_list, 1)) - 0.5
+    sizes = [max(1, round(rng.lognormvariate(mu, 1))) for _ in list_ids]
+    first_item = (db.session.query(db.func.max(Item.id)).scalar() or 0) + 1
+    rows = (
+        {
+            "id": first_item + n,
+            "name": f"{rng.choice(ADJECTIVES)} {rng.choice(THINGS)}",
+            "link": f"https://example.com/things/{n}" if n % 3 == 0 else None,
+            "link_url": f"https://example.com/things/{n}" if n % 3 == 0 else None,
+            "description": f"a description of thing {n}" if n % 2 == 0 else None,
+            "list_id": list_id,
+            "category_id": rng.choice(category_ids),
+            "timestamp": EPOCH,
+        }
+        for n, list_id in enumerate(
+            itertools.chain.from_iterable(
+                itertools.repeat(list_id, size)
+                for list_id, size in zip(list_ids, sizes)
+            )
+        )
+    )
+    for chunk in chunked(rows, chunk_size):
+        db.session.execute(Item.__table__.insert(), chunk)
+    offsets = list(itertools.accumulate(sizes, initial=first_item))
+
+    # comments go to lists in proportion to their author's popularity
+    weights = [popularity[0]] + [b - a for a, b in zip(popularity, popularity[1:])]
+    list_weights = list(
+        itertools.accumulate(weights[author - first_user] for author in authors)
+    )
+    usernames = {user_id: f"seed{user_id - first_user}" for user_id in user_ids}
+
+    def comment(n):
+        index = rng.choices(range(lists), cum_weights=list_weights)[0]
+        commenter = rng.choices(user_ids, cum_weights=popularity)[0]
+        if commenter == authors[index]:
+            commenter = user_ids[(commenter - first_user + 1) % users]
+        return {
+            "body": rng.choice(REMARKS),
+            "list_id": first_list + index,
+            "item_id": rng.randrange(offsets[index], offsets[index + 1]),
+            "author_id": commenter,
+            "author": usernames[commenter],
+            "timestamp": EPOCH + timedelta(minutes=525600 + n),
+        }
+
+    claims = {}
+    if users > 1 and lists:
+        for chunk in chunked(range(comments), chunk_size):
+            rows = [comment(n) for n in chunk]
+            for row in rows:
+                claims.setdefault(row["item_id"], row)
+            db.session.execute(Comment.__table__.insert(), rows)
+    else:
+        comments = 0
+    for chunk in chunked(claims.values(), chunk_size):
+        db.session.execute(
+            Claim.__table__.insert(),
+            [
+                {
+                    "item_id": row["item_id"],
+                    "list_id": row["list_id"],
+                    "user_id": row["author_id"],
+                    "timestamp": row["timestamp"],
+                }
+                for row in chunk
+            ],
+        )
+    db.session.commit()
+    Item.rebuild_counts()
+    return SeedResult(users, lists, sum(sizes), comments)
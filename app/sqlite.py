@@ -0,0 +1,52 @@
+from flask import current_app
+from sqlalchemy import event
+
+
+def apply_pragmas(dbapi_connection, pragmas):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+            cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+class SQLiteTuning:
+    """
+    Sets the ``DIBS_SQLITE_PRAGMAS`` of an app on every new connection of its
+    engine, e.g. WAL journaling, a busy timeout and larger page caches.
+
+    The pragmas are connection settings, so they only pay off together with a
+    pooled engine (see ``SQLALCHEMY_ENGINE_OPTIONS`` in ProductionConfig); with
+    SQLAlchemy's default NullPool for sqlite files they would be re-issued on
+    every checkout. Non-sqlite engines are left alone.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        from app import db
+
+        pragmas = dict(app.config["DIBS_SQLITE_PRAGMAS"])
+        app.extensions["sqlite"] = pragmas
+        if not pragmas:
+            return
+        with app.app_context():
+            self.tune(db.engine, pragmas)
+
+    @staticmethod
+    def tune(engine, pragmas):
+        """Set ``pragmas`` on every new connection of ``engine``."""
+        if not pragmas or engine.dialect.name != "sqlite":
+            return
+
+        @event.listens_for(engine, "connect")
+        def on_connect(dbapi_connection, connection_record):
+            apply_pragmas(dbapi_connection, pragmas)
+
+    @property
+    def pragmas(self):
+        return current_app.extensions["sqlite"]
@@ -0,0 +1,55 @@
+from flask import (
+    current_app,
+    get_flashed_messages,
+    render_template,
+    request,
+    stream_template,
+)
+
+
+def streaming() -> bool:
+    """
+    Whether this request's page is streamed: with DIBS_STREAM_TEMPLATES
+    on, and never for HEAD requests, which have no body to stream.
+    """
+    return current_app.config["DIBS_STREAM_TEMPLATES"] and request.method != "HEAD"
+
+
+def buffered(chunks, size):
+    """
+    Join the many small pieces a streamed template yields into chunks of at
+    least ``size`` characters, so that each write (and compression flush)
+    carries a useful amount of markup.
+    """
+    buffer = []
+    length = 0
+    try:
+        for chunk in chunks:
+            buffer.append(chunk)
+            length += len(chunk)
+            if length >= size:
+                yield "".join(buffer)
+                buffer = []
+                length = 0
+        if buffer:
+            yield "".join(buffer)
+    finally:
+        chunks.close()
+
+
+def stream_page(template_name, **context):
+    """
+    Render a page as it is sent: the response body is a generator, so the
+    first DIBS_STREAM_CHUNK_SIZE characters of markup go out before the rest
+    has been rendered. Falls back to ``render_template`` when not
+    ``streaming()``.
+    """
+    if not streaming():
+        return render_template(template_name, **context)
+    # the session is saved before the body is rendered, so pending flashes
+    # are taken out of it now; the template gets them from the request
+    get_flashed_messages()
+    return buffered(
+        stream_template(template_name, **context),
+        current_app.config["DIBS_STREAM_CHUNK_SIZE"],
+    )
@@ -0,0 +1,23 @@
+"""
+ASGI entry point, an alternative to serving dibs.py over WSGI:
+
+    uvicorn asgi:application
+
+The index, list and profile pages are served on the event loop with their
+queries run through aiosqlite; everything else runs the WSGI app on a pool
+of DIBS_ASGI_THREADS threads. See app/asgi.py.
+"""
+
+import os
+
+from dotenv import load_dotenv
+
+dotenv_path = os.path.join(os.path.dirname(__file__), ".env")
+if os.path.exists(dotenv_path):
+    load_dotenv(dotenv_path)
+
+from app import create_app
+from app.asgi import ASGIApp
+
+app = create_app(os.getenv("FLASK_CONFIG") or "default")
+application = ASGIApp(app)
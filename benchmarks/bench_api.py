@@ -0,0 +1,68 @@
+"""
+Throughput of the JSON API against the HTML list page for the same list.
+
+    python -m benchmarks.bench_api [items]
+"""
+
+import sys
+import time
+
+from app import fragments
+
+from .common import login, make_app, make_list, make_user, print_table
+
+
+def run(size=10_000, repeat=5):
+    app = make_app()
+    with app.app_context():
+        owner = make_user("owner")
+        guest = make_user("guest")
+        list_id = make_list(owner, size, comments_per_item=1, commenter=guest).id
+    client = login(app.test_client(), "guest@example.com")
+
+    def html():
+        with app.app_context():
+            fragments.clear()
+        return [client.get(f"/lists/{list_id}").get_data()]
+
+    def api(fields):
+        def fetch():
+            bodies = []
+            path = f"/api/v1/lists/{list_id}/items?limit=5000&fields={fields}"
+            cursor = ""
+            while cursor is not None:
+                response = client.get(path + (f"&cursor={cursor}" if cursor else ""))
+                bodies.append(response.get_data())
+                cursor = response.get_json()["next"]
+            return bodies
+
+        return fetch
+
+    routes = {
+        "HTML /lists/<id> (uncached)": html,
+        "API items": api("id,name,link,description,category"),
+        "API items+comments": api("id,name,category,comments"),
+        "API items, id+name only": api("id,name"),
+    }
+    rows = []
+    for name, fetch in routes.items():
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            bodies = fetch()
+            timings.append(time.perf_counter() - start)
+        best = min(timings)
+        rows.append(
+            (
+                name,
+                len(bodies),
+                sum(len(b) for b in bodies),
+                f"{best * 1000:.0f}",
+                f"{size / best:.0f}",
+            )
+        )
+    print_table(("route", "requests", "bytes", "best ms", "items/s"), rows)
+
+
+if __name__ == "__main__":
+    run(*[int(a) for a in sys.argv[1:]])
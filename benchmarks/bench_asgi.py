@@ -0,0 +1,215 @@
+"""
+Requests per second with many simultaneous clients, served over WSGI
+(werkzeug's threaded server, one thread per connection, as `flask run`
+does) and over ASGI (uvicorn running asgi.py's ASGIApp, with the index,
+list and profile pages on the event loop and aiosqlite).
+
+Each client keeps one HTTP/1.1 connection open and fetches the index, the
+busiest author's biggest list and their profile in turn, as the same
+logged-in user, for a fixed time. Both servers use the tuned production
+database profile on a seeded database; uvicorn has to be installed.
+
+    python -m benchmarks.bench_asgi [clients] [seconds]
+"""
+
+import asyncio
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import time
+from urllib.parse import urlencode
+
+from app import create_app
+from app.bench import Targets
+from app.seed import populate
+from config import ProductionConfig
+
+from .common import make_app, percentiles, print_table
+
+HOST = "127.0.0.1"
+PASSWORD = "dibs"
+SETTINGS = {
+    "SQLALCHEMY_ENGINE_OPTIONS": ProductionConfig.SQLALCHEMY_ENGINE_OPTIONS,
+    "DIBS_SQLITE_PRAGMAS": ProductionConfig.DIBS_SQLITE_PRAGMAS,
+    "DIBS_SLOW_REQUEST_MS": 10**9,
+    "WTF_CSRF_ENABLED": False,
+}
+
+
+def serve(mode, port, database):
+    app = create_app("testing", SQLALCHEMY_DATABASE_URI=database, **SETTINGS)
+    if mode == "asgi":
+        import uvicorn
+
+        from app.asgi import ASGIApp
+
+        uvicorn.run(
+            ASGIApp(app),
+            host=HOST,
+            port=port,
+            log_level="warning",
+            access_log=False,
+            lifespan="on",
+            backlog=2048,
+        )
+    else:
+        from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler, make_server
+
+        class Handler(WSGIRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_request(self, *args):
+                pass
+
+        # the default backlog of 128 would turn clients away
+        BaseWSGIServer.request_queue_size = 2048
+        make_server(
+            HOST, port, app, threaded=True, request_handler=Handler
+        ).serve_forever()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind((HOST, 0))
+        return s.getsockname()[1]
+
+
+def wait_for(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((HOST, port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"nothing is listening on port {port}")
+
+
+def cookies(response, jar):
+    for name, value in response.getheaders():
+        if name.lower() == "set-cookie":
+            key, _, value = value.split(";", 1)[0].partition("=")
+            jar[key] = value
+    return "; ".join(f"{key}={value}" for key, value in jar.items())
+
+
+def login(port, email):
+    """The session cookie of ``email``, with the login message already shown."""
+    jar = {}
+    connection = http.client.HTTPConnection(HOST, port)
+    headers = {"User-Agent": "dibs-bench"}
+    connection.request(
+        "POST",
+        "/auth/login",
+        body=urlencode({"email": email, "password": PASSWORD}),
+        headers=dict(headers, **{"Content-Type": "application/x-www-form-urlencoded"}),
+    )
+    response = connection.getresponse()
+    response.read()
+    connection.request("GET", "/", headers=dict(headers, Cookie=cookies(response, jar)))
+    response = connection.getresponse()
+    response.read()
+    connection.close()
+    return cookies(response, jar)
+
+
+async def read_response(reader):
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin1").split("\r\n")
+    status = int(lines[0].split()[1])
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+    await reader.readexactly(int(headers.get("content-length", 0)))
+    return status, headers.get("connection", "").lower() == "close"
+
+
+async def client(n, port, paths, cookie, deadline, latencies, failures):
+    request = (
+        "GET {} HTTP/1.1\r\nHost: bench\r\nUser-Agent: dibs-bench\r\n"
+        f"Cookie: {cookie}\r\n\r\n"
+    )
+    connection = None
+    while time.perf_counter() < deadline:
+        path = paths[n % len(paths)]
+        n += 1
+        start = time.perf_counter()
+        try:
+            if connection is None:
+                connection = await asyncio.open_connection(HOST, port)
+            reader, writer = connection
+            writer.write(request.format(path).encode())
+            status, close = await read_response(reader)
+        except (OSError, asyncio.IncompleteReadError):
+            failures.append("connection")
+            connection = None
+            continue
+        latencies.append(time.perf_counter() - start)
+        if status != 200:
+            failures.append(status)
+        if close:
+            writer.close()
+            connection = None
+    if connection is not None:
+        connection[1].close()
+
+
+async def load(port, paths, cookie, clients, seconds):
+    latencies, failures = [], []
+    deadline = time.perf_counter() + seconds
+    await asyncio.gather(
+        *[
+            client(n, port, paths, cookie, deadline, latencies, failures)
+            for n in range(clients)
+        ]
+    )
+    return latencies, failures
+
+
+def measure(mode, database, targets, clients, seconds):
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.bench_asgi", "serve", mode, str(port)],
+        env=dict(os.environ, BENCH_DATABASE=database),
+    )
+    try:
+        wait_for(port)
+        cookie = login(port, targets.viewer)
+        paths = ["/", f"/lists/{targets.list_id}", f"/user/{targets.author}"]
+        asyncio.run(load(port, paths, cookie, min(clients, 20), 2))
+        latencies, failures = asyncio.run(load(port, paths, cookie, clients, seconds))
+    finally:
+        server.terminate()
+        server.wait()
+    p50, p99 = percentiles(latencies, (50, 99))
+    return (
+        mode,
+        clients,
+        f"{len(latencies) / seconds:.0f}",
+        f"{p50 * 1000:.0f}",
+        f"{p99 * 1000:.0f}",
+        len(failures),
+    )
+
+
+def run(clients=500, seconds=20):
+    app = make_app(**SETTINGS)
+    with app.app_context():
+        populate(users=100, lists=500, comments=5000, password=PASSWORD)
+        targets = Targets(PASSWORD)
+    database = app.config["SQLALCHEMY_DATABASE_URI"]
+    rows = [
+        measure(mode, database, targets, clients, seconds) for mode in ("wsgi", "asgi")
+    ]
+    print_table(("mode", "clients", "req/s", "p50 ms", "p99 ms", "failures"), rows)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["serve"]:
+        serve(sys.argv[2], int(sys.argv[3]), os.environ["BENCH_DATABASE"])
+    else:
+        run(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,98 @@
+"""
+Claims per second through the claim endpoint, with the tuned production
+database profile: one claimant calling dibs on item after item, several
+claimants at once on different items, and many at once on the same item,
+where exactly one may win.
+
+    python -m benchmarks.bench_claims [items] [claimants]
+"""
+
+import sys
+import threading
+import time
+
+from app.models import Claim
+from config import ProductionConfig
+
+from .common import login, make_app, make_list, make_user, print_table
+
+SETTINGS = {
+    "SQLALCHEMY_ENGINE_OPTIONS": ProductionConfig.SQLALCHEMY_ENGINE_OPTIONS,
+    "DIBS_SQLITE_PRAGMAS": ProductionConfig.DIBS_SQLITE_PRAGMAS,
+    "DIBS_SLOW_REQUEST_MS": 10**9,
+}
+
+
+def claim_all(clients, list_id, assignments):
+    """
+    Have each of ``clients`` claim its list of ``assignments`` at the same
+    time, returning the seconds taken and the failed requests.
+    """
+    start = threading.Barrier(len(clients) + 1)
+    failures = []
+
+    def work(client, item_ids):
+        start.wait()
+        for item_id in item_ids:
+            response = client.post(f"/lists/{list_id}/claim/{item_id}")
+            if response.status_code != 302:
+                failures.append(response.status_code)
+
+    threads = [
+        threading.Thread(target=work, args=(client, item_ids))
+        for client, item_ids in zip(clients, assignments)
+    ]
+    for thread in threads:
+        thread.start()
+    start.wait()
+    began = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - began, failures
+
+
+def run(items=2000, claimants=200):
+    app = make_app(**SETTINGS)
+    with app.app_context():
+        owner = make_user("owner")
+        for n in range(claimants):
+            make_user(f"relative{n}")
+        wishlist = make_list(owner, items)
+        list_id = wishlist.id
+        item_ids = [item.id for item in wishlist.items]
+        hot_list = make_list(owner, 1)
+        hot_list_id, hot = hot_list.id, hot_list.items.first().id
+    clients = [
+        login(app.test_client(), f"relative{n}@example.com") for n in range(claimants)
+    ]
+    rows = []
+    offset = 0
+    for label, threads, count in (
+        ("one claimant", 1, items // 4),
+        ("8 claimants, own items", 8, items // 4),
+        (f"{claimants} claimants, own items", claimants, items // 2),
+    ):
+        batch = item_ids[offset : offset + count]
+        offset += count
+        assignments = [batch[n::threads] for n in range(threads)]
+        seconds, failures = claim_all(clients[:threads], list_id, assignments)
+        with app.app_context():
+            claimed = Claim.query.filter(Claim.item_id.in_(batch)).count()
+        rows.append((label, count, claimed, f"{count / seconds:.0f}", len(failures)))
+    seconds, failures = claim_all(clients, hot_list_id, [[hot]] * claimants)
+    with app.app_context():
+        winners = Claim.query.filter_by(item_id=hot).count()
+    rows.append(
+        (
+            f"{claimants} claimants, one item",
+            claimants,
+            winners,
+            f"{claimants / seconds:.0f}",
+            len(failures),
+        )
+    )
+    print_table(("scenario", "requests", "claimed", "requests/s", "failures"), rows)
+
+
+if __name__ == "__main__":
+    run(*[int(a) for a in sys.argv[1:]])
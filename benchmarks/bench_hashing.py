@@ -0,0 +1,100 @@
+"""
+Logins per second, and the latency of an unrelated page while a login storm
+is going on, with password hashing done inline on the request threads and
+in the bounded process pool. The last profile floods the pool with wrong
+passwords to show the login throttle turning them away.
+
+Hashes use werkzeug's production default cost, not the cheap testing one.
+
+    python -m benchmarks.bench_hashing [login-threads] [seconds] [hash-workers]
+"""
+
+import sys
+import threading
+import time
+
+from app import db
+
+from .common import login, make_app, make_user, percentiles, print_table
+
+
+def run(threads=8, seconds=10, workers=1):
+    profiles = {
+        "inline": ({"DIBS_HASH_WORKERS": 0}, "bench"),
+        "pool": ({"DIBS_HASH_WORKERS": workers}, "bench"),
+        "pool, bad passwords": ({"DIBS_HASH_WORKERS": workers}, "wrong"),
+    }
+    rows = []
+    for name, (overrides, password) in profiles.items():
+        app = make_app(
+            DIBS_PASSWORD_METHOD="pbkdf2:sha256",
+            DIBS_HASH_MAX_PENDING=4 * threads,
+            DIBS_HASH_TIMEOUT=60,
+            DIBS_SLOW_REQUEST_MS=60000,
+            **overrides,
+        )
+        with app.app_context():
+            make_user("reader")
+            for n in range(threads):
+                make_user(f"user{n}")
+        reader = login(app.test_client(), "reader@example.com")
+        # start the pool before the clock does
+        login(app.test_client(), "user0@example.com")
+        stop = threading.Event()
+        outcomes = {}
+        latencies = []
+
+        def storm(n):
+            client = app.test_client()
+            data = {"email": f"user{n}@example.com", "password": password}
+            while not stop.is_set():
+                code = client.post("/auth/login", data=data).status_code
+                outcomes[code] = outcomes.get(code, 0) + 1
+
+        def probe():
+            while not stop.is_set():
+                start = time.perf_counter()
+                reader.get("/user/reader").get_data()
+                latencies.append(time.perf_counter() - start)
+                time.sleep(0.01)
+
+        pool = [threading.Thread(target=storm, args=(n,)) for n in range(threads)]
+        pool.append(threading.Thread(target=probe))
+        for t in pool:
+            t.start()
+        time.sleep(seconds)
+        stop.set()
+        for t in pool:
+            t.join()
+        with app.app_context():
+            app.extensions["last_seen"].flush()
+            app.extensions["hashing"].close()
+            db.engine.dispose()
+        p50, p95, p99 = percentiles(latencies, (50, 95, 99))
+        rows.append(
+            (
+                name,
+                f"{outcomes.get(302, 0) / seconds:.1f}",
+                f"{outcomes.get(200, 0) / seconds:.1f}",
+                f"{outcomes.get(429, 0) / seconds:.1f}",
+                f"{p50 * 1000:.1f}",
+                f"{p95 * 1000:.1f}",
+                f"{p99 * 1000:.1f}",
+            )
+        )
+    print_table(
+        (
+            "profile",
+            "logins/s",
+            "rejected/s",
+            "throttled/s",
+            "page p50 ms",
+            "page p95 ms",
+            "page p99 ms",
+        ),
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    run(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,79 @@
+"""
+Write-lock contention caused by last_seen pings under concurrent requests.
+
+Compares flushing every ping (DIBS_LAST_SEEN_FLUSH_SIZE=1, i.e. one UPDATE per
+request as before) with the default coalescing buffer.
+
+    python -m benchmarks.bench_last_seen [threads] [requests-per-thread]
+"""
+
+import sys
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+
+from app import db
+
+from .common import login, make_app, make_user, print_table
+
+
+def run(threads=8, per_thread=200):
+    profiles = {
+        "per-request": {"DIBS_LAST_SEEN_FLUSH_SIZE": 1},
+        "coalesced": {},
+    }
+    rows = []
+    for name, overrides in profiles.items():
+        app = make_app(**overrides)
+        with app.app_context():
+            for n in range(threads):
+                make_user(f"user{n}")
+            engine = db.engine
+        writes = []
+        write_time = []
+        locked = []
+
+        def before(conn, cursor, statement, *args):
+            conn.info["started"] = time.perf_counter()
+
+        def after(conn, cursor, statement, *args):
+            if statement.startswith("UPDATE users"):
+                writes.append(1)
+                write_time.append(time.perf_counter() - conn.info["started"])
+
+        event.listen(engine, "before_cursor_execute", before)
+        event.listen(engine, "after_cursor_execute", after)
+
+        def worker(n):
+            client = login(app.test_client(), f"user{n}@example.com")
+            for _ in range(per_thread):
+                try:
+                    client.get(f"/user/user{n}")
+                except OperationalError:
+                    locked.append(1)
+
+        start = time.perf_counter()
+        pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+        elapsed = time.perf_counter() - start
+        with app.app_context():
+            app.extensions["last_seen"].flush()
+        rows.append(
+            (
+                name,
+                len(writes),
+                f"{sum(write_time) * 1000:.1f}",
+                len(locked),
+                f"{threads * per_thread / elapsed:.0f}",
+            )
+        )
+    print_table(("profile", "UPDATEs", "ms in UPDATE", "locked errors", "req/s"), rows)
+
+
+if __name__ == "__main__":
+    run(*[int(a) for a in sys.argv[1:]])
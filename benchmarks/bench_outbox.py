@@ -0,0 +1,68 @@
+"""
+Outbox throughput: time to drain 10k queued messages into a local stand-in
+SMTP server, for a few worker pool and batch sizes.
+
+    python -m benchmarks.bench_outbox [messages]
+"""
+
+import sys
+import time
+from datetime import datetime
+
+from app import db, outbox
+from app.models import OutboxMessage
+from tests.smtp_server import SMTPServer
+
+from .common import make_app, print_table
+
+
+def run(messages=10_000, profiles=((1, 1), (1, 50), (4, 50), (8, 100))):
+    rows = []
+    for workers, batch_size in profiles:
+        with SMTPServer() as server:
+            app = make_app(
+                MAIL_SERVER="127.0.0.1",
+                MAIL_PORT=server.port,
+                MAIL_USE_TLS=False,
+                MAIL_SUPPRESS_SEND=False,
+                DIBS_OUTBOX_WORKERS=workers,
+                DIBS_OUTBOX_BATCH_SIZE=batch_size,
+                DIBS_OUTBOX_POLL_INTERVAL=0.05,
+            )
+            with app.app_context():
+                db.session.execute(
+                    OutboxMessage.__table__.insert(),
+                    [
+                        {
+                            "sender": "dibs@example.com",
+                            "recipients": f"user{i}@example.com",
+                            "subject": f"message {i}",
+                            "body": "hello",
+                            "status": "pending",
+                            "attempts": 0,
+                            "next_attempt_at": datetime.utcnow(),
+                        }
+                        for i in range(messages)
+                    ],
+                )
+                db.session.commit()
+                start = time.perf_counter()
+                outbox.start()
+                while len(server.messages) < messages:
+                    time.sleep(0.05)
+                elapsed = time.perf_counter() - start
+                outbox.stop()
+            rows.append(
+                (
+                    workers,
+                    batch_size,
+                    server.connections,
+                    f"{elapsed:.2f}",
+                    f"{messages / elapsed:.0f}",
+                )
+            )
+    print_table(("workers", "batch", "SMTP connections", "seconds", "msg/s"), rows)
+
+
+if __name__ == "__main__":
+    run(*[int(a) for a in sys.argv[1:]])
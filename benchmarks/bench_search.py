@@ -0,0 +1,99 @@
+"""
+Full-text search latency over a large catalogue.
+
+Fills a list with ``n`` items whose names and descriptions are drawn from a
+Zipf-distributed synthetic vocabulary (the FTS5 index is maintained by the
+triggers while inserting), then times one page of results for words of
+decreasing frequency, two-word queries and prefixes.
+
+    python -m benchmarks.bench_search [items] [repeats]
+"""
+
+import random
+import statistics
+import sys
+import time
+
+from app import db
+from app.models import Item
+from app.search import match_expression, search
+
+from .common import make_app, make_list, make_user, print_table
+
+VOCABULARY = 20000
+
+
+def word(rank):
+    """A pronounceable, unique word for a vocabulary rank."""
+    syllables = "ba be bi bo bu da de di do du ka ke ki ko ku la le li lo lu".split()
+    letters = []
+    rank += 1
+    while rank:
+        rank, digit = divmod(rank, len(syllables))
+        letters.append(syllables[digit])
+    return "".join(letters)
+
+
+def fill(list_id, n, chunk=20000):
+    rng = random.Random(0)
+    ranks = range(VOCABULARY)
+    weights = [1 / (r + 1) for r in ranks]
+    started = time.perf_counter()
+    for offset in range(0, n, chunk):
+        words = rng.choices(ranks, weights, k=min(chunk, n - offset) * 8)
+        rows = []
+        for i in range(min(chunk, n - offset)):
+            w = words[i * 8 : i * 8 + 8]
+            rows.append(
+                {
+                    "name": f"{word(w[0])} {word(w[1])}",
+                    "description": " ".join(word(r) for r in w[2:]),
+                    "link": None,
+                    "list_id": list_id,
+                    "category_id": 1,
+                }
+            )
+        db.session.execute(Item.__table__.insert(), rows)
+        db.session.commit()
+    return time.perf_counter() - started
+
+
+def run(n=1_000_000, repeats=20):
+    app = make_app()
+    with app.app_context():
+        owner = make_user("owner")
+        wishlist = make_list(owner, 0)
+        seconds = fill(wishlist.id, n)
+        print(
+            f"inserted {n} items in {seconds:.1f}s ({n / seconds:.0f}/s, FTS included)"
+        )
+        queries = [word(rank) for rank in (0, 9, 99, 999, 9999)]
+        queries += [f"{word(9)} {word(99)}", f"{word(99)} {word(999)}"]
+        queries += [word(999)[:3], word(9999)[:5]]
+        rows = []
+        for query in queries:
+            matches = db.session.execute(
+                db.text("SELECT count(*) FROM items_fts WHERE items_fts MATCH :q"),
+                {"q": match_expression(query)},
+            ).scalar()
+            timings = {}
+            for page in (1, 5):
+                samples = []
+                for _ in range(repeats):
+                    start = time.perf_counter()
+                    search(query, page=page)
+                    samples.append(time.perf_counter() - start)
+                timings[page] = statistics.median(samples)
+            rows.append(
+                (
+                    query,
+                    matches,
+                    f"{timings[1] * 1000:.2f}",
+                    f"{timings[5] * 1000:.2f}",
+                )
+            )
+    print_table(("query", "matches", "page 1 ms", "page 5 ms"), rows)
+
+
+if __name__ == "__main__":
+    run(*[int(a) for a in sys.argv[1:]])
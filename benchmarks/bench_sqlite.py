@@ -0,0 +1,107 @@
+"""
+Mixed read/write load against the default SQLite engine and the tuned
+production profile (QueuePool, WAL, synchronous=NORMAL, busy timeout, mmap
+and a larger page cache).
+
+Every thread is a logged-in guest that mostly reads a list page or its API
+items and, with probability ``write_ratio``, comments on one of its items.
+
+    python -m benchmarks.bench_sqlite [threads] [requests-per-thread] [items]
+        [write-ratio]
+
+The databases live under $TMPDIR; point it at the production disk to see
+the cost of fsync, which a tmpfs hides.
+"""
+
+import random
+import sys
+import threading
+import time
+
+from sqlalchemy.exc import OperationalError
+
+from app import db
+from app.models import Item
+from config import ProductionConfig
+
+from .common import login, make_app, make_list, make_user, percentiles, print_table
+
+PROFILES = {
+    "default": {},
+    "tuned": {
+        "SQLALCHEMY_ENGINE_OPTIONS": ProductionConfig.SQLALCHEMY_ENGINE_OPTIONS,
+        "DIBS_SQLITE_PRAGMAS": ProductionConfig.DIBS_SQLITE_PRAGMAS,
+    },
+}
+
+
+def run(threads=8, per_thread=300, n_items=30, write_ratio=0.2):
+    rows = []
+    for name, overrides in PROFILES.items():
+        app = make_app(**overrides)
+        with app.app_context():
+            owner = make_user("owner")
+            for n in range(threads):
+                make_user(f"guest{n}")
+            wishlist = make_list(owner, n_items)
+            list_id = wishlist.id
+            item_ids = [
+                row.id for row in db.session.query(Item.id).filter_by(list_id=list_id)
+            ]
+        latencies = []
+        locked = []
+        failed = []
+
+        def worker(n):
+            rng = random.Random(n)
+            client = login(app.test_client(), f"guest{n}@example.com")
+            for _ in range(per_thread):
+                roll = rng.random()
+                start = time.perf_counter()
+                try:
+                    if roll < write_ratio:
+                        response = client.post(
+                            f"/lists/{list_id}/create_comment/{rng.choice(item_ids)}",
+                            data={"body": "dibs"},
+                        )
+                    elif roll < (1 + write_ratio) / 2:
+                        response = client.get(f"/lists/{list_id}")
+                    else:
+                        response = client.get(f"/api/v1/lists/{list_id}/items")
+                    response.get_data()
+                    if response.status_code >= 400:
+                        failed.append(response.status_code)
+                except OperationalError:
+                    locked.append(1)
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+        elapsed = time.perf_counter() - start
+        with app.app_context():
+            app.extensions["last_seen"].flush()
+            db.engine.dispose()
+        p50, p95, p99 = percentiles(latencies, (50, 95, 99))
+        rows.append(
+            (
+                name,
+                f"{len(latencies) / elapsed:.0f}",
+                f"{p50 * 1000:.1f}",
+                f"{p95 * 1000:.1f}",
+                f"{p99 * 1000:.1f}",
+                len(locked),
+                len(failed),
+            )
+        )
+    print_table(
+        ("profile", "req/s", "p50 ms", "p95 ms", "p99 ms", "locked errors", "failed"),
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    run(*[(int, int, int, float)[n](a) for n, a in enumerate(sys.argv[1:])])
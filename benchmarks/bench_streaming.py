@@ -0,0 +1,128 @@
+"""
+Time to first byte, total time and bytes on the wire for a big list page,
+with and without streamed rendering, for each content coding, with the
+list's fragment cold (rendered for this request) and warm (cached).
+
+The app is served by werkzeug's threaded server in this process and
+fetched over a fresh connection per request, as a guest who has commented
+on every item.
+
+    python -m benchmarks.bench_streaming [items] [repeat]
+"""
+
+import http.client
+import socket
+import sys
+import threading
+import time
+from urllib.parse import urlencode
+
+from app import db, fragments
+
+from .common import make_app, make_list, make_user, print_table
+
+HOST = "127.0.0.1"
+ENCODINGS = ("identity", "gzip", "br")
+
+
+def serve(app):
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class Handler(WSGIRequestHandler):
+        def log_request(self, *args):
+            pass
+
+    server = make_server(HOST, 0, app, threaded=True, request_handler=Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def login(port, email):
+    """The session cookie of ``email``, with the login message already shown."""
+    connection = http.client.HTTPConnection(HOST, port)
+    connection.request(
+        "POST",
+        "/auth/login",
+        body=urlencode({"email": email, "password": "bench"}),
+        headers={
+            "User-Agent": "dibs-bench",
+            "Content-Type": "application/x-www-form-urlencoded",
+        },
+    )
+    response = connection.getresponse()
+    response.read()
+    cookie = response.getheader("Set-Cookie").split(";", 1)[0]
+    connection.request(
+        "GET", "/", headers={"User-Agent": "dibs-bench", "Cookie": cookie}
+    )
+    response = connection.getresponse()
+    response.read()
+    connection.close()
+    return response.getheader("Set-Cookie", cookie).split(";", 1)[0]
+
+
+def fetch(port, path, cookie, encoding):
+    """(seconds to the first byte, seconds in all, bytes received)"""
+    request = (
+        f"GET {path} HTTP/1.0\r\nHost: bench\r\nUser-Agent: dibs-bench\r\n"
+        f"Cookie: {cookie}\r\nAccept-Encoding: {encoding}\r\n\r\n"
+    )
+    with socket.create_connection((HOST, port)) as connection:
+        start = time.perf_counter()
+        connection.sendall(request.encode())
+        data = connection.recv(65536)
+        first = time.perf_counter()
+        received = len(data)
+        assert data.split(b"\r\n", 1)[0].endswith(b" 200 OK"), data[:100]
+        while data:
+            data = connection.recv(65536)
+            received += len(data)
+        end = time.perf_counter()
+    return first - start, end - start, received
+
+
+def run(size=5000, repeat=5):
+    app = make_app(DIBS_SLOW_REQUEST_MS=10**9)
+    with app.app_context():
+        owner = make_user("owner")
+        guest = make_user("guest")
+        list_id = make_list(owner, size, comments_per_item=1, commenter=guest).id
+    server = serve(app)
+    cookie = login(server.port, "guest@example.com")
+    path = f"/lists/{list_id}"
+    rows = []
+    try:
+        for streaming in (False, True):
+            app.config["DIBS_STREAM_TEMPLATES"] = streaming
+            for encoding in ENCODINGS:
+                for fragment in ("cold", "warm"):
+                    samples = []
+                    for _ in range(repeat):
+                        if fragment == "cold":
+                            with app.app_context():
+                                fragments.clear()
+                        else:
+                            fetch(server.port, path, cookie, encoding)
+                        samples.append(fetch(server.port, path, cookie, encoding))
+                    ttfb, total, received = min(samples)
+                    rows.append(
+                        (
+                            "on" if streaming else "off",
+                            encoding,
+                            fragment,
+                            f"{ttfb * 1000:.1f}",
+                            f"{min(s[1] for s in samples) * 1000:.1f}",
+                            received,
+                        )
+                    )
+    finally:
+        server.shutdown()
+        with app.app_context():
+            db.session.remove()
+    print_table(
+        ("streaming", "encoding", "fragment", "ttfb ms", "total ms", "bytes"), rows
+    )
+
+
+if __name__ == "__main__":
+    run(*[int(a) for a in sys.argv[1:]])
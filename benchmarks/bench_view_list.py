@@ -0,0 +1,66 @@
+"""
+Query count and wall time of main.view_list for large lists, with the
+fragment cache emptied before every run ("cold") and kept ("warm").
+Queries are the mean per request over all runs.
+
+    python -m benchmarks.bench_view_list [sizes...]
+"""
+
+import sys
+import time
+
+from app import db, fragments
+
+from .common import QueryCounter, login, make_app, make_list, make_user, print_table
+
+DEFAULT_SIZES = (1_000, 10_000, 50_000)
+
+
+def run(sizes=DEFAULT_SIZES, repeat=3):
+    rows = []
+    for size in sizes:
+        app = make_app()
+        with app.app_context():
+            owner = make_user("owner")
+            guest = make_user("guest")
+            wishlist = make_list(owner, size, comments_per_item=1, commenter=guest)
+            list_id = wishlist.id
+            engine = db.engine
+        for viewer in ("owner", "guest"):
+            client = login(app.test_client(), f"{viewer}@example.com")
+            # fills the identity and reference data caches, which stay warm
+            view(client, list_id)
+            for cache in ("cold", "warm"):
+                timings = []
+                with QueryCounter(engine) as counter:
+                    for _ in range(repeat):
+                        if cache == "cold":
+                            with app.app_context():
+                                fragments.clear()
+                        timings.append(view(client, list_id))
+                rows.append(
+                    (
+                        size,
+                        viewer,
+                        cache,
+                        f"{counter.count / repeat:.1f}",
+                        f"{min(timings) * 1000:.1f}",
+                    )
+                )
+    print_table(("items", "viewer", "cache", "queries", "best ms"), rows)
+
+
+def view(client, list_id):
+    """Seconds taken to fetch and read the whole page of a list."""
+    start = time.perf_counter()
+    response = client.get(f"/lists/{list_id}")
+    # the page is streamed: it is rendered as it is read
+    response.get_data()
+    elapsed = time.perf_counter() - start
+    response.close()
+    assert response.status_code == 200
+    return elapsed
+
+
+if __name__ == "__main__":
+    run([int(a) for a in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,149 @@
+"""
+Shared helpers for the benchmark scripts in this directory.
+
+Each script builds a throwaway app against its own SQLite database, seeds it
+and drives it through the Flask test client, e.g.::
+
+    python -m benchmarks.bench_view_list
+"""
+
+import atexit
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from app import create_app, db
+from app.bench import percentile
+from app.models import Category, Item, List, Role, User
+
+
+def make_app(**overrides):
+    """
+    Create a testing app backed by a fresh sqlite file in a temp dir, removed
+    when the process exits, with ``overrides`` applied on top of
+    TestingConfig.
+    """
+    tmpdir = tempfile.mkdtemp(prefix="dibs-bench-")
+    atexit.register(shutil.rmtree, tmpdir, True)
+    settings = {
+        "SQLALCHEMY_DATABASE_URI": "sqlite:///" + os.path.join(tmpdir, "bench.sqlite"),
+        "WTF_CSRF_ENABLED": False,
+    }
+    settings.update(overrides)
+    app = create_app("testing", **settings)
+    with app.app_context():
+        db.create_all()
+        Role.insert_roles()
+        Category.insert_categories()
+    return app
+
+
+def make_user(username, password="bench"):
+    user = User(
+        email=f"{username}@example.com",
+        username=username,
+        password=password,
+        confirmed=True,
+    )
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def make_list(author, n_items, comments_per_item=0, commenter=None):
+    """Create a list with ``n_items`` items spread over all categories."""
+    category_ids = [c.id for c in Category.query.all()]
+    wishlist = List(title=f"{n_items} things", author_id=author.id)
+    db.session.add(wishlist)
+    db.session.commit()
+    db.session.execute(
+        Item.__table__.insert(),
+        [
+            {
+                "name": f"item {i}",
+                "description": f"description of item {i}",
+                "list_id": wishlist.id,
+                "category_id": category_ids[i % len(category_ids)],
+            }
+            for i in range(n_items)
+        ],
+    )
+    if comments_per_item and commenter is not None:
+        item_ids = [
+            row.id for row in db.session.query(Item.id).filter_by(list_id=wishlist.id)
+        ]
+        from app.models import Comment
+
+        db.session.execute(
+            Comment.__table__.insert(),
+            [
+                {
+                    "body": f"dibs {n}",
+                    "list_id": wishlist.id,
+                    "item_id": item_id,
+                    "author_id": commenter.id,
+                    "author": commenter.username,
+                }
+                for item_id in item_ids
+                for n in range(comments_per_item)
+            ],
+        )
+    db.session.commit()
+    return wishlist
+
+
+def login(client, email, password="bench"):
+    response = client.post("/auth/login", data={"email": email, "password": password})
+    assert response.status_code == 302, response.status_code
+    return client
+
+
+class QueryCounter:
+    """Count the SQL statements executed on an engine while active."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        self.statements = []
+        event.listen(self.engine, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._record)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+
+@contextmanager
+def timed(results, key):
+    start = time.perf_counter()
+    yield
+    results[key] = time.perf_counter() - start
+
+
+def print_table(headers, rows):
+    widths = [
+        max(len(str(h)), *(len(str(r[i])) for r in rows)) for i, h in enumerate(headers)
+    ]
+    line = "  ".join(str(h).ljust(w) for h, w in zip(headers, widths))
+    print(line)
+    print("-" * len(line))
+    for row in rows:
+        print("  ".join(str(c).ljust(w) for c, w in zip(row, widths)))
+
+
+def percentiles(samples, points):
+    """The ``points`` percentiles (0-100) of ``samples``, nearest-rank."""
+    ordered = sorted(samples)
+    return [percentile(ordered, p) for p in points]
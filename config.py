@@ -1,5 +1,7 @@
 import os
 
+from sqlalchemy.pool import QueuePool
+
 basedir = os.path.abspath(os.path.dirname(__file__))
 
 
@@ -14,6 +16,70 @@ class Config:
     DIBS_ADMIN = os.environ.get("DIBS_ADMIN")
     DIBS_MAIL_SUBJECT_PREFIX = "[dibs]"
     DIBS_MAIL_SENDER = f"dibs Admin <{DIBS_ADMIN}>"
+    DIBS_LISTS_PER_PAGE = int(os.environ.get("DIBS_LISTS_PER_PAGE") or 20)
+    DIBS_LAST_SEEN_FLUSH_INTERVAL = int(
+        os.environ.get("DIBS_LAST_SEEN_FLUSH_INTERVAL") or 60
+    )
+    DIBS_LAST_SEEN_FLUSH_SIZE = int(os.environ.get("DIBS_LAST_SEEN_FLUSH_SIZE") or 500)
+    DIBS_IDENTITY_CACHE_SIZE = int(os.environ.get("DIBS_IDENTITY_CACHE_SIZE") or 1024)
+    DIBS_IDENTITY_CACHE_TTL = int(os.environ.get("DIBS_IDENTITY_CACHE_TTL") or 300)
+    DIBS_API_PAGE_SIZE = 100
+    DIBS_API_MAX_PAGE_SIZE = 5000
+    DIBS_API_BATCH_SIZE = 500
+    DIBS_OUTBOX_WORKERS = int(os.environ.get("DIBS_OUTBOX_WORKERS") or 2)
+    DIBS_OUTBOX_BATCH_SIZE = 50
+    DIBS_OUTBOX_MAX_ATTEMPTS = 8
+    DIBS_OUTBOX_BACKOFF = 30
+    DIBS_OUTBOX_POLL_INTERVAL = 10
+    DIBS_OUTBOX_LEASE = 600
+    DIBS_PREVIEW_WORKERS = int(os.environ.get("DIBS_PREVIEW_WORKERS") or 2)
+    DIBS_PREVIEW_BATCH_SIZE = 10
+    DIBS_PREVIEW_TIMEOUT = 5
+    DIBS_PREVIEW_MAX_BYTES = 512 * 1024
+    DIBS_PREVIEW_MAX_ATTEMPTS = 4
+    DIBS_PREVIEW_BACKOFF = 60
+    DIBS_PREVIEW_POLL_INTERVAL = 10
+    DIBS_PREVIEW_LEASE = 300
+    # fetch links to loopback and private addresses too (local development)
+    DIBS_PREVIEW_ALLOW_PRIVATE = False
+    DIBS_ETAG_SALT = os.environ.get("DIBS_ETAG_SALT") or "1"
+    DIBS_SEARCH_PER_PAGE = 20
+    DIBS_SEARCH_MAX_PAGES = 50
+    DIBS_SEARCH_CANDIDATES = 10000
+    DIBS_FRAGMENT_CACHE_BYTES = int(
+        os.environ.get("DIBS_FRAGMENT_CACHE_BYTES") or 32 * 1024 * 1024
+    )
+    DIBS_SQLITE_PRAGMAS = {}
+    DIBS_SERVER_TIMING = True
+    DIBS_SLOW_REQUEST_MS = int(os.environ.get("DIBS_SLOW_REQUEST_MS") or 500)
+    DIBS_STATS_PERSIST = True
+    DIBS_STATS_FLUSH_INTERVAL = int(os.environ.get("DIBS_STATS_FLUSH_INTERVAL") or 60)
+    DIBS_PASSWORD_METHOD = os.environ.get("DIBS_PASSWORD_METHOD") or "pbkdf2:sha256"
+    DIBS_HASH_WORKERS = int(os.environ.get("DIBS_HASH_WORKERS") or 2)
+    DIBS_HASH_MAX_PENDING = 16
+    DIBS_HASH_TIMEOUT = 10
+    DIBS_LOGIN_FAILURES_PER_IP = 50
+    DIBS_LOGIN_FAILURES_PER_EMAIL = 5
+    DIBS_LOGIN_THROTTLE_WINDOW = 300
+    DIBS_ASGI_THREADS = int(os.environ.get("DIBS_ASGI_THREADS") or 8)
+    DIBS_ASYNC_POOL_SIZE = int(os.environ.get("DIBS_ASYNC_POOL_SIZE") or 8)
+    DIBS_ASSET_MAX_AGE = 365 * 24 * 3600
+    DIBS_COMPRESS_MIN_SIZE = 1024
+    DIBS_COMPRESS_MIMETYPES = (
+        "text/html",
+        "text/css",
+        "text/plain",
+        "text/csv",
+        "application/json",
+        "application/javascript",
+        "image/svg+xml",
+    )
+    DIBS_GZIP_LEVEL = 6
+    DIBS_BROTLI_QUALITY = 5
+    DIBS_STREAM_TEMPLATES = True
+    DIBS_STREAM_CHUNK_SIZE = 8192
+    DIBS_GC_CHUNK_SIZE = int(os.environ.get("DIBS_GC_CHUNK_SIZE") or 1000)
+    DIBS_TEMPLATE_CACHE_DIR = os.environ.get("DIBS_TEMPLATE_CACHE_DIR")
 
     @staticmethod
     def init_app(app) -> None:
@@ -29,6 +95,12 @@ class DevelopmentConfig(Config):
 
 class TestingConfig(Config):
     TESTING = True
+    DIBS_OUTBOX_WORKERS = 0
+    DIBS_PREVIEW_WORKERS = 0
+    DIBS_STATS_PERSIST = False
+    # cheap hashes, computed inline
+    DIBS_PASSWORD_METHOD = "pbkdf2:sha256:1000"
+    DIBS_HASH_WORKERS = 0
     SQLALCHEMY_DATABASE_URI = os.environ.get(
         "TEST_DATABASE_URL"
     ) or "sqlite:///" + os.path.join(basedir, "data-test.sqlite")
@@ -38,6 +110,27 @@ class ProductionConfig(Config):
     SQLALCHEMY_DATABASE_URI = os.environ.get(
         "DATABASE_URL"
     ) or "sqlite:///" + os.path.join(basedir, "data.sqlite")
+    # one pooled connection per worker thread, so the pragmas below are paid
+    # once per connection rather than once per request
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        "poolclass": QueuePool,
+        "pool_size": int(os.environ.get("DIBS_DB_POOL_SIZE") or 8),
+        "max_overflow": int(os.environ.get("DIBS_DB_MAX_OVERFLOW") or 8),
+        "pool_timeout": int(os.environ.get("DIBS_DB_POOL_TIMEOUT") or 10),
+        "connect_args": {"check_same_thread": False},
+    }
+    # readers never block behind the writer in WAL mode; synchronous=NORMAL
+    # only syncs at checkpoints, which is durable enough for a wish list
+    DIBS_SQLITE_PRAGMAS = {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": int(os.environ.get("DIBS_SQLITE_BUSY_TIMEOUT") or 5000),
+        "mmap_size": int(os.environ.get("DIBS_SQLITE_MMAP_SIZE") or 256 * 1024 * 1024),
+        "cache_size": -int(os.environ.get("DIBS_SQLITE_CACHE_KIB") or 64 * 1024),
+    }
+    DIBS_TEMPLATE_CACHE_DIR = os.environ.get("DIBS_TEMPLATE_CACHE_DIR") or os.path.join(
+        basedir, ".jinja-cache"
+    )
 
 
 config = {
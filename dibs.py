@@ -8,10 +8,12 @@ if os.path.exists(dotenv_path):
 
 from flask_migrate import Migrate
 from app import create_app, db
-from app.models import Category, User, Role
+from app.bench import SCENARIOS
+from app.models import Category, Item, List, User, Role
+from app.search import include_object
 
 app = create_app(os.getenv("FLASK_CONFIG") or "default")
-migrate = Migrate(app, db)
+migrate = Migrate(app, db, render_as_batch=True, include_object=include_object)
 
 
 @app.shell_context_processor
@@ -53,3 +55,214 @@ def setup() -> None:
     )
     db.session.add(user)
     db.session.commit()
+
+
+@app.cli.command("import-items")
+@click.argument("list_id", type=int)
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--format",
+    "fmt",
+    type=click.Choice(["csv", "json"]),
+    help="File format; guessed from the extension by default.",
+)
+def import_items_command(list_id, path, fmt) -> None:
+    """Bulk-import items from a CSV or JSON file into a list."""
+    from app.imports import ImportFailed, guess_format, import_items
+
+    if db.session.get(List, list_id) is None:
+        raise click.ClickException(f"There is no list {list_id}")
+    with open(path, "rb") as stream:
+        try:
+            result = import_items(list_id, stream, fmt or guess_format(path))
+        except ImportFailed as e:
+            raise click.ClickException(f"Nothing was imported: {e}")
+    rate = result.rows / result.seconds if result.seconds else result.rows
+    click.echo(
+        f"Imported {result.rows} items in {result.seconds:.2f}s "
+        f"({rate:.0f} rows per second)"
+    )
+
+
+@app.cli.command("rebuild-counts")
+def rebuild_counts() -> None:
+    """Recompute item comment counts from comments, claimed/claimer from claims."""
+    repaired = Item.rebuild_counts()
+    click.echo(f"Repaired {repaired} items")
+
+
+@app.cli.command("gc-orphans")
+@click.option(
+    "--chunk-size",
+    type=int,
+    help="Rows to look at per transaction; DIBS_GC_CHUNK_SIZE by default.",
+)
+def gc_orphans(chunk_size) -> None:
+    """Delete the items, comments and claims of deleted lists and items."""
+    from app.orphans import collect
+
+    collected = collect(chunk_size or app.config["DIBS_GC_CHUNK_SIZE"])
+    click.echo(
+        f"Deleted {collected.items} orphaned items, {collected.comments} comments "
+        f"and {collected.claims} claims"
+    )
+
+
+@app.cli.command("link-previews")
+@click.option(
+    "--backfill", is_flag=True, help="Queue previews of links added before them."
+)
+@click.option("--fetch", is_flag=True, help="Fetch what is due now, in this process.")
+def link_previews_command(backfill, fetch) -> None:
+    """Show, queue or fetch the previews of item links."""
+    from app import link_previews
+    from app.models import LinkPreview
+
+    if backfill:
+        click.echo(f"Queued previews for {link_previews.backfill()} items")
+    if fetch:
+        click.echo(f"Fetched {link_previews.fetch_pending()} links")
+    counts = (
+        db.session.query(LinkPreview.status, db.func.count())
+        .group_by(LinkPreview.status)
+        .order_by(LinkPreview.status)
+    )
+    for status, count in counts:
+        click.echo(f"{status:<10} {count:>8}")
+
+
+@app.cli.command()
+@click.option("--users", default=100, show_default=True)
+@click.option("--lists", default=500, show_default=True)
+@click.option("--items", "items_per_list", default=20, show_default=True)
+@click.option("--comments", default=5000, show_default=True)
+@click.option("--seed", default=0, show_default=True, help="Random seed.")
+@click.option("--password", default="dibs", show_default=True)
+def seed(users, lists, items_per_list, comments, seed, password) -> None:
+    """Generate a deterministic, skewed synthetic data set."""
+    from app.seed import populate
+
+    if User.query.filter_by(username="seed0").first() is not None:
+        raise click.ClickException("The database has already been seeded")
+    if Role.query.first() is None:
+        Role.insert_roles()
+        Category.insert_categories()
+    result = populate(users, lists, items_per_list, comments, seed, password)
+    click.echo(
+        f"Created {result.users} users, {result.lists} lists, "
+        f"{result.items} items and {result.comments} comments"
+    )
+
+
+@app.cli.command()
+@click.option(
+    "--scenario",
+    "scenarios",
+    multiple=True,
+    type=click.Choice(SCENARIOS),
+    help="Only run these scenarios (repeatable); all by default.",
+)
+@click.option("-n", "--requests", default=200, show_default=True)
+@click.option("--warmup", default=10, show_default=True)
+@click.option("--password", default="dibs", show_default=True)
+@click.option("--output", type=click.Path(dir_okay=False), help="Write JSON here.")
+@click.option(
+    "--compare",
+    "baseline",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Earlier JSON results to compare against.",
+)
+def bench(scenarios, requests, warmup, password, output, baseline) -> None:
+    """Benchmark the main routes against the current database."""
+    import json
+
+    from app import bench as benchmark
+
+    try:
+        results = benchmark.run(app, scenarios or SCENARIOS, requests, warmup, password)
+    except LookupError as e:
+        raise click.ClickException(str(e))
+    click.echo(
+        f"{'scenario':<10} {'p50':>9} {'p95':>9} {'p99':>9} {'queries':>8} {'req/s':>8}"
+    )
+    for scenario, r in results["scenarios"].items():
+        click.echo(
+            f"{scenario:<10} {r['p50_ms']:>7.1f}ms {r['p95_ms']:>7.1f}ms "
+            f"{r['p99_ms']:>7.1f}ms {r['queries_per_request']:>8} "
+            f"{r['throughput_rps']:>8}"
+        )
+    if baseline:
+        with open(baseline) as f:
+            rows = benchmark.compare(json.load(f), results)
+        click.echo()
+        for row in rows:
+            click.echo("{:<10} {:<20} {:>10} {:>10} {:>8}".format(*row))
+    if output:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2)
+        click.echo(f"Results written to {output}")
+
+
+@app.cli.command()
+@click.option("--reset", is_flag=True, help="Clear the counters afterwards.")
+def stats(reset) -> None:
+    """Show per-endpoint request counters collected by the instrumentation."""
+    from app.models import EndpointStat
+
+    rows = EndpointStat.query.order_by(EndpointStat.total_ms.desc()).all()
+    if not rows:
+        click.echo("No requests recorded yet")
+        return
+    click.echo(
+        f"{'endpoint':<28} {'requests':>8} {'mean ms':>8} {'max ms':>8} "
+        f"{'queries':>8} {'sql ms':>8} {'render ms':>9} {'slow':>5} {'errors':>6}"
+    )
+    for row in rows:
+        n = row.requests
+        click.echo(
+            f"{row.endpoint:<28} {n:>8} {row.total_ms / n:>8.1f} {row.max_ms:>8.1f} "
+            f"{row.sql_queries / n:>8.1f} {row.sql_ms / n:>8.1f} "
+            f"{row.render_ms / n:>9.1f} {row.slow:>5} {row.errors:>6}"
+        )
+    if reset:
+        EndpointStat.query.delete()
+        db.session.commit()
+
+
+@app.cli.command("rebuild-search")
+def rebuild_search() -> None:
+    """Rebuild the full-text search indexes from the items and lists tables."""
+    from app import search
+
+    search.rebuild()
+    click.echo("Rebuilt the search indexes")
+
+
+@app.cli.command("build-assets")
+def build_assets() -> None:
+    """Minify, fingerprint and precompress the static files."""
+    from app.assets import brotli, build
+
+    built = build(app.static_folder)
+    click.echo(f"{'file':<40} {'bytes':>8} {'minified':>8} {'gzip':>8} {'brotli':>8}")
+    for asset in built:
+        click.echo(
+            f"{asset.path:<40} {asset.size:>8} {asset.minified:>8} "
+            f"{asset.gzip:>8} {asset.brotli or '-':>8}"
+        )
+    if brotli is None:
+        click.echo("brotli is not installed; only gzip variants were written")
+    click.echo("Restart the app to serve the new build")
+
+
+@app.cli.command("compile-templates")
+def compile_templates() -> None:
+    """Compile every template into DIBS_TEMPLATE_CACHE_DIR."""
+    if not app.config["DIBS_TEMPLATE_CACHE_DIR"]:
+        raise click.UsageError("DIBS_TEMPLATE_CACHE_DIR is not set")
+    names = app.jinja_env.list_templates()
+    for name in names:
+        app.jinja_env.get_template(name)
+    click.echo(
+        f"Compiled {len(names)} templates into {app.config['DIBS_TEMPLATE_CACHE_DIR']}"
+    )
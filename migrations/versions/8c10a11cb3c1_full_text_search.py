@@ -0,0 +1,87 @@
+"""full-text search
+
+Revision ID: 8c10a11cb3c1
+Revises: 328c2a9bea16
+Create Date: 2026-10-18 17:21:51.196376
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c10a11cb3c1'
+down_revision = '328c2a9bea16'
+branch_labels = None
+depends_on = None
+
+
+STATEMENTS = [
+    """
+    CREATE VIRTUAL TABLE items_fts USING fts5(
+        name, description, link,
+        content='items', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER items_fts_insert AFTER INSERT ON items BEGIN
+        INSERT INTO items_fts(rowid, name, description, link)
+        VALUES (new.id, new.name, new.description, new.link);
+    END
+    """,
+    """
+    CREATE TRIGGER items_fts_delete AFTER DELETE ON items BEGIN
+        INSERT INTO items_fts(items_fts, rowid, name, description, link)
+        VALUES ('delete', old.id, old.name, old.description, old.link);
+    END
+    """,
+    """
+    CREATE TRIGGER items_fts_update
+    AFTER UPDATE OF name, description, link ON items BEGIN
+        INSERT INTO items_fts(items_fts, rowid, name, description, link)
+        VALUES ('delete', old.id, old.name, old.description, old.link);
+        INSERT INTO items_fts(rowid, name, description, link)
+        VALUES (new.id, new.name, new.description, new.link);
+    END
+    """,
+    """
+    CREATE VIRTUAL TABLE lists_fts USING fts5(
+        title,
+        content='lists', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER lists_fts_insert AFTER INSERT ON lists BEGIN
+        INSERT INTO lists_fts(rowid, title) VALUES (new.id, new.title);
+    END
+    """,
+    """
+    CREATE TRIGGER lists_fts_delete AFTER DELETE ON lists BEGIN
+        INSERT INTO lists_fts(lists_fts, rowid, title)
+        VALUES ('delete', old.id, old.title);
+    END
+    """,
+    """
+    CREATE TRIGGER lists_fts_update AFTER UPDATE OF title ON lists BEGIN
+        INSERT INTO lists_fts(lists_fts, rowid, title)
+        VALUES ('delete', old.id, old.title);
+        INSERT INTO lists_fts(rowid, title) VALUES (new.id, new.title);
+    END
+    """,
+    "INSERT INTO items_fts(items_fts) VALUES ('rebuild')",
+    "INSERT INTO lists_fts(lists_fts) VALUES ('rebuild')",
+]
+
+
+def upgrade():
+    for statement in STATEMENTS:
+        op.execute(statement)
+
+
+def downgrade():
+    for table in ("items", "lists"):
+        for action in ("insert", "delete", "update"):
+            op.execute(f"DROP TRIGGER IF EXISTS {table}_fts_{action}")
+        op.execute(f"DROP TABLE IF EXISTS {table}_fts")
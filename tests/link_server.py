@@ -0,0 +1,53 @@
+"""
+A minimal in-process web server for exercising the link preview workers
+without the internet. It serves ``pages``, a dict of path to (status,
+content type, body), after ``delay`` seconds, and counts the requests for
+each path.
+"""
+
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class LinkHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests[self.path] += 1
+        time.sleep(server.delay)
+        status, content_type, body = server.pages.get(
+            self.path, (404, "text/html", "<title>Not found</title>")
+        )
+        body = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class LinkServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, pages=None, delay=0, host="127.0.0.1", port=0):
+        super().__init__((host, port), LinkHandler)
+        self.pages = pages or {}
+        self.delay = delay
+        self.requests = Counter()
+        self.lock = threading.Lock()
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server_address[1]}{path}"
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
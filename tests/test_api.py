@@ -0,0 +1,98 @@
+import unittest
+
+from app import create_app, db, last_seen
+from app.models import Category, Comment, Item, List, Role, User
+
+
+class APITestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app("testing")
+        self.app.config["WTF_CSRF_ENABLED"] = False
+        with self.app.app_context():
+            db.create_all()
+            Role.insert_roles()
+            Category.insert_categories()
+            owner = User(
+                email="owner@example.com",
+                username="owner",
+                password="cat",
+                confirmed=True,
+            )
+            guest = User(
+                email="guest@example.com",
+                username="guest",
+                password="cat",
+                confirmed=True,
+            )
+            db.session.add_all([owner, guest])
+            db.session.commit()
+            wishlist = List(title="birthday", author_id=owner.id)
+            db.session.add(wishlist)
+            db.session.commit()
+            for i in range(5):
+                db.session.add(
+                    Item(name=f"item {i}", list_id=wishlist.id, category_id=1)
+                )
+            db.session.commit()
+            db.session.add(
+                Comment(
+                    body="dibs",
+                    list_id=wishlist.id,
+                    item_id=Item.query.first().id,
+                    author_id=guest.id,
+                    author="guest",
+                )
+            )
+            db.session.commit()
+            self.list_id = wishlist.id
+        self.clients = {}
+        for name in ("owner", "guest"):
+            client = self.app.test_client()
+            client.post(
+                "/auth/login", data={"email": f"{name}@example.com", "password": "cat"}
+            )
+            self.clients[name] = client
+
+    def tearDown(self):
+        with self.app.app_context():
+            last_seen.flush()
+            db.session.remove()
+            db.drop_all()
+
+    def get(self, name, path):
+        response = self.clients[name].get(path)
+        self.assertEqual(response.status_code, 200)
+        return response.get_json()
+
+    def test_requires_login(self):
+        response = self.app.test_client().get("/api/v1/feed")
+        self.assertEqual(response.status_code, 401)
+
+    def test_items_are_paginated_by_cursor(self):
+        path = f"/api/v1/lists/{self.list_id}/items?limit=2&fields=id,name"
+        names = []
+        page = self.get("guest", path)
+        while True:
+            names += [item["name"] for item in page["data"]]
+            self.assertEqual(set().union(*page["data"]), {"id", "name"})
+            if page["next"] is None:
+                break
+            page = self.get("guest", f"{path}&cursor={page['next']}")
+        self.assertEqual(names, [f"item {i}" for i in range(5)])
+
+    def test_owner_never_gets_comments(self):
+        path = f"/api/v1/lists/{self.list_id}/items?fields=name,comments"
+        guest = self.get("guest", path)["data"]
+        self.assertEqual(guest[0]["comments"][0]["body"], "dibs")
+        owner = self.get("owner", path)["data"]
+        self.assertTrue(all("comments" not in item for item in owner))
+
+    def test_feed_and_user_lists(self):
+        self.assertEqual(len(self.get("guest", "/api/v1/feed")["data"]), 1)
+        self.assertEqual(self.get("owner", "/api/v1/feed")["data"], [])
+        lists = self.get("guest", "/api/v1/users/owner/lists?fields=title,author")
+        self.assertEqual(lists["data"], [{"title": "birthday", "author": "owner"}])
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.clients["guest"].get("/api/v1/feed?fields=password_hash")
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,230 @@
+import asyncio
+import re
+import unittest
+from urllib.parse import urlencode
+
+from werkzeug.datastructures import Headers
+
+from app import create_app, db, last_seen
+from app.asgi import ASGIApp, wsgi_environ
+from app.models import Category, Comment, Item, List, Role, User
+
+
+class ASGIClient:
+    """Just enough of an HTTP client to talk to an ASGI app directly."""
+
+    def __init__(self, application):
+        self.application = application
+        self.cookies = {}
+
+    async def request(self, method, path, data=None):
+        path, _, query = path.partition("?")
+        body = urlencode(data).encode() if data else b""
+        headers = [(b"host", b"localhost"), (b"user-agent", b"asgi-test")]
+        if data:
+            headers.append((b"content-type", b"application/x-www-form-urlencoded"))
+        if self.cookies:
+            cookie = "; ".join(f"{k}={v}" for k, v in self.cookies.items())
+            headers.append((b"cookie", cookie.encode()))
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "query_string": query.encode(),
+            "root_path": "",
+            "headers": headers,
+            "client": ("127.0.0.1", 40000),
+            "server": ("localhost", 80),
+        }
+        sent = []
+
+        async def receive():
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        async def send(message):
+            sent.append(message)
+
+        await self.application(scope, receive, send)
+        self.messages = sent
+        headers = Headers(
+            [(k.decode("latin1"), v.decode("latin1")) for k, v in sent[0]["headers"]]
+        )
+        for cookie in headers.getlist("set-cookie"):
+            name, _, value = cookie.split(";", 1)[0].partition("=")
+            self.cookies[name] = value
+        return sent[0]["status"], headers, b"".join(m["body"] for m in sent[1:])
+
+    async def login(self, email):
+        await self.request("POST", "/auth/login", {"email": email, "password": "cat"})
+
+
+class ASGITestCase(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.app = create_app("testing")
+        self.app.config["WTF_CSRF_ENABLED"] = False
+        with self.app.app_context():
+            db.create_all()
+            Role.insert_roles()
+            Category.insert_categories()
+            for name in ("owner", "susan"):
+                db.session.add(
+                    User(
+                        email=f"{name}@example.com",
+                        username=name,
+                        password="cat",
+                        confirmed=True,
+                    )
+                )
+            db.session.commit()
+            owner = User.query.filter_by(username="owner").one()
+            susan = User.query.filter_by(username="susan").one()
+            wishlist = List(title="birthday", author_id=owner.id)
+            db.session.add(wishlist)
+            db.session.commit()
+            item = Item(name="teapot", list_id=wishlist.id, category_id=1)
+            db.session.add(item)
+            db.session.commit()
+            db.session.add(
+                Comment(
+                    body="dibs on the teapot",
+                    list_id=wishlist.id,
+                    item_id=item.id,
+                    author_id=susan.id,
+                    author="susan",
+                )
+            )
+            db.session.commit()
+            self.list_id = wishlist.id
+        self.application = ASGIApp(self.app)
+
+    async def asyncTearDown(self):
+        await self.application.close()
+
+    def tearDown(self):
+        with self.app.app_context():
+            last_seen.flush()
+            db.session.remove()
+            db.drop_all()
+
+    def wsgi_client(self, email):
+        client = self.app.test_client()
+        client.post("/auth/login", data={"email": email, "password": "cat"})
+        return client
+
+    def test_async_endpoints(self):
+        def view(method, path):
+            environ = wsgi_environ(
+                {
+                    "method": method,
+                    "path": path,
+                    "query_string": b"",
+                    "http_version": "1.1",
+                    "headers": [],
+                },
+                b"",
+            )
+            return self.application.async_view(environ)
+
+        self.assertIsNotNone(view("GET", "/"))
+        self.assertIsNotNone(view("HEAD", f"/lists/{self.list_id}"))
+        self.assertIsNotNone(view("GET", "/user/owner"))
+        self.assertIsNone(view("POST", f"/lists/{self.list_id}"))
+        self.assertIsNone(view("GET", "/auth/login"))
+        self.assertIsNone(view("GET", "/no/such/page"))
+
+    async def test_pages_match_wsgi(self):
+        paths = ["/", f"/lists/{self.list_id}", "/user/owner", "/user/susan"]
+        for email in ("owner@example.com", "susan@example.com"):
+            client = ASGIClient(self.application)
+            await client.login(email)
+            wsgi = self.wsgi_client(email)
+            # shows the login message and fills the caches
+            await client.request("GET", "/")
+            wsgi.get("/")
+            for path in paths:
+                with self.subTest(email=email, path=path):
+                    status, headers, body = await client.request("GET", path)
+                    expected = wsgi.get(path)
+                    self.assertEqual(status, expected.status_code)
+                    self.assertEqual(body, expected.data)
+                    if path != f"/user/{email.split('@')[0]}":
+                        # one's own profile changes with one's last seen time
+                        self.assertEqual(
+                            headers.get("ETag"), expected.headers.get("ETag")
+                        )
+        # the pages really were read through the async engine
+        self.assertIsNotNone(self.app.extensions["async_db"].engine)
+
+    async def test_queries_are_counted(self):
+        client = ASGIClient(self.application)
+        await client.login("susan@example.com")
+        wsgi = self.wsgi_client("susan@example.com")
+        for _ in range(2):
+            _, headers, _ = await client.request("GET", f"/lists/{self.list_id}")
+            expected = wsgi.get(f"/lists/{self.list_id}")
+        count = re.compile(r'desc="(\d+) queries"')
+        self.assertEqual(
+            count.search(headers["Server-Timing"]).group(1),
+            count.search(expected.headers["Server-Timing"]).group(1),
+        )
+
+    async def test_streamed_pages_are_sent_in_chunks(self):
+        self.app.config["DIBS_STREAM_CHUNK_SIZE"] = 256
+        expected = self.wsgi_client("susan@example.com").get(f"/lists/{self.list_id}")
+        # on the event loop, and from a thread
+        for application in (self.application, ASGIApp(self.app, views={})):
+            with self.subTest(views=application.views):
+                client = ASGIClient(application)
+                await client.login("susan@example.com")
+                await client.request("GET", "/")
+                _, headers, body = await client.request("GET", f"/lists/{self.list_id}")
+                self.assertNotIn("Content-Length", headers)
+                self.assertEqual(body, expected.data)
+                bodies = [m for m in client.messages if "body" in m]
+                self.assertGreater(len(bodies), 3)
+                self.assertTrue(all(m["more_body"] for m in bodies[:-1]))
+                self.assertFalse(bodies[-1].get("more_body"))
+            if application is not self.application:
+                application.executor.shutdown()
+
+    async def test_login_required_and_not_found(self):
+        client = ASGIClient(self.application)
+        status, headers, _ = await client.request("GET", f"/lists/{self.list_id}")
+        self.assertEqual(status, 302)
+        self.assertIn("/auth/login", headers["Location"])
+        client = ASGIClient(self.application)
+        await client.login("susan@example.com")
+        status, _, body = await client.request("GET", "/lists/12345")
+        self.assertEqual(status, 404)
+        self.assertEqual(
+            body, self.wsgi_client("susan@example.com").get("/lists/12345").data
+        )
+
+    async def test_writes_go_to_the_wsgi_app(self):
+        client = ASGIClient(self.application)
+        await client.login("owner@example.com")
+        status, _, _ = await client.request(
+            "POST",
+            f"/lists/{self.list_id}",
+            {"name": "kite", "category_id": 1, "link": "", "description": ""},
+        )
+        self.assertEqual(status, 302)
+        _, _, body = await client.request("GET", f"/lists/{self.list_id}")
+        self.assertIn(b"kite", body)
+
+    async def test_concurrent_requests(self):
+        client = ASGIClient(self.application)
+        await client.login("susan@example.com")
+        responses = await asyncio.gather(
+            *[
+                client.request("GET", path)
+                for path in ["/", f"/lists/{self.list_id}", "/user/owner"] * 20
+            ]
+        )
+        self.assertEqual({status for status, _, _ in responses}, {200})
+        self.assertEqual(
+            len({body for _, _, body in responses}), 3, "one body per page"
+        )
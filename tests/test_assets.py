@@ -0,0 +1,109 @@
+import gzip
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from flask import url_for
+
+from app import create_app
+from app.assets import brotli, build, minify_css
+
+CSS = """/*! licence */
+/* a comment */
+@media screen and (min-width: 576px) {
+  a :hover,
+  b > i { content: "a  b;}" ; width: calc(1px + 2px) ; }
+}
+"""
+
+
+class AssetsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.static = tempfile.mkdtemp(prefix="dibs-static-")
+        self.addCleanup(shutil.rmtree, self.static)
+        with open(os.path.join(self.static, "site.css"), "w") as f:
+            f.write(CSS)
+        os.makedirs(os.path.join(self.static, "img"))
+        with open(os.path.join(self.static, "img", "dot.svg"), "w") as f:
+            f.write("<svg/>")
+        self.app = create_app("testing")
+        self.app.static_folder = self.static
+        self.client = self.app.test_client()
+
+    def built_url(self, filename="site.css"):
+        with self.app.test_request_context():
+            return url_for("static", filename=filename)
+
+    def test_minify_css(self):
+        self.assertEqual(
+            minify_css(CSS),
+            "/*! licence */\n@media screen and (min-width:576px){a :hover,b>i"
+            '{content:"a  b;}";width:calc(1px + 2px)}}\n',
+        )
+
+    def test_minified_pico_keeps_every_block(self):
+        path = os.path.join(os.path.dirname(__file__), "..", "app", "static")
+        with open(os.path.join(path, "pico.css"), encoding="utf-8") as f:
+            css = f.read()
+        minified = minify_css(css)
+        self.assertLess(len(minified), len(css))
+        for c in "{}":
+            self.assertEqual(minified.count(c), css.count(c))
+
+    def test_unbuilt_files_are_served_as_usual(self):
+        self.assertEqual(self.built_url(), "/static/site.css")
+        response = self.client.get("/static/site.css")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_data(as_text=True), CSS)
+        self.assertNotIn("immutable", response.headers.get("Cache-Control", ""))
+        response.close()
+
+    def test_build_and_resolve(self):
+        built = {asset.name: asset for asset in build(self.static)}
+        self.assertEqual(set(built), {"site.css", "img/dot.svg"})
+        self.assertRegex(built["site.css"].path, r"^site\.[0-9a-f]{12}\.css$")
+        self.assertRegex(built["img/dot.svg"].path, r"^img/dot\.[0-9a-f]{12}\.svg$")
+        self.assertEqual(self.built_url(), f"/static/build/{built['site.css'].path}")
+        self.assertEqual(
+            self.built_url("img/dot.svg"), f"/static/build/{built['img/dot.svg'].path}"
+        )
+        self.assertEqual(self.built_url("missing.js"), "/static/missing.js")
+
+    def test_encodings(self):
+        build(self.static)
+        url = self.built_url()
+        encodings = [("gzip", gzip.decompress), (None, bytes)]
+        if brotli is not None:
+            encodings.insert(0, ("br", brotli.decompress))
+        accept = "br, gzip" if brotli is not None else "gzip"
+        for encoding, decode in encodings:
+            with self.subTest(encoding=encoding):
+                headers = {"Accept-Encoding": accept} if encoding else {}
+                response = self.client.get(url, headers=headers)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.content_encoding, encoding)
+                self.assertEqual(response.mimetype, "text/css")
+                self.assertEqual(decode(response.data).decode(), minify_css(CSS))
+                self.assertIn("Accept-Encoding", response.headers["Vary"])
+                cache_control = response.headers["Cache-Control"]
+                self.assertIn("immutable", cache_control)
+                self.assertIn("max-age=31536000", cache_control)
+                response.close()
+                accept = "gzip;q=0.5, br;q=0" if encoding == "br" else "identity"
+
+    def test_sources_changed_since_the_build_are_served_unbuilt(self):
+        build(self.static)
+        later = time.time() + 10
+        os.utime(os.path.join(self.static, "site.css"), (later, later))
+        self.assertEqual(self.built_url(), "/static/site.css")
+
+    def test_pages_link_the_build(self):
+        shutil.copy(
+            os.path.join(os.path.dirname(__file__), "..", "app", "static", "pico.css"),
+            self.static,
+        )
+        built = {asset.name: asset for asset in build(self.static)}
+        page = self.client.get("/").get_data(as_text=True)
+        self.assertIn(f'href="/static/build/{built["pico.css"].path}"', page)
@@ -1,3 +1,6 @@
+import os
+import shutil
+import tempfile
 import unittest
 from flask import current_app
 from app import create_app, db
@@ -20,3 +23,16 @@ class BasicsTestCase(unittest.TestCase):
 
     def test_app_is_testing(self) -> None:
         self.assertTrue(current_app.config["TESTING"])
+
+    def test_template_bytecode_cache(self) -> None:
+        self.assertIsNone(current_app.config["DIBS_TEMPLATE_CACHE_DIR"])
+        cache_dir = tempfile.mkdtemp(prefix="dibs-jinja-")
+        self.addCleanup(shutil.rmtree, cache_dir)
+        cached = {"DIBS_TEMPLATE_CACHE_DIR": cache_dir}
+        create_app("testing", **cached).jinja_env.get_template("404.html")
+        (name,) = os.listdir(cache_dir)
+        written = os.stat(os.path.join(cache_dir, name)).st_mtime_ns
+        # a new app loads the compiled template instead of writing it again
+        create_app("testing", **cached).jinja_env.get_template("404.html")
+        self.assertEqual(os.listdir(cache_dir), [name])
+        self.assertEqual(os.stat(os.path.join(cache_dir, name)).st_mtime_ns, written)
@@ -0,0 +1,50 @@
+import json
+import unittest
+
+from app import bench, create_app, db, last_seen
+from app.models import Category, Comment, Role
+from app.seed import populate
+
+
+class BenchTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app("testing")
+        with self.app.app_context():
+            db.create_all()
+            Role.insert_roles()
+            Category.insert_categories()
+            populate(users=5, lists=10, items_per_list=5, comments=20)
+
+    def tearDown(self):
+        with self.app.app_context():
+            last_seen.flush()
+            db.session.remove()
+            db.drop_all()
+
+    def test_run(self):
+        results = bench.run(self.app, n=5, warmup=1)
+        json.dumps(results)
+        self.assertEqual(set(results["scenarios"]), set(bench.SCENARIOS))
+        for scenario, metrics in results["scenarios"].items():
+            self.assertEqual(metrics["requests"], 5)
+            self.assertLessEqual(metrics["p50_ms"], metrics["p99_ms"])
+            self.assertGreater(metrics["queries_per_request"], 0)
+            self.assertTrue(
+                all(int(status) < 400 for status in metrics["statuses"]), scenario
+            )
+        with self.app.app_context():
+            self.assertEqual(Comment.query.count(), 20)
+        self.assertTrue(self.app.config["WTF_CSRF_ENABLED"])
+
+    def test_compare(self):
+        results = bench.run(self.app, scenarios=("index",), n=3, warmup=0)
+        rows = bench.compare(results, results)
+        self.assertEqual([row[1] for row in rows][:2], ["p50_ms", "p95_ms"])
+        self.assertTrue(all(row[4] == "+0.0%" for row in rows))
+
+    def test_empty_database(self):
+        with self.app.app_context():
+            db.drop_all()
+            db.create_all()
+        with self.assertRaises(LookupError):
+            bench.run(self.app, n=1)
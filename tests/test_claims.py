@@ -0,0 +1,175 @@
+import threading
+import unittest
+
+from app import create_app, db, last_seen
+from app.models import Category, Claim, Item, List, Role, User
+
+# people calling dibs on the same item at the same moment
+CLAIMANTS = 200
+
+
+class ClaimsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app("testing")
+        self.app.config["WTF_CSRF_ENABLED"] = False
+        with self.app.app_context():
+            db.create_all()
+            Role.insert_roles()
+            Category.insert_categories()
+            users = [
+                User(
+                    email=f"{name}@example.com",
+                    username=name,
+                    password="cat",
+                    confirmed=True,
+                )
+                for name in ("owner", "susan", "david")
+            ]
+            db.session.add_all(users)
+            db.session.commit()
+            wishlist = List(title="birthday", author_id=users[0].id)
+            db.session.add(wishlist)
+            db.session.commit()
+            items = [
+                Item(name=name, list_id=wishlist.id, category_id=1)
+                for name in ("teapot", "kite")
+            ]
+            db.session.add_all(items)
+            db.session.commit()
+            self.list_id = wishlist.id
+            self.item_id = items[0].id
+            self.user_ids = {user.username: user.id for user in users}
+        self.clients = {name: self.login(name) for name in self.user_ids}
+
+    def tearDown(self):
+        with self.app.app_context():
+            last_seen.flush()
+            db.session.remove()
+            db.drop_all()
+
+    def login(self, name):
+        client = self.app.test_client()
+        client.post(
+            "/auth/login", data={"email": f"{name}@example.com", "password": "cat"}
+        )
+        client.get("/")
+        return client
+
+    def claim(self, client, action="claim", item_id=None):
+        """Call (or take back) dibs, returning the message it flashed."""
+        response = client.post(
+            f"/lists/{self.list_id}/{action}/{item_id or self.item_id}"
+        )
+        if response.status_code != 302:
+            return response.status_code
+        with client.session_transaction() as session:
+            flashes = session.pop("_flashes", [])
+        return flashes[0][1] if flashes else None
+
+    def claimer(self):
+        with self.app.app_context():
+            claim = db.session.get(Claim, self.item_id)
+            item = db.session.get(Item, self.item_id)
+            self.assertEqual(item.claimed, claim is not None)
+            self.assertEqual(item.claimer_id, claim and claim.user_id)
+            return claim and claim.user_id
+
+    def page(self, name, path=None):
+        response = self.clients[name].get(path or f"/lists/{self.list_id}")
+        self.assertEqual(response.status_code, 200)
+        return response.get_data(as_text=True)
+
+    def test_claim_and_unclaim(self):
+        self.assertIn("called dibs!", self.claim(self.clients["susan"]))
+        self.assertEqual(self.claimer(), self.user_ids["susan"])
+        page = self.page("susan")
+        self.assertIn("It's you!", page)
+        self.assertIn(f"/unclaim/{self.item_id}", page)
+        page = self.page("david")
+        self.assertIn("Somebody has called dibs on this.", page)
+        self.assertNotIn("It's you!", page)
+        self.assertNotIn(f"/claim/{self.item_id}", page)
+        self.assertIn("1 of 2 claimed", self.page("david", "/user/owner"))
+        self.assertIn("hadn't", self.claim(self.clients["david"], "unclaim"))
+        self.assertEqual(self.claimer(), self.user_ids["susan"])
+        self.assertIn("took back", self.claim(self.clients["susan"], "unclaim"))
+        self.assertIsNone(self.claimer())
+        self.assertIn(f"/claim/{self.item_id}", self.page("david"))
+
+    def test_first_claim_wins(self):
+        self.claim(self.clients["susan"])
+        self.assertIn("somebody else", self.claim(self.clients["david"]))
+        self.assertIn("already", self.claim(self.clients["susan"]))
+        self.assertEqual(self.claimer(), self.user_ids["susan"])
+
+    def test_author_never_sees_claims(self):
+        owner = self.clients["owner"]
+        before = self.claim(owner)
+        self.assertIn("your own list", before)
+        self.claim(self.clients["susan"])
+        self.assertEqual(self.claim(owner), before)
+        self.assertEqual(self.claim(owner, "unclaim"), self.claim(owner, "unclaim"))
+        page = self.page("owner")
+        self.assertNotIn("called dibs", page)
+        self.assertNotIn("claim/", page)
+        self.assertNotIn("claimed", self.page("owner", "/user/owner"))
+
+    def test_missing_items(self):
+        self.assertEqual(self.claim(self.clients["susan"], item_id=12345), 404)
+        with self.app.app_context():
+            other = List(title="other", author_id=self.user_ids["david"])
+            db.session.add(other)
+            db.session.commit()
+            self.list_id = other.id
+        self.assertEqual(self.claim(self.clients["susan"]), 404)
+
+    def test_rebuild_counts(self):
+        self.claim(self.clients["susan"])
+        with self.app.app_context():
+            db.session.execute(db.update(Item).values(claimed=False, claimer_id=None))
+            db.session.commit()
+            self.assertEqual(Item.rebuild_counts(), 1)
+        self.assertEqual(self.claimer(), self.user_ids["susan"])
+
+    def test_concurrent_claims(self):
+        with self.app.app_context():
+            db.session.add_all(
+                User(
+                    email=f"relative{n}@example.com",
+                    username=f"relative{n}",
+                    password="cat",
+                    confirmed=True,
+                )
+                for n in range(CLAIMANTS)
+            )
+            db.session.commit()
+            names = [
+                name
+                for name, in db.session.query(User.username).filter(
+                    User.username.like("relative%")
+                )
+            ]
+        clients = [self.login(name) for name in names]
+        start = threading.Barrier(CLAIMANTS)
+        results = [None] * CLAIMANTS
+
+        def call_dibs(n):
+            start.wait()
+            results[n] = self.claim(clients[n])
+
+        threads = [
+            threading.Thread(target=call_dibs, args=(n,)) for n in range(CLAIMANTS)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        winners = [n for n, result in enumerate(results) if "called dibs!" in result]
+        self.assertEqual(len(winners), 1, results)
+        self.assertEqual(
+            sum("somebody else" in result for result in results), CLAIMANTS - 1
+        )
+        with self.app.app_context():
+            self.assertEqual(db.session.query(Claim).count(), 1)
+            winner = User.query.filter_by(username=names[winners[0]]).one().id
+        self.assertEqual(self.claimer(), winner)
@@ -0,0 +1,107 @@
+import unittest
+
+from app import create_app, db, last_seen
+from app.models import Category, Claim, Comment, Item, List, Role, User
+from app.orphans import collect
+
+
+class DeletesTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app("testing")
+        self.app.config["WTF_CSRF_ENABLED"] = False
+        with self.app.app_context():
+            db.create_all()
+            Role.insert_roles()
+            Category.insert_categories()
+            owner = User(
+                email="owner@example.com",
+                username="owner",
+                password="cat",
+                confirmed=True,
+            )
+            admin = User(
+                email="admin@example.com",
+                username="admin",
+                password="cat",
+                confirmed=True,
+                role=Role.query.filter_by(name="Admin").one(),
+            )
+            db.session.add_all([owner, admin])
+            db.session.commit()
+            self.list_ids = [self.make_list(owner, admin, n) for n in range(2)]
+        self.client = self.app.test_client()
+        self.client.post(
+            "/auth/login", data={"email": "admin@example.com", "password": "cat"}
+        )
+
+    def tearDown(self):
+        with self.app.app_context():
+            last_seen.flush()
+            db.session.remove()
+            db.drop_all()
+
+    @staticmethod
+    def make_list(owner, guest, n):
+        """A list of three lamps, each with a comment and a claim by ``guest``."""
+        wishlist = List(title=f"birthday {n}", author_id=owner.id)
+        db.session.add(wishlist)
+        db.session.commit()
+        for m in range(3):
+            item = Item(name=f"lamp {n}.{m}", list_id=wishlist.id, category_id=1)
+            db.session.add(item)
+            db.session.commit()
+            db.session.add_all(
+                [
+                    Comment(
+                        body="dibs",
+                        list_id=wishlist.id,
+                        item_id=item.id,
+                        author_id=guest.id,
+                        author=guest.username,
+                    ),
+                    Claim(item_id=item.id, list_id=wishlist.id, user_id=guest.id),
+                ]
+            )
+        db.session.commit()
+        return wishlist.id
+
+    def counts(self):
+        with self.app.app_context():
+            return tuple(
+                db.session.query(model).count()
+                for model in (List, Item, Comment, Claim)
+            )
+
+    def test_delete_list(self):
+        response = self.client.get(f"/lists/{self.list_ids[0]}/delete")
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.counts(), (1, 3, 3, 3))
+        with self.app.app_context():
+            indexed = db.session.execute(db.text("SELECT count(*) FROM items_fts"))
+            self.assertEqual(indexed.scalar(), 3)
+        self.assertEqual(self.client.get(f"/lists/{self.list_ids[0]}").status_code, 404)
+        self.assertEqual(
+            self.client.get(f"/lists/{self.list_ids[0]}/delete").status_code, 404
+        )
+
+    def test_delete_item(self):
+        with self.app.app_context():
+            item_id = List.query.get(self.list_ids[0]).items.first().id
+        response = self.client.get(f"/lists/{self.list_ids[0]}/delete/{item_id}")
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.counts(), (2, 5, 5, 5))
+        with self.app.app_context():
+            self.assertIsNone(db.session.get(Claim, item_id))
+        self.assertEqual(
+            self.client.get(f"/lists/{self.list_ids[0]}/delete/{item_id}").status_code,
+            404,
+        )
+
+    def test_collect_orphans(self):
+        with self.app.app_context():
+            # the way lists used to be deleted, leaving everything else behind
+            db.session.execute(db.delete(List).where(List.id == self.list_ids[0]))
+            db.session.commit()
+            self.assertEqual(collect(chunk_size=2), (3, 3, 3))
+            self.assertEqual(collect(chunk_size=2), (0, 0, 0))
+        self.assertEqual(self.counts(), (1, 3, 3, 3))
@@ -0,0 +1,56 @@
+import unittest
+from datetime import datetime, timedelta
+
+from app import create_app, db
+from app.feed import feed_page
+from app.models import List, Role, User
+
+
+class FeedTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app("testing")
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        Role.insert_roles()
+        self.author = User(email="john@example.com", username="john", password="cat")
+        self.viewer = User(email="susan@example.org", username="susan", password="dog")
+        db.session.add_all([self.author, self.viewer])
+        db.session.commit()
+        start = datetime(2023, 1, 1)
+        for i in range(5):
+            db.session.add(
+                List(
+                    title=f"list {i}",
+                    author_id=self.author.id,
+                    timestamp=start + timedelta(days=i // 2),
+                )
+            )
+        db.session.add(List(title="own list", author_id=self.viewer.id))
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_feed_excludes_own_lists(self):
+        lists, cursor = feed_page(self.viewer.id, per_page=10)
+        self.assertEqual(len(lists), 5)
+        self.assertIsNone(cursor)
+        self.assertTrue(all(l.author_id == self.author.id for l in lists))
+
+    def test_feed_pages_cover_every_list_once(self):
+        seen = []
+        cursor = None
+        while True:
+            lists, cursor = feed_page(self.viewer.id, cursor=cursor, per_page=2)
+            seen.extend(l.id for l in lists)
+            if cursor is None:
+                break
+        self.assertEqual(len(seen), 5)
+        self.assertEqual(len(set(seen)), 5)
+
+    def test_feed_ignores_malformed_cursor(self):
+        lists, _ = feed_page(self.viewer.id, cursor="nonsense", per_page=10)
+        self.assertEqual(len(lists), 5)
@@ -0,0 +1,153 @@
+import time
+import unittest
+
+from werkzeug.security import generate_password_hash
+
+from app import create_app, db, last_seen, passwords
+from app.hashing import HashingBusy, LoginThrottle, normalize_method
+from app.models import Role, User
+
+
+class HashingTestCase(unittest.TestCase):
+    def make_app(self, **settings):
+        app = create_app("testing", WTF_CSRF_ENABLED=False, **settings)
+        self.addCleanup(app.extensions["hashing"].close)
+        return app
+
+    def test_normalize_method(self):
+        self.assertEqual(normalize_method("pbkdf2:sha256:1000"), "pbkdf2:sha256:1000")
+        self.assertEqual(normalize_method("pbkdf2:sha512"), "pbkdf2:sha512:260000")
+        self.assertEqual(normalize_method("sha512"), "sha512")
+        with self.assertRaises(ValueError):
+            normalize_method("pbkdf2")
+
+    def test_process_pool(self):
+        app = self.make_app(DIBS_HASH_WORKERS=1)
+        with app.app_context():
+            pwhash = passwords.hash("cat")
+            self.assertTrue(pwhash.startswith("pbkdf2:sha256:1000$"))
+            self.assertTrue(passwords.verify(pwhash, "cat"))
+            self.assertFalse(passwords.verify(pwhash, "dog"))
+            self.assertIsNotNone(app.extensions["hashing"].pool)
+
+    def test_busy(self):
+        app = self.make_app(
+            DIBS_HASH_WORKERS=1, DIBS_HASH_MAX_PENDING=1, DIBS_HASH_TIMEOUT=0.01
+        )
+        state = app.extensions["hashing"]
+        state.slots.acquire()
+        try:
+            with app.app_context():
+                with self.assertRaises(HashingBusy):
+                    passwords.hash("cat")
+        finally:
+            state.slots.release()
+
+    def test_slow_hash(self):
+        app = self.make_app(DIBS_HASH_WORKERS=1, DIBS_HASH_TIMEOUT=0.01)
+        with self.assertRaises(HashingBusy):
+            app.extensions["hashing"].run(time.sleep, 0.5)
+
+    def test_needs_rehash(self):
+        app = self.make_app()
+        with app.app_context():
+            self.assertFalse(passwords.needs_rehash(passwords.hash("cat")))
+            old = generate_password_hash("cat", "pbkdf2:sha256:500")
+            self.assertTrue(passwords.needs_rehash(old))
+            self.assertTrue(passwords.needs_rehash(None))
+
+    def test_needs_rehash_with_another_method(self):
+        app = self.make_app(DIBS_PASSWORD_METHOD="sha512")
+        with app.app_context():
+            pwhash = passwords.hash("cat")
+            self.assertTrue(pwhash.startswith("sha512$"))
+            self.assertFalse(passwords.needs_rehash(pwhash))
+            self.assertTrue(passwords.verify(pwhash, "cat"))
+            old = generate_password_hash("cat", "pbkdf2:sha256:1000")
+            self.assertTrue(passwords.needs_rehash(old))
+
+    def test_throttle_window(self):
+        throttle = LoginThrottle(per_ip=10, per_email=2, window=0.05)
+        throttle.failed("1.2.3.4", "a@example.com")
+        throttle.failed("1.2.3.4", "A@example.com ")
+        self.assertTrue(throttle.blocked("5.6.7.8", "a@example.com"))
+        self.assertFalse(throttle.blocked("1.2.3.4", "b@example.com"))
+        time.sleep(0.06)
+        self.assertFalse(throttle.blocked("1.2.3.4", "a@example.com"))
+
+    def test_throttle_capacity(self):
+        throttle = LoginThrottle(per_ip=1, per_email=1, window=60, capacity=4)
+        for n in range(3):
+            throttle.failed(f"10.0.0.{n}", f"{n}@example.com")
+        self.assertEqual(len(throttle.failures), 4)
+        self.assertFalse(throttle.blocked("10.0.0.0", "0@example.com"))
+        self.assertTrue(throttle.blocked("10.0.0.2", "x@example.com"))
+
+
+class LoginTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app(
+            "testing",
+            WTF_CSRF_ENABLED=False,
+            DIBS_LOGIN_FAILURES_PER_EMAIL=3,
+            DIBS_LOGIN_FAILURES_PER_IP=5,
+        )
+        with self.app.app_context():
+            db.create_all()
+            Role.insert_roles()
+            for name in ("susan", "david"):
+                db.session.add(
+                    User(
+                        email=f"{name}@example.com",
+                        username=name,
+                        password="cat",
+                        confirmed=True,
+                    )
+                )
+            db.session.commit()
+
+    def tearDown(self):
+        with self.app.app_context():
+            last_seen.flush()
+            db.session.remove()
+            db.drop_all()
+
+    def login(self, email, password, ip="10.0.0.1"):
+        return self.app.test_client().post(
+            "/auth/login",
+            data={"email": email, "password": password},
+            environ_base={"REMOTE_ADDR": ip},
+        )
+
+    def test_rehash_on_login(self):
+        with self.app.app_context():
+            user = User.query.filter_by(username="susan").one()
+            user.password_hash = generate_password_hash("cat", "pbkdf2:sha256:500")
+            db.session.commit()
+        self.assertEqual(self.login("susan@example.com", "cat").status_code, 302)
+        with self.app.app_context():
+            user = User.query.filter_by(username="susan").one()
+            self.assertTrue(user.password_hash.startswith("pbkdf2:sha256:1000$"))
+        self.assertEqual(self.login("susan@example.com", "cat").status_code, 302)
+
+    def test_failed_logins_per_email(self):
+        for _ in range(3):
+            self.assertEqual(self.login("susan@example.com", "dog").status_code, 200)
+        response = self.login("susan@example.com", "cat", ip="10.0.0.2")
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(self.login("david@example.com", "cat").status_code, 302)
+
+    def test_failed_logins_per_ip(self):
+        for n in range(5):
+            self.login(f"nobody{n}@example.com", "dog")
+        self.assertEqual(self.login("david@example.com", "cat").status_code, 429)
+        response = self.login("david@example.com", "cat", ip="10.0.0.2")
+        self.assertEqual(response.status_code, 302)
+
+    def test_success_clears_email_failures(self):
+        for _ in range(2):
+            self.login("susan@example.com", "dog", ip="10.0.0.2")
+        self.assertEqual(self.login("susan@example.com", "cat").status_code, 302)
+        for _ in range(2):
+            self.login("susan@example.com", "dog", ip="10.0.0.3")
+        self.assertEqual(self.login("susan@example.com", "cat").status_code, 302)
@@ -0,0 +1,88 @@
+import unittest
+
+from sqlalchemy import event
+
+from app import create_app, db, identity_cache, last_seen
+from app.models import Role, User
+
+
+class IdentityCacheTestCase(unittest.TestCase):
+    """
+    Requests here run without an outer app context, so that every request
+    gets a fresh ``g`` and loads its user the way it would in production.
+    """
+
+    def setUp(self):
+        self.app = create_app("testing")
+        self.app.config["WTF_CSRF_ENABLED"] = False
+        with self.app.app_context():
+            db.create_all()
+            Role.insert_roles()
+            user = User(
+                email="john@example.com",
+                username="john",
+                password="cat",
+                confirmed=True,
+            )
+            db.session.add(user)
+            db.session.commit()
+            self.user_id = user.id
+            self.engine = db.engine
+        self.client = self.app.test_client()
+        self.client.post(
+            "/auth/login", data={"email": "john@example.com", "password": "cat"}
+        )
+        self.statements = []
+
+    def tearDown(self):
+        with self.app.app_context():
+            last_seen.flush()
+            db.session.remove()
+            db.drop_all()
+
+    def record(self, conn, cursor, statement, *args):
+        self.statements.append(statement)
+
+    def user_queries(self, path):
+        self.statements = []
+        event.listen(self.engine, "before_cursor_execute", self.record)
+        try:
+            response = self.client.get(path)
+        finally:
+            event.remove(self.engine, "before_cursor_execute", self.record)
+        self.assertEqual(response.status_code, 200)
+        return [
+            s
+            for s in self.statements
+            if "FROM users" in s or "FROM roles" in s or "JOIN roles" in s
+        ]
+
+    def test_authenticated_get_runs_no_user_or_role_queries(self):
+        self.user_queries("/")
+        self.assertEqual(self.user_queries("/"), [])
+
+    def test_confirm_invalidates_identity(self):
+        with self.app.app_context():
+            user = User.query.get(self.user_id)
+            user.confirmed = False
+            db.session.commit()
+            identity_cache.invalidate(self.user_id)
+            token = user.generate_confirmation_token()
+        self.assertEqual(self.client.get("/").status_code, 302)
+        response = self.client.get(f"/auth/confirm/{token}")
+        self.assertEqual(response.status_code, 302)
+        with self.app.app_context():
+            self.assertIsNone(identity_cache.get(self.user_id))
+        self.assertEqual(len(self.user_queries("/")), 1)
+        self.assertEqual(self.user_queries("/"), [])
+
+    def test_role_change_reaches_permission_checks(self):
+        self.user_queries("/")
+        with self.app.app_context():
+            user = User.query.get(self.user_id)
+            user.role = Role.query.filter_by(name="Admin").first()
+            db.session.commit()
+        self.assertEqual(self.client.get("/user/john/edit").status_code, 403)
+        with self.app.app_context():
+            identity_cache.invalidate(self.user_id)
+        self.assertEqual(self.client.get("/user/john/edit").status_code, 200)
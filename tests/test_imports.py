@@ -0,0 +1,92 @@
+import io
+import json
+import unittest
+
+from app import create_app, db
+from app.imports import ImportFailed, import_items, iter_json
+from app.models import Category, Item, List, Role, User
+
+
+class ImportTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app("testing")
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        Role.insert_roles()
+        Category.insert_categories()
+        user = User(email="john@example.com", username="john", password="cat")
+        db.session.add(user)
+        db.session.commit()
+        self.list = List(title="birthday", author_id=user.id)
+        db.session.add(self.list)
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_csv_import(self):
+        data = b"Name,Link,Description,Category\nteapot,,white,household\nbook,,,\n"
+        result = import_items(self.list.id, io.BytesIO(data), "csv", chunk_size=1)
+        self.assertEqual(result.rows, 2)
+        items = {i.name: i for i in Item.query.filter_by(list_id=self.list.id)}
+        household = Category.query.filter_by(name="Household").first()
+        misc = Category.query.filter_by(name="Misc").first()
+        self.assertEqual(items["teapot"].category_id, household.id)
+        self.assertEqual(items["book"].category_id, misc.id)
+
+    def test_json_array_and_lines(self):
+        records = [{"name": f"item {i}", "category": "Books"} for i in range(50)]
+        array = json.dumps(records).encode()
+        lines = "\n".join(json.dumps(r) for r in records).encode()
+        import_items(self.list.id, io.BytesIO(array), "json")
+        import_items(self.list.id, io.BytesIO(lines), "json")
+        self.assertEqual(Item.query.filter_by(list_id=self.list.id).count(), 100)
+
+    def test_json_array_across_chunks(self):
+        for data, expected in (
+            (
+                '[ {"name": "a, ]"} ,\n{"name": "b"}\n]',
+                [{"name": "a, ]"}, {"name": "b"}],
+            ),
+            ("[12345, 678]", [12345, 678]),
+            (" [ ] ", []),
+        ):
+            for chunk_size in (1, 3, 1024):
+                with self.subTest(data=data, chunk_size=chunk_size):
+                    records = iter_json(io.StringIO(data), chunk_size=chunk_size)
+                    self.assertEqual(list(records), expected)
+
+    def test_malformed_json_arrays(self):
+        for data, row in (
+            ('[{"name": "a"},,{"name": "b"}]', 2),
+            ('[{"name": "a"} {"name": "b"}]', 1),
+            ('[,{"name": "a"}]', 1),
+            ('[{"name": "a"},]', 2),
+            ('[{"name": "a"}, {"name": ', 2),
+        ):
+            with self.subTest(data=data):
+                with self.assertRaises(ImportFailed) as failure:
+                    list(iter_json(io.StringIO(data), chunk_size=4))
+                self.assertEqual(failure.exception.row, row)
+
+    def test_import_is_all_or_nothing(self):
+        data = b"name,category\nteapot,Household\nspaceship,Rockets\n"
+        with self.assertRaises(ImportFailed) as failure:
+            import_items(self.list.id, io.BytesIO(data), "csv", chunk_size=1)
+        self.assertEqual(failure.exception.row, 2)
+        self.assertEqual(Item.query.count(), 0)
+
+    def test_non_text_fields_are_rejected(self):
+        for bad in ({"name": 42}, {"name": "kite", "link": 5}, {"name": ["a"]}):
+            with self.subTest(record=bad):
+                records = [{"name": "teapot"}, bad]
+                with self.assertRaises(ImportFailed) as failure:
+                    import_items(
+                        self.list.id, io.BytesIO(json.dumps(records).encode()), "json"
+                    )
+                self.assertEqual(failure.exception.row, 2)
+                self.assertIn("must be text", str(failure.exception))
+                self.assertEqual(Item.query.count(), 0)
@@ -0,0 +1,133 @@
+import re
+import unittest
+
+from app import create_app, db, instrumentation, last_seen
+from app.models import Category, EndpointStat, List, Role, User
+
+
+class InstrumentationTestCase(unittest.TestCase):
+    def setUp(self, **settings):
+        self.app = create_app("testing", WTF_CSRF_ENABLED=False, **settings)
+        with self.app.app_context():
+            db.create_all()
+            Role.insert_roles()
+            Category.insert_categories()
+            user = User(
+                email="susan@example.com",
+                username="susan",
+                password="cat",
+                confirmed=True,
+            )
+            db.session.add(user)
+            db.session.commit()
+            wishlist = List(title="birthday", author_id=user.id)
+            db.session.add(wishlist)
+            db.session.commit()
+            self.list_id = wishlist.id
+        self.client = self.app.test_client()
+        self.client.post(
+            "/auth/login", data={"email": "susan@example.com", "password": "cat"}
+        )
+
+    def tearDown(self):
+        with self.app.app_context():
+            last_seen.flush()
+            db.session.remove()
+            db.drop_all()
+
+    def timings(self, response):
+        header = response.headers["Server-Timing"]
+        return {
+            name: (float(duration), desc)
+            for name, duration, desc in re.findall(
+                r'(\w+);dur=([\d.]+)(?:;desc="([^"]*)")?', header
+            )
+        }
+
+    def test_server_timing(self):
+        # a streamed page is rendered after its headers have been sent
+        self.app.config["DIBS_STREAM_TEMPLATES"] = False
+        response = self.client.get(f"/lists/{self.list_id}")
+        timings = self.timings(response)
+        self.assertEqual(set(timings), {"db", "render", "total"})
+        self.assertRegex(timings["db"][1], r"^\d+ queries$")
+        self.assertGreater(timings["render"][0], 0)
+        self.assertGreaterEqual(timings["total"][0], timings["render"][0])
+
+    def test_query_count(self):
+        with self.app.app_context():
+            statements = []
+            db.event.listen(
+                db.engine, "after_cursor_execute", lambda *a: statements.append(1)
+            )
+        response = self.client.get(f"/lists/{self.list_id}")
+        queries = int(self.timings(response)["db"][1].split()[0])
+        self.assertEqual(queries, len(statements))
+
+    def test_endpoint_counters(self):
+        for _ in range(3):
+            self.client.get(f"/lists/{self.list_id}")
+        self.client.get("/no-such-page")
+        with self.app.app_context():
+            stats = instrumentation.stats()
+        self.assertEqual(stats["main.view_list"]["requests"], 3)
+        self.assertGreater(stats["main.view_list"]["sql_queries"], 0)
+        self.assertEqual(stats["<unmatched>"]["requests"], 1)
+        self.assertEqual(stats["<unmatched>"]["errors"], 0)
+
+    def test_slow_request_log(self):
+        with self.assertLogs(self.app.logger, "WARNING") as logs:
+            self.app.extensions["instrumentation"].slow_ms = 0
+            self.client.get(f"/lists/{self.list_id}")
+        self.assertIn("slow request: GET /lists/", logs.output[0])
+        self.assertIn("main.view_list", logs.output[0])
+
+    def test_query_budget_log(self):
+        view = self.app.view_functions["main.view_list"]
+        budget = view.query_budget
+        view.query_budget = 0
+        try:
+            with self.assertLogs(self.app.logger, "WARNING") as logs:
+                self.client.get(f"/lists/{self.list_id}")
+        finally:
+            view.query_budget = budget
+        self.assertIn("query budget exceeded: GET /lists/", logs.output[0])
+        self.assertIn("budget 0", logs.output[0])
+
+
+class PersistedStatsTestCase(InstrumentationTestCase):
+    def setUp(self):
+        super().setUp(DIBS_STATS_PERSIST=True, DIBS_STATS_FLUSH_INTERVAL=3600)
+
+    def test_flush_adds_up(self):
+        for _ in range(2):
+            for _ in range(3):
+                self.client.get(f"/lists/{self.list_id}")
+            with self.app.app_context():
+                instrumentation.flush()
+        with self.app.app_context():
+            row = db.session.get(EndpointStat, "main.view_list")
+            self.assertEqual(row.requests, 6)
+            self.assertGreater(row.max_ms, 0)
+            self.assertGreaterEqual(row.total_ms, row.max_ms)
+            self.assertEqual(instrumentation.flush(), 0)
+
+    def test_failed_flush_keeps_the_counters(self):
+        self.client.get(f"/lists/{self.list_id}")
+        with self.app.app_context():
+            db.session.execute(db.text("ALTER TABLE endpoint_stats RENAME TO away"))
+            db.session.commit()
+            with self.assertLogs(self.app.logger.name, "ERROR"):
+                self.assertEqual(instrumentation.flush(), 0)
+            db.session.execute(db.text("ALTER TABLE away RENAME TO endpoint_stats"))
+            db.session.commit()
+        self.client.get(f"/lists/{self.list_id}")
+        with self.app.app_context():
+            instrumentation.flush()
+            row = db.session.get(EndpointStat, "main.view_list")
+            self.assertEqual(row.requests, 2)
+
+    def tearDown(self):
+        with self.app.app_context():
+            instrumentation.flush()
+        super().tearDown()
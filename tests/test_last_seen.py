@@ -0,0 +1,62 @@
+import unittest
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from app import create_app, db, last_seen
+from app.models import Role, User
+
+
+class LastSeenTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app("testing")
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        Role.insert_roles()
+        self.users = [
+            User(email=f"{name}@example.com", username=name, password="cat")
+            for name in ("john", "susan")
+        ]
+        db.session.add_all(self.users)
+        db.session.commit()
+        self.ids = [user.id for user in self.users]
+        last_seen.flush()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def stored(self, user_id):
+        db.session.expire_all()
+        return db.session.get(User, user_id).last_seen
+
+    def test_flush(self):
+        seen = datetime(2020, 1, 1)
+        last_seen.record(self.ids[0], seen)
+        self.assertEqual(last_seen.get(self.ids[0]), seen)
+        self.assertEqual(last_seen.flush(), 1)
+        self.assertEqual(self.stored(self.ids[0]), seen)
+        self.assertIsNone(last_seen.get(self.ids[0]))
+
+    def test_failed_flush_keeps_the_newest_timestamps(self):
+        first = datetime(2020, 1, 1)
+        for user_id in self.ids:
+            last_seen.record(user_id, first)
+        db.session.execute(db.text("ALTER TABLE users RENAME TO users_away"))
+        db.session.commit()
+
+        def seen_during_flush(*args):
+            last_seen.record(self.ids[0], first + timedelta(hours=1))
+            last_seen.record(self.ids[1], first - timedelta(hours=1))
+
+        event.listen(db.engine, "before_cursor_execute", seen_during_flush, once=True)
+        with self.assertLogs(self.app.logger.name, "ERROR"):
+            self.assertEqual(last_seen.flush(), 0)
+
+        db.session.execute(db.text("ALTER TABLE users_away RENAME TO users"))
+        db.session.commit()
+        self.assertEqual(last_seen.flush(), 2)
+        self.assertEqual(self.stored(self.ids[0]), first + timedelta(hours=1))
+        self.assertEqual(self.stored(self.ids[1]), first)
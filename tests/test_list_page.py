@@ -0,0 +1,186 @@
+import unittest
+
+from app import create_app, db, fragments, identity_cache, last_seen
+from app.models import Category, Comment, Item, List, Role, User
+
+
+class ListPageTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app("testing")
+        self.app.config["WTF_CSRF_ENABLED"] = False
+        with self.app.app_context():
+            db.create_all()
+            Role.insert_roles()
+            Category.insert_categories()
+            users = {}
+            for name in ("owner", "susan", "david"):
+                users[name] = User(
+                    email=f"{name}@example.com",
+                    username=name,
+                    password="cat",
+                    confirmed=True,
+                )
+            db.session.add_all(users.values())
+            db.session.commit()
+            wishlist = List(title="birthday", author_id=users["owner"].id)
+            db.session.add(wishlist)
+            db.session.commit()
+            item = Item(name="teapot", list_id=wishlist.id, category_id=1)
+            db.session.add(item)
+            db.session.commit()
+            db.session.add(
+                Comment(
+                    body="dibs on the teapot",
+                    list_id=wishlist.id,
+                    item_id=item.id,
+                    author_id=users["susan"].id,
+                    author="susan",
+                )
+            )
+            db.session.commit()
+            self.list_id = wishlist.id
+            self.item_id = item.id
+        self.clients = {}
+        for name in ("owner", "susan", "david"):
+            client = self.app.test_client()
+            client.post(
+                "/auth/login", data={"email": f"{name}@example.com", "password": "cat"}
+            )
+            self.clients[name] = client
+
+    def tearDown(self):
+        with self.app.app_context():
+            last_seen.flush()
+            db.session.remove()
+            db.drop_all()
+
+    def page(self, name):
+        response = self.clients[name].get(f"/lists/{self.list_id}")
+        self.assertEqual(response.status_code, 200)
+        return response.get_data(as_text=True)
+
+    def test_owner_never_sees_comments(self):
+        self.page("susan")
+        self.assertNotIn("dibs on the teapot", self.page("owner"))
+
+    def test_delete_link_only_for_own_comments(self):
+        self.assertIn("delete_comment", self.page("susan"))
+        page = self.page("david")
+        self.assertIn("dibs on the teapot", page)
+        self.assertNotIn("delete_comment", page)
+
+    def test_fragment_is_shared_and_refreshed_on_change(self):
+        self.page("susan")
+        self.page("david")
+        with self.app.app_context():
+            self.assertEqual(fragments.stats()["hits"], 1)
+        self.clients["david"].post(
+            f"/lists/{self.list_id}/create_comment/{self.item_id}",
+            data={"body": "no, mine"},
+        )
+        self.assertIn("no, mine", self.page("susan"))
+
+    def test_links_forms_and_css_per_item(self):
+        page = self.page("susan")
+        path = f"/lists/{self.list_id}"
+        with self.app.app_context():
+            comment_id = Comment.query.filter_by(author="susan").one().id
+        self.assertIn(f'action="{path}/create_comment/{self.item_id}"', page)
+        self.assertIn(f'href="{path}/delete_comment/{comment_id}"', page)
+        self.assertNotIn("{item_id}", page)
+        # one rule for every item
+        self.assertEqual(page.count("<style"), 1)
+        self.assertNotIn(f"#expand{self.item_id}", page)
+
+    def test_conditional_get(self):
+        client = self.clients["susan"]
+        response = client.get(f"/lists/{self.list_id}")
+        etag = response.headers["ETag"]
+        response = client.get(f"/lists/{self.list_id}", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        owner = self.clients["owner"].get(
+            f"/lists/{self.list_id}", headers={"If-None-Match": etag}
+        )
+        self.assertEqual(owner.status_code, 200)
+        self.clients["david"].post(
+            f"/lists/{self.list_id}/create_comment/{self.item_id}",
+            data={"body": "no, mine"},
+        )
+        response = client.get(f"/lists/{self.list_id}", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+
+    def test_claims_and_deletes_are_never_answered_with_304(self):
+        client = self.clients["susan"]
+        path = f"/lists/{self.list_id}"
+        response = client.get(path)
+        self.assertNotIn("Last-Modified", response.headers)
+        etag = response.headers["ETag"]
+        since = {"If-Modified-Since": "Fri, 01 Jan 2100 00:00:00 GMT"}
+        self.assertEqual(client.get(path, headers=since).status_code, 200)
+        self.clients["david"].post(f"{path}/claim/{self.item_id}")
+        response = client.get(path, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        etag = response.headers["ETag"]
+        with self.app.app_context():
+            owner = User.query.filter_by(username="owner").one()
+            owner.role = Role.query.filter_by(name="Admin").one()
+            db.session.commit()
+            identity_cache.invalidate(owner.id)
+        self.clients["owner"].get(f"{path}/delete/{self.item_id}")
+        response = client.get(path, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("teapot", response.get_data(as_text=True))
+
+    def test_comment_counts(self):
+        path = f"/lists/{self.list_id}"
+        self.clients["david"].post(
+            f"{path}/create_comment/{self.item_id}", data={"body": "no, mine"}
+        )
+        with self.app.app_context():
+            # the comment from setUp was not counted, so rebuild first
+            self.assertEqual(Item.rebuild_counts(), 1)
+            item = db.session.get(Item, self.item_id)
+            self.assertEqual(item.comment_count, 2)
+            # a comment is not a claim (see tests/test_claims.py)
+            self.assertFalse(item.claimed)
+            first = Comment.query.filter_by(author="susan").first().id
+        self.clients["susan"].get(f"{path}/delete_comment/{first}")
+        with self.app.app_context():
+            item = db.session.get(Item, self.item_id)
+            self.assertEqual(item.comment_count, 1)
+            self.assertEqual(Item.rebuild_counts(), 0)
+
+    def test_comments_on_missing_or_foreign_items(self):
+        with self.app.app_context():
+            owner = db.session.get(List, self.list_id).author_id
+            other = List(title="other", author_id=owner)
+            db.session.add(other)
+            db.session.commit()
+            other_id = other.id
+        for list_id, item_id in ((self.list_id, 12345), (other_id, self.item_id)):
+            with self.subTest(list_id=list_id, item_id=item_id):
+                response = self.clients["david"].post(
+                    f"/lists/{list_id}/create_comment/{item_id}",
+                    data={"body": "lost"},
+                )
+                self.assertEqual(response.status_code, 404)
+        with self.app.app_context():
+            self.assertEqual(Comment.query.filter_by(body="lost").count(), 0)
+            self.assertEqual(db.session.get(List, other_id).version, 0)
+
+    def test_deleting_missing_or_foreign_comments(self):
+        with self.app.app_context():
+            owner = db.session.get(List, self.list_id).author_id
+            other = List(title="other", author_id=owner)
+            db.session.add(other)
+            db.session.commit()
+            other_id = other.id
+            comment_id = Comment.query.filter_by(author="susan").one().id
+        for list_id, comment_id in ((self.list_id, 12345), (other_id, comment_id)):
+            with self.subTest(list_id=list_id, comment_id=comment_id):
+                response = self.clients["susan"].get(
+                    f"/lists/{list_id}/delete_comment/{comment_id}"
+                )
+                self.assertEqual(response.status_code, 404)
+        with self.app.app_context():
+            self.assertEqual(Comment.query.filter_by(author="susan").count(), 1)
@@ -0,0 +1,71 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from flask_migrate import Migrate, upgrade
+
+from app import create_app, db
+from app.search import include_object
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(__file__)), "migrations")
+
+
+class MigrationsTestCase(unittest.TestCase):
+    def setUp(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        database = os.path.join(tmpdir, "migrations.sqlite")
+        self.app = create_app(
+            "testing", SQLALCHEMY_DATABASE_URI="sqlite:///" + database
+        )
+        Migrate(
+            self.app,
+            db,
+            directory=MIGRATIONS,
+            render_as_batch=True,
+            include_object=include_object,
+        )
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_migrations_match_models(self):
+        upgrade(directory=MIGRATIONS)
+        with db.engine.connect() as connection:
+            diff = compare_metadata(
+                MigrationContext.configure(
+                    connection, opts={"include_object": include_object}
+                ),
+                db.metadata,
+            )
+        self.assertEqual(diff, [])
+
+    def test_upgrade_from_baseline(self):
+        upgrade(directory=MIGRATIONS, revision="e2f2ea662e70")
+        for statement in (
+            "INSERT INTO users (id, username) VALUES (1, 'owner'), (2, 'susan')",
+            "INSERT INTO lists (id, title, author_id) VALUES (1, 'birthday', 1)",
+            "INSERT INTO items (id, name, list_id) VALUES (1, 'lamp', 1), (2, 'kite', 1)",
+            "INSERT INTO comments (item_id, list_id, author_id, body) "
+            "VALUES (1, 1, 2, 'dibs'), (1, 1, 1, 'thanks')",
+        ):
+            db.session.execute(db.text(statement))
+        db.session.commit()
+        upgrade(directory=MIGRATIONS)
+        items = db.session.execute(
+            db.text(
+                "SELECT id, comment_count, claimed, claimer_id FROM items ORDER BY id"
+            )
+        )
+        self.assertEqual(items.all(), [(1, 2, 1, 2), (2, 0, 0, None)])
+        claims = db.session.execute(db.text("SELECT item_id, user_id FROM claims"))
+        self.assertEqual(claims.all(), [(1, 2)])
+        version = db.session.execute(db.text("SELECT version FROM lists"))
+        self.assertEqual(version.scalar(), 0)
@@ -0,0 +1,80 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+
+from flask_mail import Message
+
+from app import create_app, db, outbox
+from app.models import OutboxMessage
+
+from .smtp_server import SMTPServer
+
+
+def outbox_app(port, database):
+    settings = {
+        "SQLALCHEMY_DATABASE_URI": "sqlite:///" + database,
+        "MAIL_SERVER": "127.0.0.1",
+        "MAIL_PORT": port,
+        "MAIL_USE_TLS": False,
+        "MAIL_SUPPRESS_SEND": False,
+        "DIBS_OUTBOX_BATCH_SIZE": 10,
+    }
+    return create_app("testing", **settings)
+
+
+class OutboxTestCase(unittest.TestCase):
+    def setUp(self):
+        self.server = SMTPServer().__enter__()
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        self.database = os.path.join(tmpdir, "outbox.sqlite")
+        self.app = outbox_app(self.server.port, self.database)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        self.server.__exit__()
+
+    def queue(self, n):
+        for i in range(n):
+            outbox.enqueue(
+                Message(
+                    f"hello {i}",
+                    sender="dibs@example.com",
+                    recipients=[f"user{i}@example.com"],
+                    body="hi",
+                )
+            )
+
+    def test_batches_share_a_connection(self):
+        self.queue(25)
+        self.assertEqual(outbox.deliver(), 25)
+        self.assertEqual(len(self.server.messages), 25)
+        self.assertEqual(self.server.connections, 3)
+        self.assertEqual(OutboxMessage.query.filter_by(status="sent").count(), 25)
+
+    def test_failed_delivery_is_retried_with_backoff(self):
+        self.queue(2)
+        self.server.__exit__()
+        self.assertEqual(outbox.deliver(), 2)
+        for row in OutboxMessage.query:
+            self.assertEqual(row.status, "pending")
+            self.assertEqual(row.attempts, 1)
+            self.assertGreater(row.next_attempt_at, datetime.utcnow())
+        self.assertEqual(outbox.deliver(), 0)
+
+    def test_pending_mail_survives_a_restart(self):
+        self.queue(3)
+        db.session.remove()
+        self.app_context.pop()
+        self.app = outbox_app(self.server.port, self.database)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.assertEqual(outbox.deliver(), 3)
+        self.assertEqual(len(self.server.messages), 3)
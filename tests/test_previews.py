@@ -0,0 +1,225 @@
+import io
+import time
+import unittest
+from datetime import datetime
+
+from app import create_app, db, last_seen, link_previews
+from app.models import Category, Item, LinkPreview, List, Role, User
+from app.previews import normalize_url
+
+from .link_server import LinkServer
+
+TEAPOT = """<!doctype html>
+<html><head>
+<title>Teapot | Shop</title>
+<meta property="og:title" content="White Teapot">
+<meta property="og:image" content="/images/teapot.jpg">
+<meta property="product:price:amount" content="24.99">
+<meta property="product:price:currency" content="EUR">
+</head><body>A teapot</body></html>
+"""
+PAGES = {
+    "/teapot": (200, "text/html; charset=utf-8", TEAPOT),
+    "/kite": (200, "text/html", "<title>A\n  red kite</title>"),
+    "/photo": (200, "image/png", "not a page"),
+}
+
+
+def preview_app(**settings):
+    settings = {"DIBS_PREVIEW_ALLOW_PRIVATE": True, **settings}
+    return create_app("testing", WTF_CSRF_ENABLED=False, **settings)
+
+
+class LinkPreviewTestCase(unittest.TestCase):
+    def setUp(self):
+        self.server = LinkServer(PAGES).__enter__()
+        self.app = preview_app()
+        with self.app.app_context():
+            db.create_all()
+            Role.insert_roles()
+            Category.insert_categories()
+            users = [
+                User(
+                    email=f"{name}@example.com",
+                    username=name,
+                    password="cat",
+                    confirmed=True,
+                )
+                for name in ("owner", "susan")
+            ]
+            db.session.add_all(users)
+            db.session.commit()
+            lists = [List(title=title, author_id=users[0].id) for title in ("a", "b")]
+            db.session.add_all(lists)
+            db.session.commit()
+            self.list_ids = [wishlist.id for wishlist in lists]
+        self.clients = {name: self.login(name) for name in ("owner", "susan")}
+
+    def tearDown(self):
+        with self.app.app_context():
+            last_seen.flush()
+            db.session.remove()
+            db.drop_all()
+        self.server.__exit__()
+
+    def login(self, name, app=None):
+        client = (app or self.app).test_client()
+        client.post(
+            "/auth/login", data={"email": f"{name}@example.com", "password": "cat"}
+        )
+        client.get("/")
+        return client
+
+    def add_item(self, list_id, link, name="thing", client=None):
+        response = (client or self.clients["owner"]).post(
+            f"/lists/{list_id}",
+            data={"name": name, "link": link, "category_id": "1"},
+        )
+        self.assertEqual(response.status_code, 302)
+
+    def page(self, list_id, name="susan"):
+        response = self.clients[name].get(f"/lists/{list_id}")
+        self.assertEqual(response.status_code, 200)
+        return response.get_data(as_text=True)
+
+    def preview(self, link):
+        with self.app.app_context():
+            preview = db.session.get(LinkPreview, normalize_url(link))
+            db.session.expunge(preview)
+            return preview
+
+    def fetch(self):
+        with self.app.app_context():
+            return link_previews.fetch_pending()
+
+    def test_normalize_url(self):
+        for link, expected in (
+            (
+                "HTTPS://Shop.Example.com:443/teapot#top",
+                "https://shop.example.com/teapot",
+            ),
+            ("http://example.com", "http://example.com/"),
+            (
+                "http://example.com:8080/a?b=1&utm_source=x",
+                "http://example.com:8080/a?b=1",
+            ),
+            ("https://example.com/a?fbclid=1&ref=2", "https://example.com/a?ref=2"),
+            ("  https://example.com/a  ", "https://example.com/a"),
+            ("javascript:alert(1)", None),
+            ("ftp://example.com/a", None),
+            ("example.com/a", None),
+            ("", None),
+            (None, None),
+        ):
+            with self.subTest(link=link):
+                self.assertEqual(normalize_url(link), expected)
+
+    def test_a_page_linked_from_many_lists_is_fetched_once(self):
+        link = self.server.url("/teapot")
+        self.add_item(self.list_ids[0], link)
+        self.add_item(self.list_ids[1], link + "?utm_source=mail#reviews")
+        with self.app.app_context():
+            self.assertEqual(LinkPreview.query.count(), 1)
+        page = self.page(self.list_ids[0])
+        self.assertIn(f'href="{link}"', page)
+        self.assertNotIn("White Teapot", page)
+        self.assertEqual(self.server.requests["/teapot"], 0)
+
+        self.assertEqual(self.fetch(), 1)
+        self.assertEqual(self.server.requests["/teapot"], 1)
+        for list_id in self.list_ids:
+            page = self.page(list_id)
+            self.assertIn("White Teapot", page)
+            self.assertIn("24.99 EUR", page)
+            self.assertIn(f'src="{self.server.url("/images/teapot.jpg")}"', page)
+        self.assertIn("White Teapot", self.page(self.list_ids[0], "owner"))
+
+        self.add_item(self.list_ids[1], link, name="another teapot")
+        self.assertEqual(self.fetch(), 0)
+        self.assertEqual(self.server.requests["/teapot"], 1)
+
+    def test_title_falls_back_to_the_title_element(self):
+        self.add_item(self.list_ids[0], self.server.url("/kite"))
+        self.fetch()
+        preview = self.preview(self.server.url("/kite"))
+        self.assertEqual(preview.status, "fetched")
+        self.assertEqual(preview.title, "A red kite")
+        self.assertIsNone(preview.image)
+        self.assertIn("A red kite", self.page(self.list_ids[0]))
+
+    def test_failures(self):
+        for path in ("/gone", "/photo"):
+            self.add_item(self.list_ids[0], self.server.url(path))
+        self.assertEqual(self.fetch(), 2)
+        gone = self.preview(self.server.url("/gone"))
+        self.assertEqual(gone.status, "failed")
+        self.assertIn("404", gone.last_error)
+        photo = self.preview(self.server.url("/photo"))
+        self.assertEqual(photo.status, "pending")
+        self.assertEqual(photo.attempts, 1)
+        self.assertGreater(photo.next_attempt_at, datetime.utcnow())
+        self.assertEqual(self.fetch(), 0)
+        self.assertIn(self.server.url("/gone"), self.page(self.list_ids[0]))
+
+    def test_slow_pages_time_out(self):
+        self.app.extensions["link_previews"].timeout = 0.2
+        with LinkServer(PAGES, delay=1) as slow:
+            self.add_item(self.list_ids[0], slow.url("/teapot"))
+            started = time.perf_counter()
+            self.assertEqual(self.fetch(), 1)
+            self.assertLess(time.perf_counter() - started, 1)
+        preview = self.preview(slow.url("/teapot"))
+        self.assertEqual(preview.status, "pending")
+        self.assertIn("timed out", preview.last_error)
+
+    def test_private_addresses_are_refused(self):
+        self.app.extensions["link_previews"].allow_private = False
+        self.add_item(self.list_ids[0], self.server.url("/teapot"))
+        self.fetch()
+        self.assertEqual(self.preview(self.server.url("/teapot")).status, "failed")
+        self.assertEqual(self.server.requests["/teapot"], 0)
+
+    def test_imported_and_older_links_are_queued(self):
+        data = f"name,link\nteapot,{self.server.url('/teapot')}\nbook,\n"
+        self.clients["owner"].post(
+            f"/lists/{self.list_ids[0]}/import",
+            data={"file": (io.BytesIO(data.encode()), "items.csv")},
+        )
+        self.assertEqual(self.preview(self.server.url("/teapot")).status, "pending")
+        with self.app.app_context():
+            db.session.add(
+                Item(
+                    name="kite",
+                    link=self.server.url("/kite"),
+                    list_id=self.list_ids[1],
+                    category_id=1,
+                )
+            )
+            db.session.commit()
+            self.assertEqual(link_previews.backfill(chunk_size=1), 1)
+            self.assertEqual(link_previews.backfill(), 0)
+        self.assertEqual(self.fetch(), 2)
+        self.assertIn("A red kite", self.page(self.list_ids[1]))
+
+    def test_workers_fetch_in_the_background(self):
+        app = preview_app(DIBS_PREVIEW_WORKERS=2, DIBS_PREVIEW_POLL_INTERVAL=0.05)
+        state = app.extensions["link_previews"]
+        try:
+            with LinkServer(PAGES, delay=0.5) as slow:
+                client = self.login("owner", app)
+                started = time.perf_counter()
+                self.add_item(self.list_ids[0], slow.url("/teapot"), client=client)
+                self.assertEqual(
+                    client.get(f"/lists/{self.list_ids[0]}").status_code, 200
+                )
+                self.assertLess(time.perf_counter() - started, 0.5)
+                for _ in range(100):
+                    if self.preview(slow.url("/teapot")).status == "fetched":
+                        break
+                    time.sleep(0.05)
+                self.assertEqual(self.preview(slow.url("/teapot")).status, "fetched")
+                self.assertEqual(slow.requests["/teapot"], 1)
+        finally:
+            link_previews.stop(state)
+            with app.app_context():
+                last_seen.flush()
@@ -0,0 +1,314 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from sqlalchemy import event
+
+from app import create_app, db, fragments, last_seen
+from app.models import Category, Comment, Item, List, Role, User
+from app.seed import populate
+
+# (users, lists, items per list, comments)
+DATASETS = {"small": (5, 10, 5, 20), "large": (60, 300, 40, 3000)}
+PASSWORD = "dibs"
+
+# (endpoint, who, method, path, form data); paths are formatted with the
+# fixtures of each dataset. Requests that change data come after the ones
+# that only read it.
+SCENARIOS = [
+    ("main.index", "anonymous", "get", "/", None),
+    ("main.index", "guest", "get", "/", None),
+    ("main.profile", "anonymous", "get", "/user/{author}", None),
+    ("main.profile", "owner", "get", "/user/{author}", None),
+    ("main.profile", "guest", "get", "/user/{author}", None),
+    ("main.view_list", "owner", "get", "/lists/{list_id}", None),
+    ("main.view_list", "guest", "get", "/lists/{list_id}", None),
+    ("main.view_list", "admin", "get", "/lists/{list_id}", None),
+    ("main.search", "guest", "get", "/search?q=lamp", None),
+    ("main.search", "guest", "get", "/search?q=vinta", None),
+    ("main.settings", "guest", "get", "/user/{guest}/settings", None),
+    ("main.edit_user", "admin", "get", "/user/{guest}/edit", None),
+    ("main.create_list", "owner", "get", "/lists/create", None),
+    ("auth.unconfirmed", "newbie", "get", "/auth/unconfirmed", None),
+    ("auth.login", "anonymous", "get", "/auth/login", None),
+    ("auth.register", "anonymous", "get", "/auth/register", None),
+    ("auth.change_password", "guest", "get", "/auth/change-password", None),
+    ("auth.password_reset_request", "anonymous", "get", "/auth/reset", None),
+    ("auth.password_reset", "anonymous", "get", "/auth/reset/{reset_token}", None),
+    ("auth.change_email_request", "guest", "get", "/auth/change_email", None),
+    (
+        "main.view_list",
+        "owner",
+        "post",
+        "/lists/{list_id}",
+        {"name": "kite", "link": "https://example.com/kite", "category_id": "1"},
+    ),
+    (
+        "main.import_list_items",
+        "owner",
+        "post",
+        "/lists/{list_id}/import",
+        {"file": "name,category\nlamp,Misc\nbike,Books\n"},
+    ),
+    (
+        "main.create_comment",
+        "guest",
+        "post",
+        "/lists/{list_id}/create_comment/{item_id}",
+        {"body": "dibs"},
+    ),
+    ("main.claim_item", "guest", "post", "/lists/{list_id}/claim/{spare_item_id}", {}),
+    ("main.claim_item", "admin", "post", "/lists/{list_id}/claim/{spare_item_id}", {}),
+    (
+        "main.unclaim_item",
+        "guest",
+        "post",
+        "/lists/{list_id}/unclaim/{spare_item_id}",
+        {},
+    ),
+    (
+        "main.delete_comment",
+        "guest",
+        "get",
+        "/lists/{list_id}/delete_comment/{comment_id}",
+        None,
+    ),
+    (
+        "main.delete_item",
+        "admin",
+        "get",
+        "/lists/{list_id}/delete/{spare_item_id}",
+        None,
+    ),
+    ("main.delete_list", "admin", "get", "/lists/{spare_list_id}/delete", None),
+    ("main.create_list", "owner", "post", "/lists/create", {"title": "more"}),
+    (
+        "main.edit_user",
+        "admin",
+        "post",
+        "/user/{guest}/edit",
+        {"email": "{guest}@example.com", "username": "{guest}", "role": "1"},
+    ),
+    ("auth.confirm", "newbie", "get", "/auth/confirm/{confirm_token}", None),
+    ("auth.resend_confirmation", "guest", "get", "/auth/confirm", None),
+    (
+        "auth.login",
+        "anonymous",
+        "post",
+        "/auth/login",
+        {"email": "{guest}@example.com", "password": PASSWORD},
+    ),
+    (
+        "auth.register",
+        "anonymous",
+        "post",
+        "/auth/register",
+        {
+            "email": "new@example.com",
+            "username": "new",
+            "password": "cat",
+            "password2": "cat",
+        },
+    ),
+    (
+        "auth.change_password",
+        "guest",
+        "post",
+        "/auth/change-password",
+        {"old_password": PASSWORD, "password": PASSWORD, "password2": PASSWORD},
+    ),
+    (
+        "auth.password_reset_request",
+        "anonymous",
+        "post",
+        "/auth/reset",
+        {"email": "{guest}@example.com"},
+    ),
+    (
+        "auth.password_reset",
+        "anonymous",
+        "post",
+        "/auth/reset/{reset_token}",
+        {"password": PASSWORD, "password2": PASSWORD},
+    ),
+    (
+        "auth.change_email_request",
+        "guest",
+        "post",
+        "/auth/change_email",
+        {"email": "moved@example.com", "password": PASSWORD},
+    ),
+    ("auth.change_email", "mover", "get", "/auth/change_email/{email_token}", None),
+    ("auth.logout", "guest", "get", "/auth/logout", None),
+]
+
+
+class Dataset:
+    """A seeded app with logged-in clients and the rows SCENARIOS refer to."""
+
+    def __init__(self, name, users, lists, items_per_list, comments):
+        self.tmpdir = tempfile.mkdtemp()
+        self.app = create_app(
+            "testing",
+            SQLALCHEMY_DATABASE_URI="sqlite:///"
+            + os.path.join(self.tmpdir, f"{name}.sqlite"),
+            WTF_CSRF_ENABLED=False,
+            # keep batched writes out of the measured requests
+            DIBS_LAST_SEEN_FLUSH_INTERVAL=3600,
+            DIBS_LAST_SEEN_FLUSH_SIZE=10**6,
+        )
+        with self.app.app_context():
+            db.create_all()
+            Role.insert_roles()
+            Category.insert_categories()
+            populate(users, lists, items_per_list, comments, password=PASSWORD)
+            self.fixtures = self.make_fixtures()
+        self.clients = {}
+        for who in ("owner", "guest", "admin", "newbie", "mover"):
+            client = self.app.test_client()
+            client.post(
+                "/auth/login",
+                data={"email": self.emails[who], "password": PASSWORD},
+            )
+            # warm the identity cache, as for any returning user
+            client.get("/auth/unconfirmed")
+            self.clients[who] = client
+
+    def make_fixtures(self):
+        owner = (
+            db.session.query(List.author_id)
+            .group_by(List.author_id)
+            .order_by(db.func.count(List.id).desc())
+            .limit(1)
+            .scalar()
+        )
+        owner = db.session.get(User, owner)
+        others = User.query.filter(User.id != owner.id).order_by(User.id)
+        guest, admin, mover = others.limit(3).all()
+        admin.role_id = Role.query.filter_by(name="Admin").one().id
+        newbie = User(email="newbie@example.com", username="newbie", password=PASSWORD)
+        db.session.add(newbie)
+        db.session.commit()
+        self.emails = {
+            "owner": owner.email,
+            "guest": guest.email,
+            "admin": admin.email,
+            "newbie": newbie.email,
+            "mover": mover.email,
+        }
+        wishlist = (
+            List.query.filter_by(author_id=owner.id)
+            .join(Item)
+            .group_by(List.id)
+            .order_by(db.func.count(Item.id).desc())
+            .first()
+        )
+        item = wishlist.items.order_by(Item.id).first()
+        spare_item = Item(name="spare", list_id=wishlist.id, category_id=1)
+        spare_list = List(title="spare", author_id=owner.id)
+        comment = Comment(
+            body="mine",
+            list_id=wishlist.id,
+            item_id=item.id,
+            author_id=guest.id,
+            author=guest.username,
+        )
+        db.session.add_all([spare_item, spare_list, comment])
+        db.session.commit()
+        Item.rebuild_counts()
+        return {
+            "author": owner.username,
+            "guest": guest.username,
+            "list_id": wishlist.id,
+            "item_id": item.id,
+            "comment_id": comment.id,
+            "spare_item_id": spare_item.id,
+            "spare_list_id": spare_list.id,
+            "confirm_token": newbie.generate_confirmation_token(),
+            "reset_token": guest.generate_reset_token(),
+            "email_token": mover.generate_email_change_token("mover@example.com"),
+        }
+
+    def count(self, who, method, path, data):
+        path = path.format(**self.fixtures)
+        kwargs = {}
+        if data is not None:
+            data = {key: value.format(**self.fixtures) for key, value in data.items()}
+            if "file" in data:
+                data["file"] = (io.BytesIO(data["file"].encode()), "items.csv")
+            kwargs["data"] = data
+        with self.app.app_context():
+            engine = db.engine
+            fragments.clear()
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            client = self.clients.get(who) or self.app.test_client()
+            response = getattr(client, method)(path, **kwargs)
+            response.get_data()
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+        if response.status_code >= 400:
+            raise AssertionError(f"{method.upper()} {path}: {response.status_code}")
+        return len(statements)
+
+    def close(self):
+        with self.app.app_context():
+            last_seen.flush()
+            db.session.remove()
+            db.drop_all()
+        shutil.rmtree(self.tmpdir)
+
+
+class QueryBudgetTestCase(unittest.TestCase):
+    """
+    Every view in the main and auth blueprints declares a query budget with
+    @query_budget. Each scenario runs against a small and a large seeded
+    dataset, with the reference data and identity caches warm and the
+    fragment cache cold; the query count must stay within budget and must not
+    grow with the size of the data.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.counts = {}
+        for name, sizes in DATASETS.items():
+            dataset = Dataset(name, *sizes)
+            try:
+                cls.counts[name] = [
+                    dataset.count(who, method, path, data)
+                    for _, who, method, path, data in SCENARIOS
+                ]
+                cls.app = dataset.app
+            finally:
+                dataset.close()
+
+    def budget(self, endpoint):
+        return getattr(self.app.view_functions[endpoint], "query_budget", None)
+
+    def test_every_view_has_a_budget(self):
+        covered = {scenario[0] for scenario in SCENARIOS}
+        for rule in self.app.url_map.iter_rules():
+            if rule.endpoint.split(".")[0] in ("main", "auth"):
+                with self.subTest(endpoint=rule.endpoint):
+                    self.assertIsNotNone(self.budget(rule.endpoint))
+                    self.assertIn(rule.endpoint, covered)
+
+    def test_within_budget(self):
+        for n, (endpoint, who, method, path, _) in enumerate(SCENARIOS):
+            with self.subTest(endpoint=endpoint, who=who, method=method):
+                budget = self.budget(endpoint)
+                self.assertIsNotNone(budget)
+                for name in DATASETS:
+                    self.assertLessEqual(self.counts[name][n], budget, name)
+
+    def test_independent_of_data_size(self):
+        for n, (endpoint, who, method, path, _) in enumerate(SCENARIOS):
+            with self.subTest(endpoint=endpoint, who=who, method=method):
+                self.assertLessEqual(self.counts["large"][n], self.counts["small"][n])
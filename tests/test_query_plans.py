@@ -0,0 +1,212 @@
+import os
+import re
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from app import create_app, db, last_seen
+from app.models import Category, Comment, Item, List, Role, User
+
+# tiny reference tables that are read whole, once, into the refdata cache
+SCANNABLE = {"categories", "roles"}
+FULL_SCAN = re.compile(r"^SCAN (\w+)(?: AS \w+)?$")
+
+
+class QueryPlanTestCase(unittest.TestCase):
+    """
+    Run every route against a seeded dataset and fail if SQLite plans any of
+    its statements as a full table scan or has to build an automatic index.
+    """
+
+    USERS = 20
+    LISTS_PER_USER = 10
+    ITEMS_PER_LIST = 50
+
+    @classmethod
+    def setUpClass(cls):
+        tmpdir = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, tmpdir)
+        cls.app = create_app(
+            "testing",
+            SQLALCHEMY_DATABASE_URI="sqlite:///" + os.path.join(tmpdir, "plans.sqlite"),
+            WTF_CSRF_ENABLED=False,
+        )
+        with cls.app.app_context():
+            db.create_all()
+            Role.insert_roles()
+            Category.insert_categories()
+            cls.seed()
+            cls.engine = db.engine
+
+    @classmethod
+    def seed(cls):
+        users = [
+            User(
+                email=f"user{n}@example.com",
+                username=f"user{n}",
+                password="cat",
+                confirmed=True,
+            )
+            for n in range(cls.USERS)
+        ]
+        db.session.add_all(users)
+        db.session.commit()
+        start = datetime(2023, 1, 1)
+        db.session.execute(
+            List.__table__.insert(),
+            [
+                {
+                    "title": f"list {n}",
+                    "author_id": users[n % cls.USERS].id,
+                    "timestamp": start + timedelta(hours=n),
+                }
+                for n in range(cls.USERS * cls.LISTS_PER_USER)
+            ],
+        )
+        list_ids = [row.id for row in db.session.query(List.id)]
+        db.session.execute(
+            Item.__table__.insert(),
+            [
+                {
+                    "name": f"item {n}",
+                    "list_id": list_id,
+                    "category_id": 1 + n % 5,
+                    "timestamp": start,
+                }
+                for list_id in list_ids
+                for n in range(cls.ITEMS_PER_LIST)
+            ],
+        )
+        db.session.execute(
+            Comment.__table__.insert(),
+            [
+                {
+                    "body": "dibs",
+                    "list_id": item.list_id,
+                    "item_id": item.id,
+                    "author_id": users[1].id,
+                    "author": users[1].username,
+                    "timestamp": start,
+                }
+                for item in db.session.query(Item.id, Item.list_id)
+                if item.id % 2
+            ],
+        )
+        db.session.commit()
+        Item.rebuild_counts()
+        cls.list_id = (
+            db.session.query(List.id).filter_by(author_id=users[0].id).first()[0]
+        )
+        cls.item_id = (
+            db.session.query(Item.id).filter_by(list_id=cls.list_id).first()[0]
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        with cls.app.app_context():
+            last_seen.flush()
+            db.session.remove()
+            db.drop_all()
+
+    def setUp(self):
+        self.clients = {}
+        for n in (0, 1):
+            client = self.app.test_client()
+            client.post(
+                "/auth/login", data={"email": f"user{n}@example.com", "password": "cat"}
+            )
+            self.clients[n] = client
+
+    def statements(self, client, path, method="get", **kwargs):
+        captured = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            if executemany:
+                parameters = parameters[0]
+            captured.append((statement, parameters))
+
+        event.listen(self.engine, "before_cursor_execute", record)
+        try:
+            response = getattr(client, method)(path, **kwargs)
+            response.get_data()
+        finally:
+            event.remove(self.engine, "before_cursor_execute", record)
+        self.assertLess(response.status_code, 400, path)
+        return captured
+
+    def assert_indexed(self, client, path, method="get", **kwargs):
+        captured = self.statements(client, path, method, **kwargs)
+        connection = self.engine.raw_connection()
+        try:
+            for statement, parameters in captured:
+                if (
+                    not statement.lstrip()
+                    .upper()
+                    .startswith(("SELECT", "UPDATE", "DELETE", "INSERT"))
+                ):
+                    continue
+                plan = [
+                    row[3]
+                    for row in connection.execute(
+                        "EXPLAIN QUERY PLAN " + statement, parameters
+                    )
+                ]
+                for step in plan:
+                    scan = FULL_SCAN.match(step)
+                    if scan and scan.group(1) not in SCANNABLE:
+                        self.fail(
+                            f"{path}: full scan of {scan.group(1)} in\n{statement}"
+                        )
+                    if "AUTOMATIC" in step:
+                        self.fail(f"{path}: automatic index ({step}) in\n{statement}")
+        finally:
+            connection.close()
+
+    def test_index(self):
+        self.assert_indexed(self.clients[1], "/")
+        self.assert_indexed(self.clients[1], "/?before=2023-01-05T00:00:00_50")
+
+    def test_view_list(self):
+        self.assert_indexed(self.clients[0], f"/lists/{self.list_id}")
+        self.assert_indexed(self.clients[1], f"/lists/{self.list_id}")
+
+    def test_profile(self):
+        self.assert_indexed(self.clients[0], "/user/user0")
+        self.assert_indexed(self.clients[1], "/user/user0")
+
+    def test_search(self):
+        self.assert_indexed(self.clients[1], "/search?q=item+1")
+        self.assert_indexed(self.clients[1], "/search?q=list&page=3")
+
+    def test_comments(self):
+        self.assert_indexed(
+            self.clients[1],
+            f"/lists/{self.list_id}/create_comment/{self.item_id}",
+            method="post",
+            data={"body": "mine"},
+        )
+        with self.app.app_context():
+            comment_id = db.session.query(Comment.id).filter_by(body="mine").scalar()
+        self.assert_indexed(
+            self.clients[1], f"/lists/{self.list_id}/delete_comment/{comment_id}"
+        )
+
+    def test_api(self):
+        client = self.clients[1]
+        self.assert_indexed(client, "/api/v1/feed")
+        self.assert_indexed(client, "/api/v1/feed?cursor=2023-01-05T00:00:00_50")
+        self.assert_indexed(client, "/api/v1/users/user0/lists")
+        self.assert_indexed(
+            client, f"/api/v1/lists/{self.list_id}/items?fields=name,comments"
+        )
+
+    def test_login(self):
+        self.assert_indexed(
+            self.app.test_client(),
+            "/auth/login",
+            method="post",
+            data={"email": "user3@example.com", "password": "cat"},
+        )
@@ -0,0 +1,200 @@
+import io
+import unittest
+
+from app import create_app, db, last_seen, search
+from app.imports import import_items
+from app.models import Category, Item, List, Role, User
+
+
+class SearchTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app("testing")
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        Role.insert_roles()
+        Category.insert_categories()
+        self.user = User(
+            email="susan@example.com", username="susan", password="cat", confirmed=True
+        )
+        db.session.add(self.user)
+        db.session.commit()
+        self.wishlist = List(title="Birthday presents", author_id=self.user.id)
+        db.session.add(self.wishlist)
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def add(self, name, description=None, link=None):
+        item = Item(
+            name=name,
+            description=description,
+            link=link,
+            list_id=self.wishlist.id,
+            category_id=1,
+        )
+        db.session.add(item)
+        db.session.commit()
+        return item
+
+    def titles(self, query, **kwargs):
+        results, has_next = search.search(query, **kwargs)
+        return [result.title for result in results]
+
+    def test_columns(self):
+        self.add("teapot", description="blue and white china")
+        self.add("kettle", link="https://example.com/porcelain-kettle")
+        self.assertEqual(self.titles("teapot"), ["teapot"])
+        self.assertEqual(self.titles("china"), ["teapot"])
+        self.assertEqual(self.titles("porcelain"), ["kettle"])
+        self.assertEqual(self.titles("birthday"), ["Birthday presents"])
+        self.assertEqual(self.titles("nothing"), [])
+
+    def test_prefix_and_all_words(self):
+        self.add("red bicycle")
+        self.add("red kite")
+        self.assertEqual(self.titles("bicy"), ["red bicycle"])
+        self.assertEqual(sorted(self.titles("red")), ["red bicycle", "red kite"])
+        self.assertEqual(self.titles("red ki"), ["red kite"])
+
+    def test_ranking(self):
+        for n in range(20):
+            self.add(f"chair {n}")
+        self.add("lamp", description="a lamp for reading")
+        self.add("lampshade")
+        self.add("desk", description="goes well with a lamp")
+        titles = self.titles("lamp")
+        self.assertEqual(titles[0], "lamp")
+        self.assertEqual(sorted(titles[1:]), ["desk", "lampshade"])
+        self.assertEqual(self.titles("reading lamp"), ["lamp"])
+
+    def test_kept_in_sync(self):
+        item = self.add("teapot")
+        item.name = "coffee pot"
+        db.session.commit()
+        self.assertEqual(self.titles("teapot"), [])
+        self.assertEqual(self.titles("coffee"), ["coffee pot"])
+        db.session.delete(item)
+        db.session.commit()
+        self.assertEqual(self.titles("coffee"), [])
+        self.wishlist.title = "Wedding list"
+        db.session.commit()
+        self.assertEqual(self.titles("wedding"), ["Wedding list"])
+        self.assertEqual(self.titles("birthday"), [])
+
+    def test_bulk_import(self):
+        import_items(
+            self.wishlist.id, io.BytesIO(b"name,category\nturntable,Music\n"), "csv"
+        )
+        self.assertEqual(self.titles("turntable"), ["turntable"])
+
+    def test_pagination(self):
+        for n in range(25):
+            self.add(f"candle {n}")
+        results, has_next = search.search("candle", page=1, per_page=20)
+        self.assertEqual(len(results), 20)
+        self.assertTrue(has_next)
+        more, has_next = search.search("candle", page=2, per_page=20)
+        self.assertEqual(len(more), 5)
+        self.assertFalse(has_next)
+        self.assertFalse({r.id for r in results} & {r.id for r in more})
+
+    def test_candidates(self):
+        for n in range(30):
+            self.add(f"lamp {n}")
+        # the best matches are the oldest items, which are named just "candle"
+        for n in range(10):
+            self.add("candle" if n < 3 else f"candle {n}")
+        self.assertEqual(self.titles("candle", per_page=3), ["candle"] * 3)
+        # only the newest five matches are scored
+        results, has_next = search.search("candle", per_page=10, candidates=5)
+        self.assertEqual(
+            sorted(r.title for r in results), [f"candle {n}" for n in range(5, 10)]
+        )
+        self.assertFalse(has_next)
+
+    def test_syntax_is_not_interpreted(self):
+        self.add("tea for two")
+        for query in ('"tea', "tea OR", "NEAR(tea", "tea -two", "name:tea", "*", ""):
+            search.search(query)
+        self.assertEqual(self.titles("tea AND two"), [])
+        self.assertEqual(self.titles("(tea) two!"), ["tea for two"])
+
+    def test_orphaned_items_are_hidden(self):
+        item = self.add("umbrella")
+        item.list_id = None
+        db.session.commit()
+        self.assertEqual(self.titles("umbrella"), [])
+
+    def test_rebuild(self):
+        self.add("teapot")
+        db.session.execute(
+            db.text("INSERT INTO items_fts(items_fts) VALUES ('delete-all')")
+        )
+        db.session.commit()
+        self.assertEqual(self.titles("teapot"), [])
+        search.rebuild()
+        self.assertEqual(self.titles("teapot"), ["teapot"])
+
+
+class SearchPageTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app("testing")
+        self.app.config["WTF_CSRF_ENABLED"] = False
+        with self.app.app_context():
+            db.create_all()
+            Role.insert_roles()
+            Category.insert_categories()
+            user = User(
+                email="susan@example.com",
+                username="susan",
+                password="cat",
+                confirmed=True,
+            )
+            db.session.add(user)
+            db.session.commit()
+            wishlist = List(title="Birthday", author_id=user.id)
+            db.session.add(wishlist)
+            db.session.commit()
+            db.session.add(
+                Item(name="<b>teapot</b>", list_id=wishlist.id, category_id=1)
+            )
+            db.session.commit()
+
+    def tearDown(self):
+        with self.app.app_context():
+            last_seen.flush()
+            db.session.remove()
+            db.drop_all()
+
+    def test_login_required(self):
+        response = self.app.test_client().get("/search?q=teapot")
+        self.assertEqual(response.status_code, 302)
+        self.assertIn("/auth/login", response.headers["Location"])
+
+    def test_results(self):
+        client = self.app.test_client()
+        client.post(
+            "/auth/login", data={"email": "susan@example.com", "password": "cat"}
+        )
+        html = client.get("/search?q=teapot").get_data(as_text=True)
+        self.assertIn("&lt;b&gt;teapot&lt;/b&gt;", html)
+        self.assertIn("Birthday", html)
+        html = client.get("/search?q=nothing").get_data(as_text=True)
+        self.assertIn("Nothing matches", html)
+        self.assertEqual(client.get("/search?q=teapot&page=x").status_code, 200)
+
+    def test_page_limit(self):
+        client = self.app.test_client()
+        client.post(
+            "/auth/login", data={"email": "susan@example.com", "password": "cat"}
+        )
+        last = self.app.config["DIBS_SEARCH_MAX_PAGES"]
+        self.assertEqual(client.get(f"/search?q=teapot&page={last}").status_code, 200)
+        for page in (last + 1, 99999999999999999999):
+            with self.subTest(page=page):
+                response = client.get(f"/search?q=teapot&page={page}")
+                self.assertEqual(response.status_code, 404)
@@ -0,0 +1,78 @@
+import unittest
+
+from app import create_app, db
+from app.models import Category, Comment, Item, List, Role, User
+from app.seed import populate
+
+
+class SeedTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app("testing")
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        Role.insert_roles()
+        Category.insert_categories()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def snapshot(self):
+        return (
+            db.session.query(List.id, List.author_id, List.timestamp).all(),
+            db.session.query(Item.id, Item.list_id, Item.name, Item.category_id).all(),
+            db.session.query(Comment.item_id, Comment.author_id, Comment.body).all(),
+        )
+
+    def reset(self):
+        db.session.remove()
+        db.drop_all()
+        db.create_all()
+        Role.insert_roles()
+        Category.insert_categories()
+
+    def test_counts(self):
+        result = populate(users=10, lists=30, items_per_list=5, comments=100)
+        self.assertEqual(User.query.count(), 10)
+        self.assertEqual(List.query.count(), 30)
+        self.assertEqual(Item.query.count(), result.items)
+        self.assertEqual(Comment.query.count(), 100)
+        self.assertTrue(User.query.first().verify_password("dibs"))
+
+    def test_deterministic(self):
+        populate(users=10, lists=30, items_per_list=5, comments=100, seed=1)
+        first = self.snapshot()
+        self.reset()
+        populate(users=10, lists=30, items_per_list=5, comments=100, seed=1)
+        self.assertEqual(self.snapshot(), first)
+        self.reset()
+        populate(users=10, lists=30, items_per_list=5, comments=100, seed=2)
+        self.assertNotEqual(self.snapshot(), first)
+
+    def test_skew(self):
+        populate(users=50, lists=500, items_per_list=10, comments=1000)
+        per_author = [
+            count
+            for _, count in db.session.query(List.author_id, db.func.count(List.id))
+            .group_by(List.author_id)
+            .order_by(db.func.count(List.id).desc())
+        ]
+        self.assertGreater(per_author[0], 10 * per_author[-1])
+
+    def test_nobody_comments_on_their_own_lists(self):
+        populate(users=10, lists=30, items_per_list=5, comments=500)
+        own = (
+            Comment.query.join(List, Comment.list_id == List.id)
+            .filter(Comment.author_id == List.author_id)
+            .count()
+        )
+        self.assertEqual(own, 0)
+
+    def test_counts_are_consistent(self):
+        populate(users=10, lists=30, items_per_list=5, comments=200)
+        self.assertEqual(Item.rebuild_counts(), 0)
+        self.assertEqual(
+            db.session.query(db.func.sum(Item.comment_count)).scalar(), 200
+        )
@@ -0,0 +1,74 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from app import create_app, db
+from config import ProductionConfig
+
+
+class SQLiteTuningTestCase(unittest.TestCase):
+    def make_app(self, **settings):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        database = "sqlite:///" + os.path.join(tmpdir, "tuning.sqlite")
+        return create_app("testing", SQLALCHEMY_DATABASE_URI=database, **settings)
+
+    def pragma(self, app, name):
+        with app.app_context(), db.engine.connect() as connection:
+            return connection.exec_driver_sql(f"PRAGMA {name}").scalar()
+
+    def test_default_profile_is_untouched(self):
+        app = self.make_app()
+        self.assertEqual(self.pragma(app, "journal_mode"), "delete")
+
+    def test_production_profile(self):
+        app = self.make_app(
+            SQLALCHEMY_ENGINE_OPTIONS=ProductionConfig.SQLALCHEMY_ENGINE_OPTIONS,
+            DIBS_SQLITE_PRAGMAS=ProductionConfig.DIBS_SQLITE_PRAGMAS,
+        )
+        pragmas = ProductionConfig.DIBS_SQLITE_PRAGMAS
+        self.assertEqual(self.pragma(app, "journal_mode"), "wal")
+        self.assertEqual(self.pragma(app, "synchronous"), 1)
+        self.assertEqual(self.pragma(app, "busy_timeout"), pragmas["busy_timeout"])
+        self.assertEqual(self.pragma(app, "cache_size"), pragmas["cache_size"])
+        with app.app_context():
+            self.assertEqual(
+                db.engine.pool.size(),
+                ProductionConfig.SQLALCHEMY_ENGINE_OPTIONS["pool_size"],
+            )
+
+    def test_readers_do_not_wait_for_writer(self):
+        app = self.make_app(
+            SQLALCHEMY_ENGINE_OPTIONS=ProductionConfig.SQLALCHEMY_ENGINE_OPTIONS,
+            DIBS_SQLITE_PRAGMAS=dict(
+                ProductionConfig.DIBS_SQLITE_PRAGMAS, busy_timeout=0
+            ),
+        )
+        with app.app_context():
+            engine = db.engine
+        with engine.begin() as connection:
+            connection.exec_driver_sql("CREATE TABLE counter (n INTEGER)")
+            connection.exec_driver_sql("INSERT INTO counter VALUES (1)")
+        seen = []
+
+        def read():
+            with engine.connect() as connection:
+                seen.append(
+                    connection.exec_driver_sql("SELECT n FROM counter").scalar()
+                )
+
+        # hold the exclusive lock a writer takes while committing
+        writer = engine.raw_connection()
+        try:
+            writer.execute("BEGIN EXCLUSIVE")
+            writer.execute("UPDATE counter SET n = 2")
+            reader = threading.Thread(target=read)
+            reader.start()
+            reader.join()
+            writer.commit()
+        finally:
+            writer.close()
+        # the reader got the last committed value instead of "database is locked"
+        self.assertEqual(seen, [1])
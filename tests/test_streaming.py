@@ -0,0 +1,143 @@
+import gzip
+import unittest
+
+from app import create_app, db, fragments, last_seen
+from app.compression import brotli
+from app.fragments import personalize_stream
+from app.models import Category, Comment, Item, List, Role, User
+
+
+class StreamingTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app("testing")
+        self.app.config["WTF_CSRF_ENABLED"] = False
+        self.app.config["DIBS_STREAM_CHUNK_SIZE"] = 512
+        with self.app.app_context():
+            db.create_all()
+            Role.insert_roles()
+            Category.insert_categories()
+            users = {}
+            for name in ("owner", "susan", "david"):
+                users[name] = User(
+                    email=f"{name}@example.com",
+                    username=name,
+                    password="cat",
+                    confirmed=True,
+                )
+            db.session.add_all(users.values())
+            db.session.commit()
+            wishlist = List(title="birthday", author_id=users["owner"].id)
+            db.session.add(wishlist)
+            db.session.commit()
+            items = [
+                Item(name=f"teapot {n}", list_id=wishlist.id, category_id=1)
+                for n in range(40)
+            ]
+            db.session.add_all(items)
+            db.session.commit()
+            for n, item in enumerate(items):
+                author = users["susan" if n % 2 else "david"]
+                db.session.add(
+                    Comment(
+                        body=f"dibs on teapot {n}",
+                        list_id=wishlist.id,
+                        item_id=item.id,
+                        author_id=author.id,
+                        author=author.username,
+                    )
+                )
+            db.session.commit()
+            self.list_id = wishlist.id
+        self.clients = {}
+        for name in ("owner", "susan", "david"):
+            client = self.app.test_client()
+            client.post(
+                "/auth/login", data={"email": f"{name}@example.com", "password": "cat"}
+            )
+            client.get("/")
+            self.clients[name] = client
+
+    def tearDown(self):
+        with self.app.app_context():
+            last_seen.flush()
+            db.session.remove()
+            db.drop_all()
+
+    def get(self, name, encoding=None, method="GET"):
+        headers = {"Accept-Encoding": encoding} if encoding else {}
+        response = self.clients[name].open(
+            f"/lists/{self.list_id}", method=method, headers=headers
+        )
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_streamed_page_matches_rendered_page(self):
+        streamed = self.get("susan")
+        self.assertNotIn("Content-Length", streamed.headers)
+        self.app.config["DIBS_STREAM_TEMPLATES"] = False
+        rendered = self.get("susan")
+        self.assertIn("Content-Length", rendered.headers)
+        self.assertEqual(streamed.data, rendered.data)
+
+    def test_flashes_are_shown_once(self):
+        with self.app.app_context():
+            item_id = List.query.get(self.list_id).items.first().id
+        response = self.clients["susan"].post(f"/lists/{self.list_id}/claim/{item_id}")
+        self.assertEqual(response.status_code, 302)
+        self.assertIn("You called dibs!", self.get("susan").get_data(as_text=True))
+        self.assertNotIn("You called dibs!", self.get("susan").get_data(as_text=True))
+        with self.clients["susan"].session_transaction() as session:
+            self.assertNotIn("_flashes", session)
+
+    def test_fragment_is_stored_after_a_streamed_miss(self):
+        page = self.get("susan").get_data(as_text=True)
+        self.assertEqual(page.count("delete_comment"), 20)
+        page = self.get("david").get_data(as_text=True)
+        self.assertEqual(page.count("delete_comment"), 20)
+        self.assertNotIn("<!--own:", page)
+        with self.app.app_context():
+            self.assertEqual(fragments.stats()["hits"], 1)
+
+    def test_encodings(self):
+        expected = self.get("susan").data
+        encodings = [("gzip", gzip.decompress), ("identity", bytes)]
+        if brotli is not None:
+            encodings.insert(0, ("br", brotli.decompress))
+        for encoding, decode in encodings:
+            for streaming in (True, False):
+                with self.subTest(encoding=encoding, streaming=streaming):
+                    self.app.config["DIBS_STREAM_TEMPLATES"] = streaming
+                    response = self.get("susan", f"{encoding}, *;q=0")
+                    self.assertIn("Accept-Encoding", response.headers["Vary"])
+                    self.assertEqual(
+                        response.content_encoding,
+                        None if encoding == "identity" else encoding,
+                    )
+                    self.assertEqual(decode(response.data), expected)
+
+    def test_small_responses_are_not_compressed(self):
+        self.app.config["DIBS_STREAM_TEMPLATES"] = False
+        self.app.extensions["compression"].min_size = 10**6
+        response = self.get("susan", "gzip")
+        self.assertIsNone(response.content_encoding)
+        self.assertNotIn("Accept-Encoding", response.headers["Vary"])
+
+    def test_head_is_not_streamed(self):
+        response = self.get("susan", method="HEAD")
+        self.assertEqual(response.data, b"")
+        self.assertEqual(
+            int(response.headers["Content-Length"]), len(self.get("susan").data)
+        )
+
+    def test_personalize_stream_holds_back_own_sections(self):
+        html = (
+            "<p>a</p><!--own:1--><a>mine</a><!--/own-->"
+            "<p>b</p><!--own:2--><a>theirs</a><!--/own--><p>c</p>"
+        )
+        for size in (1, 5, 13, len(html)):
+            with self.subTest(size=size), self.app.test_request_context():
+                chunks = (html[i : i + size] for i in range(0, len(html), size))
+                self.assertEqual(
+                    "".join(personalize_stream(chunks, 1)),
+                    "<p>a</p><a>mine</a><p>b</p><p>c</p>",
+                )
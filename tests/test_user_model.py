@@ -1,6 +1,8 @@
 import unittest
 
-from app import create_app, db
+from sqlalchemy import event
+
+from app import create_app, db, refdata
 from app.models import AnonymousUser, Permission, User, Role
 
 
@@ -85,6 +87,39 @@ class UserModelTestCase(unittest.TestCase):
         self.assertTrue(u.can(Permission.READ))
         self.assertFalse(u.can(Permission.ADMIN))
 
+    def test_permission_checks_do_not_query(self):
+        Role.insert_roles()
+        u = User(email="john@example.com", password="cat")
+        db.session.add(u)
+        db.session.commit()
+        u.can(Permission.READ)
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", record)
+        try:
+            self.assertTrue(u.can(Permission.COMMENT))
+            self.assertFalse(u.is_administrator())
+        finally:
+            event.remove(db.engine, "before_cursor_execute", record)
+        self.assertEqual(statements, [])
+
+    def test_insert_roles_invalidates_reference_cache(self):
+        Role.insert_roles()
+        u = User(email="john@example.com", password="cat")
+        db.session.add(u)
+        db.session.commit()
+        self.assertFalse(u.can(Permission.DELETE))
+        u.role.permissions |= Permission.DELETE
+        db.session.commit()
+        self.assertFalse(u.can(Permission.DELETE))
+        refdata.invalidate()
+        self.assertTrue(u.can(Permission.DELETE))
+        Role.insert_roles()
+        self.assertFalse(u.can(Permission.DELETE))
+
     def test_anonymous_user(self):
         u = AnonymousUser()
         self.assertFalse(u.can(Permission.COMMENT))